@@ -0,0 +1,66 @@
+import numpy as np
+from typing import Dict, List, Sequence
+from src.data.staff import Staff
+from src.data.patient import Patient
+from src.data.equipment import Equipment
+from src.models.scheduler import DAY_START, DAY_END, SLOT_MINUTES
+
+# Seeded synthetic workloads. The same seed and size always produce the same
+# data, so timings from different runs and machines compare like with like.
+
+ROLES = ('Doctor', 'Nurse', 'Technician')
+EQUIPMENT_TYPES = ('X-Ray', 'MRI', 'CT', 'Ultrasound')
+
+def generate_staff(n: int, rng: np.random.Generator, roles: Sequence[str] = ROLES,
+                   unavailable: float = 0.05) -> List[Staff]:
+    role = rng.integers(0, len(roles), n)
+    available = rng.random(n) >= unavailable
+    return [Staff(i, f"Staff {i}", roles[role[i]], bool(available[i])) for i in range(n)]
+
+def generate_equipment(n: int, rng: np.random.Generator, types: Sequence[str] = EQUIPMENT_TYPES,
+                       unavailable: float = 0.05) -> List[Equipment]:
+    kind = rng.integers(0, len(types), n)
+    available = rng.random(n) >= unavailable
+    return [Equipment(i, types[kind[i]], bool(available[i])) for i in range(n)]
+
+def generate_patients(n: int, rng: np.random.Generator, date: str = '2023-05-01') -> List[Patient]:
+    # Requested times on slot boundaries during opening hours
+    slots = rng.integers(0, (DAY_END - DAY_START) // SLOT_MINUTES, n) * SLOT_MINUTES + DAY_START
+    return [Patient(i, f"Patient {i}", f"{date} {minute // 60:02d}:{minute % 60:02d}") for i, minute in enumerate(slots.tolist())]
+
+def generate_tasks(n: int, rng: np.random.Generator, roles: Sequence[str] = ROLES,
+                   restricted: float = 0.3) -> List[Dict]:
+    # Durations in hours; a share of the tasks needs a specific role
+    durations = np.round(rng.uniform(0.25, 2.0, n), 2)
+    role = rng.integers(0, len(roles), n)
+    restrict = rng.random(n) < restricted
+    tasks = []
+    for i in range(n):
+        task = {'id': i, 'duration': float(durations[i])}
+        if restrict[i]:
+            task['role'] = roles[role[i]]
+        tasks.append(task)
+    return tasks
+
+def generate_transitions(n: int, state_size: int, action_size: int, rng: np.random.Generator) -> Dict[str, np.ndarray]:
+    # Pre-encoded transitions for RLModel.train_batch
+    states = rng.integers(0, state_size, n)
+    return {
+        'states': states,
+        'actions': rng.integers(0, action_size, n),
+        'rewards': rng.normal(0.0, 1.0, n),
+        'next_states': (states + rng.integers(-3, 4, n)) % state_size,
+        'dones': rng.random(n) < 0.01
+    }
+
+def generate_episodes(n_steps: int, rng: np.random.Generator, steps_per_episode: int = 20) -> List[Dict]:
+    # Episodes in the RLModel.train format with small dict states
+    def state():
+        return {'staff_available': int(rng.integers(0, 50)), 'patients_waiting': int(rng.integers(0, 100))}
+
+    episodes = []
+    for begin in range(0, n_steps, steps_per_episode):
+        steps = [{'next_state': state(), 'reward': float(rng.normal())}
+                 for _ in range(min(steps_per_episode, n_steps - begin))]
+        episodes.append({'initial_state': state(), 'steps': steps})
+    return episodes
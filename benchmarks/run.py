@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+from typing import Callable, Dict, List, Optional, Sequence
+from config.settings import MAX_SCHEDULE_GENERATION_TIME, MIN_RESOURCE_ALLOCATION_ACCURACY
+from src.models.resource_allocator import ResourceAllocator
+from src.models.scheduler import Scheduler, build_resources
+from src.models.local_search_scheduler import LocalSearchScheduler
+from src.models.workload_distributor import WorkloadDistributor
+from src.models.rl_model import RLModel
+from benchmarks.generators import (generate_staff, generate_equipment, generate_patients, generate_tasks,
+                                   generate_transitions, generate_episodes)
+
+# Usage: python -m benchmarks.run [--scales small medium] [--output results.json]
+#                                 [--baseline benchmarks/baseline.json] [--save-baseline PATH]
+# Exits with status 1 when a scheduler exceeds MAX_SCHEDULE_GENERATION_TIME,
+# allocation accuracy drops below MIN_RESOURCE_ALLOCATION_ACCURACY or a timing
+# is slower than the baseline by more than the tolerance.
+
+# Each scale multiplies every benchmark's base size
+SCALES = {'small': 1, 'medium': 10, 'large': 100, 'xlarge': 1000}
+DEFAULT_SCALES = ('small', 'medium', 'large')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+RL_STATE_SIZE = 4096
+RL_ACTION_SIZE = 16
+
+class Benchmark:
+    # `setup(factor, rng)` builds fresh inputs (runs may mutate them) and returns
+    # (sizes, args); `run(*args)` is the timed call and returns result metrics.
+    # `budget` is a per-run time limit in seconds.
+    def __init__(self, name: str, setup: Callable, run: Callable, budget: Optional[float] = None):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.budget = budget
+
+def _allocation_setup(factor, rng):
+    staff, patients, equipment = generate_staff(10 * factor, rng), generate_patients(100 * factor, rng), generate_equipment(10 * factor, rng)
+    return {'staff': len(staff), 'patients': len(patients), 'equipment': len(equipment)}, (staff, patients, equipment)
+
+def _allocation_run(staff, patients, equipment):
+    # Accuracy: allocated patients over the most that could be allocated
+    possible = min(len(patients), sum(s.availability for s in staff), sum(e.availability for e in equipment))
+    allocations = ResourceAllocator().allocate_resources(staff, patients, equipment)
+    allocated = sum(a['staff'] is not None for a in allocations)
+    return {'allocated': allocated, 'accuracy': allocated / possible if possible else 1.0}
+
+def _schedule_setup(factor, rng):
+    staff, equipment = generate_staff(5 * factor, rng), generate_equipment(5 * factor, rng)
+    patients = sorted(generate_patients(100 * factor, rng), key=lambda p: (p.appointment_time, p.id))
+    return ({'staff': len(staff), 'patients': len(patients), 'equipment': len(equipment)},
+            (build_resources(staff, equipment), [{'patient': p} for p in patients]))
+
+def _schedule_run(scheduler):
+    def run(resources, appointments):
+        schedule = scheduler().generate_daily_schedule(resources, appointments, date='2023-05-01')
+        return {'scheduled': sum(a['staff'] is not None for a in schedule.assignments)}
+    return run
+
+def _workload_setup(factor, rng):
+    staff, tasks = generate_staff(10 * factor, rng), generate_tasks(50 * factor, rng)
+    return {'staff': len(staff), 'tasks': len(tasks)}, (staff, tasks)
+
+def _distribute_run(staff, tasks):
+    assignments = WorkloadDistributor().distribute_workload(staff, tasks)
+    return {'unassigned': sum(a['assigned_to'] is None for a in assignments)}
+
+def _balance_run(staff, tasks):
+    result = WorkloadDistributor().balance_workload(staff, tasks, max_moves=1000)
+    return {key: result[key] for key in ('max_load', 'mean_load', 'unassigned', 'moves')}
+
+def _transitions_setup(factor, rng):
+    transitions = generate_transitions(10000 * factor, RL_STATE_SIZE, RL_ACTION_SIZE, rng)
+    return {'transitions': len(transitions['states'])}, (RLModel(RL_STATE_SIZE, RL_ACTION_SIZE), transitions)
+
+def _train_batch_run(model, transitions):
+    stats = model.train_batch(**transitions)[-1]
+    return {'transitions_per_second': stats['transitions_per_second']}
+
+def _episodes_setup(factor, rng):
+    episodes = generate_episodes(1000 * factor, rng)
+    return {'steps': sum(len(e['steps']) for e in episodes)}, (RLModel(RL_STATE_SIZE, RL_ACTION_SIZE), episodes)
+
+def _train_run(model, episodes):
+    model.train(episodes)
+    return {}
+
+def _predict_setup(factor, rng):
+    model = RLModel(RL_STATE_SIZE, RL_ACTION_SIZE)
+    model.q_table = rng.normal(size=(RL_STATE_SIZE, RL_ACTION_SIZE))
+    states = [e['initial_state'] for e in generate_episodes(10000 * factor, rng, steps_per_episode=1)]
+    return {'states': len(states)}, (model, states)
+
+def _predict_run(model, states):
+    model.predict_batch(states, top_k=3)
+    return {}
+
+BENCHMARKS = [
+    Benchmark('resource_allocator', _allocation_setup, _allocation_run),
+    Benchmark('scheduler_greedy', _schedule_setup, _schedule_run(Scheduler), budget=MAX_SCHEDULE_GENERATION_TIME),
+    Benchmark('scheduler_local_search', _schedule_setup,
+              _schedule_run(lambda: LocalSearchScheduler(max_iterations=200, seed=0)), budget=MAX_SCHEDULE_GENERATION_TIME),
+    Benchmark('workload_distribute', _workload_setup, _distribute_run),
+    Benchmark('workload_balance', _workload_setup, _balance_run),
+    Benchmark('rl_train', _episodes_setup, _train_run),
+    Benchmark('rl_train_batch', _transitions_setup, _train_batch_run),
+    Benchmark('rl_predict_batch', _predict_setup, _predict_run),
+]
+
+def measure(benchmark: Benchmark, scale: str, seed: int = 0, repeat: int = 3, memory: bool = True) -> Dict:
+    # Best wall time of `repeat` runs, then peak traced memory of one more run
+    # (tracemalloc slows execution down, so it is kept out of the timed runs)
+    factor = SCALES[scale]
+    times = []
+    for _ in range(repeat):
+        sizes, args = benchmark.setup(factor, np.random.default_rng(seed))
+        started = time.perf_counter()
+        metrics = benchmark.run(*args)
+        times.append(time.perf_counter() - started)
+
+    peak = None
+    if memory:
+        _, args = benchmark.setup(factor, np.random.default_rng(seed))
+        tracemalloc.start()
+        try:
+            benchmark.run(*args)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {'benchmark': benchmark.name, 'scale': scale, 'size': sizes, 'seconds': min(times),
+            'seconds_all': times, 'peak_bytes': peak, 'metrics': metrics}
+
+def result_key(result: Dict) -> str:
+    return f"{result['benchmark']}/{result['scale']}"
+
+def check(results: List[Dict], baseline: Optional[Dict] = None, tolerance: float = 0.5) -> List[str]:
+    failures = []
+    budgets = {b.name: b.budget for b in BENCHMARKS}
+    for result in results:
+        key = result_key(result)
+        budget = budgets.get(result['benchmark'])
+        if budget is not None and result['seconds'] > budget:
+            failures.append(f"{key}: {result['seconds']:.3f}s exceeds the {budget}s budget")
+        accuracy = result['metrics'].get('accuracy')
+        if accuracy is not None and accuracy < MIN_RESOURCE_ALLOCATION_ACCURACY:
+            failures.append(f"{key}: accuracy {accuracy:.3f} below {MIN_RESOURCE_ALLOCATION_ACCURACY}")
+        if baseline and key in baseline and result['seconds'] > baseline[key] * (1 + tolerance):
+            failures.append(f"{key}: {result['seconds']:.3f}s is more than {tolerance:.0%} slower "
+                            f"than the baseline {baseline[key]:.3f}s")
+    return failures
+
+def run_suite(scales: Sequence[str] = DEFAULT_SCALES, names: Optional[Sequence[str]] = None, seed: int = 0,
+              repeat: int = 3, memory: bool = True, baseline: Optional[Dict] = None, tolerance: float = 0.5) -> Dict:
+    selected = [b for b in BENCHMARKS if names is None or b.name in names]
+    results = [measure(benchmark, scale, seed, repeat, memory) for scale in scales for benchmark in selected]
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'seed': seed,
+        'results': results,
+        'failures': check(results, baseline, tolerance)
+    }
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Time and profile the OPDPS planning components")
+    parser.add_argument('--scales', nargs='+', choices=sorted(SCALES), default=list(DEFAULT_SCALES))
+    parser.add_argument('--benchmarks', nargs='+', choices=[b.name for b in BENCHMARKS])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc peak memory run")
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="JSON of 'benchmark/scale' -> seconds")
+    parser.add_argument('--tolerance', type=float, default=0.5, help="allowed slowdown over the baseline (0.5 = 50%%)")
+    parser.add_argument('--save-baseline', help="write this run's timings as a new baseline")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    report = run_suite(args.scales, args.benchmarks, args.seed, max(1, args.repeat), not args.no_memory,
+                       baseline, args.tolerance)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({result_key(r): r['seconds'] for r in report['results']}, f, indent=2, sort_keys=True)
+    for failure in report['failures']:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if report['failures'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,44 @@
 # Database configuration
 DB_NAME = 'opdps.db'
+DB_POOL_SIZE = 8  # idle connections kept for reuse by later requests
 
 # Performance settings
 MAX_SCHEDULE_GENERATION_TIME = 300  # seconds
 MIN_RESOURCE_ALLOCATION_ACCURACY = 0.8
 
+# Scheduling settings
+DAY_START = 9 * 60  # opening time, in minutes since midnight
+DAY_END = 17 * 60  # closing time
+SCHEDULER_ENGINE = 'greedy'  # 'greedy' or 'local_search'
+SCHEDULE_OVERTIME_LIMIT = 60  # minutes past closing the local search may book
+SCHEDULE_MAX_STALL_ITERATIONS = 2000  # local search stops early after this many non-improving moves
+PLANNING_MAX_WORKERS = None  # processes for multi-clinic/multi-day planning, None for all cores
+
+# Workload settings
+MAX_STAFF_WORKLOAD = 8  # hours of task load before a staff member stops taking tasks
+
+# RL model settings
+MODEL_DIR = 'models'  # versioned Q-tables shared read-only by all workers
+
+# Ingest settings
+INGEST_BATCH_SIZE = 5000  # records written per transaction
+INGEST_MAX_REPORTED_REJECTIONS = 1000  # rejected records listed in the response (all are counted)
+
+# API settings
+SCHEDULE_PAGE_SIZE = 200  # default rows per /api/get_schedule page
+
+# Job settings
+JOB_MAX_WORKERS = 2  # planning jobs running at the same time
+JOB_MAX_PENDING = 50  # queued plus running jobs before new submissions are refused
+JOB_PROGRESS_INTERVAL = 1.0  # seconds between progress reports of a running search
+
+# Observability settings
+LOG_MAX_BYTES = 10 * 1024 * 1024  # size of each rotated log file
+LOG_BACKUP_COUNT = 10
+PROFILE_SLOW_REQUEST_SECONDS = None  # requests slower than this dump sampled stacks; None disables profiling
+PROFILE_SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+PROFILE_DIR = 'logs/profiles'  # collapsed-stack files for flamegraph.pl / speedscope
+
 # Security settings
 AUTHENTICATION_METHOD = 'basic'
 ENCRYPT_DATA_AT_REST = True
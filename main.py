@@ -1,183 +1,106 @@
+import functools
 import streamlit as st
-import numpy as np
-import pandas as pd
-from typing import List, Dict
-from datetime import datetime, timedelta
-
-# Data structures
-class Staff:
-    def __init__(self, id, name, role, availability):
-        self.id = id
-        self.name = name
-        self.role = role
-        self.availability = availability
-
-class Patient:
-    def __init__(self, id, name, appointment_time):
-        self.id = id
-        self.name = name
-        self.appointment_time = appointment_time
-
-class Equipment:
-    def __init__(self, id, type, availability):
-        self.id = id
-        self.type = type
-        self.availability = availability
-
-class Schedule:
-    def __init__(self, date, assignments):
-        self.date = date
-        self.assignments = assignments
-
-# Core models
-class ResourceAllocator:
-    def allocate_resources(self, staff: List[Staff], patients: List[Patient], equipment: List[Equipment]):
-        allocations = []
-        for patient in patients:
-            allocated_staff = next((s for s in staff if s.availability), None)
-            allocated_equipment = next((e for e in equipment if e.availability), None)
-            if allocated_staff and allocated_equipment:
-                allocations.append({
-                    'patient': patient,
-                    'staff': allocated_staff,
-                    'equipment': allocated_equipment
-                })
-                allocated_staff.availability = False
-                allocated_equipment.availability = False
-            else:
-                allocations.append({
-                    'patient': patient,
-                    'staff': None,
-                    'equipment': None
-                })
-        return allocations
-
-class Scheduler:
-    def generate_daily_schedule(self, resources: List[Dict], appointments: List[Dict]):
-        daily_schedule = []
-        current_time = datetime.now().replace(hour=9, minute=0, second=0, microsecond=0)
-        end_time = current_time.replace(hour=17, minute=0)
-
-        for appointment in appointments:
-            if current_time >= end_time:
-                break
-
-            patient = appointment['patient']
-            staff = next((r for r in resources if r['staff'] and r['staff'].availability), None)
-            equipment = next((r for r in resources if r['equipment'] and r['equipment'].availability), None)
-
-            if staff and equipment:
-                duration = timedelta(minutes=30)
-                daily_schedule.append({
-                    'time': current_time,
-                    'patient': patient,
-                    'staff': staff['staff'],
-                    'equipment': equipment['equipment']
-                })
-                current_time += duration
-                staff['staff'].availability = False
-                equipment['equipment'].availability = False
-            else:
-                daily_schedule.append({
-                    'time': current_time,
-                    'patient': patient,
-                    'staff': None,
-                    'equipment': None
-                })
-                current_time += timedelta(minutes=15)
-
-        return Schedule(datetime.now().date(), daily_schedule)
-
-class WorkloadDistributor:
-    def distribute_workload(self, staff: List[Staff], tasks: List[Dict]):
-        distributed_tasks = []
-        staff_workload = {s.id: 0 for s in staff}
-
-        for task in tasks:
-            available_staff = [s for s in staff if s.availability]
-            if not available_staff:
-                distributed_tasks.append({
-                    'task': task,
-                    'assigned_to': None
-                })
-                continue
-
-            assigned_staff = min(available_staff, key=lambda s: staff_workload[s.id])
-            distributed_tasks.append({
-                'task': task,
-                'assigned_to': assigned_staff
-            })
-            staff_workload[assigned_staff.id] += task.get('duration', 1)
-
-            if staff_workload[assigned_staff.id] >= 8:
-                assigned_staff.availability = False
-
-        return distributed_tasks
-
-class RLModel:
-    def __init__(self, state_size: int, action_size: int):
-        self.state_size = state_size
-        self.action_size = action_size
-        self.q_table = np.zeros((state_size, action_size))
-
-    def predict(self, state: Dict) -> int:
-        state_index = hash(frozenset(state.items())) % self.state_size
-        return np.argmax(self.q_table[state_index])
-
-# Streamlit app
+
+# Streamlit front end for the src/ package. Heavy modules are imported inside
+# the cached functions, so a rerun only pays for them on a cache miss. Every
+# cached function takes plain values only: the dataset is keyed by its sizes
+# and seed, and the results also by the published RL model version.
+
+# cache_resource/cache_data replaced st.cache in Streamlit 1.18
+cache_resource = getattr(st, 'cache_resource', None) or functools.partial(st.cache, allow_output_mutation=True)
+cache_data = getattr(st, 'cache_data', None) or st.cache
+
+DATE = '2023-05-01'
+
+def clear_cache(*functions):
+    for function in functions:
+        if hasattr(function, 'clear'):
+            function.clear()
+        else:
+            st.caching.clear_cache()
+            return
+
+@cache_resource
+def load_model():
+    from config.settings import MODEL_DIR
+    from src.models.rl_model import RLModel
+    from src.models.model_store import ModelStore
+    return RLModel(state_size=1000, action_size=10), ModelStore(MODEL_DIR)
+
+def model_version():
+    # One stat per rerun; a newly published version changes the results key
+    rl_model, model_store = load_model()
+    model_store.refresh(rl_model)
+    return rl_model.model_version
+
+@cache_data
+def load_dataset(n_staff: int, n_patients: int, n_equipment: int, seed: int):
+    from src.ui.dashboard import generate_dataset
+    return generate_dataset(n_staff, n_patients, n_equipment, seed=seed, date=DATE)
+
+@cache_data
+def run_simulation(n_staff: int, n_patients: int, n_equipment: int, seed: int, engine: str, version):
+    from src.ui.dashboard import run_pipeline
+    staff, patients, equipment = load_dataset(n_staff, n_patients, n_equipment, seed)
+    rl_model, _ = load_model()
+    return run_pipeline(staff, patients, equipment, rl_model, engine=engine, seed=seed, date=DATE)
+
+def show_page(frame, key: str, page_size: int):
+    # Only one page of a large frame is sent to the browser per rerun
+    pages = max(1, -(-len(frame) // page_size))
+    page = int(st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1, key=key))
+    st.dataframe(frame.iloc[(page - 1) * page_size:page * page_size])
+    st.caption(f"Rows {min(len(frame), (page - 1) * page_size + 1)}-{min(len(frame), page * page_size)} of {len(frame)}")
+
 st.title('OPDPS - Outpatient Department Planning System')
 
 st.write("""
-This MVP demonstrates the core functionality of resource allocation, scheduling, 
-workload distribution, and reinforcement learning-based optimization for an 
+This MVP demonstrates the core functionality of resource allocation, scheduling,
+workload distribution, and reinforcement learning-based optimization for an
 outpatient department planning system.
 """)
 
-# Initialize models
-resource_allocator = ResourceAllocator()
-scheduler = Scheduler()
-workload_distributor = WorkloadDistributor()
-rl_model = RLModel(state_size=1000, action_size=10)
+with st.sidebar:
+    n_staff = int(st.number_input('Staff', min_value=1, value=10, step=1))
+    n_patients = int(st.number_input('Patients', min_value=1, value=20, step=1))
+    n_equipment = int(st.number_input('Equipment', min_value=1, value=5, step=1))
+    seed = int(st.number_input('Seed', min_value=0, value=0, step=1))
+    engine = st.selectbox('Scheduler', ['greedy', 'local_search'])
+    page_size = int(st.selectbox('Rows per page', [25, 50, 100, 500], index=1))
+    if st.button('Clear cached data'):
+        clear_cache(load_dataset, run_simulation, load_model)
+        st.session_state.pop('simulation', None)
+
+# Results stay on screen across reruns (e.g. paging) until the inputs change
+params = (n_staff, n_patients, n_equipment, seed, engine)
+if st.button('Run Simulation'):
+    st.session_state['simulation'] = params
+elif st.session_state.get('simulation') != params:
+    st.session_state.pop('simulation', None)
 
-# Simulate data
-staff = [Staff(i, f"Staff {i}", "Doctor" if i % 3 == 0 else "Nurse", True) for i in range(10)]
-patients = [Patient(i, f"Patient {i}", f"2023-05-{i+1:02d} 09:00") for i in range(20)]
-equipment = [Equipment(i, f"Equipment {i}", True) for i in range(5)]
+if 'simulation' in st.session_state:
+    with st.spinner('Running simulation...'):
+        results = run_simulation(*params, model_version())
 
-if st.button('Run Simulation'):
     # 1. Allocate resources
-    allocations = resource_allocator.allocate_resources(staff, patients, equipment)
     st.subheader('Resource Allocations')
-    alloc_df = pd.DataFrame([(a['patient'].name, a['staff'].name if a['staff'] else 'N/A', a['equipment'].type if a['equipment'] else 'N/A') for a in allocations],
-                            columns=['Patient', 'Staff', 'Equipment'])
-    st.dataframe(alloc_df)
+    show_page(results['allocations'], 'allocations_page', page_size)
 
     # 2. Generate schedule
-    schedule = scheduler.generate_daily_schedule(allocations, [{'patient': p} for p in patients])
     st.subheader('Daily Schedule')
-    schedule_df = pd.DataFrame([(s['time'].strftime('%H:%M'), s['patient'].name, s['staff'].name if s['staff'] else 'N/A', s['equipment'].type if s['equipment'] else 'N/A') for s in schedule.assignments],
-                               columns=['Time', 'Patient', 'Staff', 'Equipment'])
-    st.dataframe(schedule_df)
+    st.write(f"{results['scheduled']} of {results['patients']} patients scheduled")
+    show_page(results['schedule'], 'schedule_page', page_size)
 
     # 3. Distribute workload
-    tasks = [{'id': i, 'duration': np.random.randint(1, 4)} for i in range(len(patients))]
-    distributed_tasks = workload_distributor.distribute_workload(staff, tasks)
     st.subheader('Distributed Tasks')
-    tasks_df = pd.DataFrame([(dt['task']['id'], dt['assigned_to'].name if dt['assigned_to'] else 'Unassigned') for dt in distributed_tasks],
-                            columns=['Task ID', 'Assigned To'])
-    st.dataframe(tasks_df)
+    show_page(results['workload'], 'workload_page', page_size)
 
     # 4. Use RL model to optimize (simplified for demonstration)
-    state = {
-        'staff_available': sum(1 for s in staff if s.availability),
-        'patients_waiting': len(patients)
-    }
-    action = rl_model.predict(state)
     st.subheader('RL Model Action')
-    st.write(f"The RL model suggested action: {action}")
+    st.write(f"The RL model suggested action: {results['rl_action']}")
 
 st.write("""
-This simulation demonstrates the basic functionality of the OPDPS. 
-In a real-world scenario, the system would be more complex and would 
+This simulation demonstrates the basic functionality of the OPDPS.
+In a real-world scenario, the system would be more complex and would
 interact with real hospital data and systems.
-""")
\ No newline at end of file
+""")
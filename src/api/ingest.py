@@ -0,0 +1,258 @@
+import codecs
+import json
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from config.settings import INGEST_BATCH_SIZE, INGEST_MAX_REPORTED_REJECTIONS
+from src.data.staff import Staff
+from src.data.patient import Patient
+from src.data.equipment import Equipment
+from src.utils.database import Database, format_date
+
+CHUNK_SIZE = 64 * 1024
+
+class IngestError(Exception):
+    pass
+
+def _iter_chunks(stream, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    while True:
+        chunk = stream.read(chunk_size)
+        try:
+            text = decoder.decode(chunk, final=not chunk)
+        except UnicodeDecodeError as e:
+            raise IngestError(f"Request body is not valid UTF-8: {e.reason}")
+        if text:
+            yield text
+        if not chunk:
+            return
+
+def iter_ndjson(chunks: Iterator[str]) -> Iterator[Tuple[int, object]]:
+    # (line number, decoded value or the ValueError raised while decoding)
+    buffer = ''
+    line_no = 0
+    for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split('\n')
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                yield line_no, _decode(line)
+    if buffer.strip():
+        yield line_no + 1, _decode(buffer)
+
+def _decode(text: str):
+    try:
+        return json.loads(text)
+    except ValueError as e:
+        return e
+
+def iter_json_array(chunks: Iterator[str]) -> Iterator[Tuple[int, object]]:
+    # Incrementally decode a top-level JSON array, holding only the unparsed
+    # tail in memory. Records are numbered from 1 in array order; like
+    # iter_ndjson, a malformed record is yielded as its ValueError and parsing
+    # resumes after it, at the next top-level ',' or ']'.
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    record_no = 0
+    exhausted = False
+    skipping = None
+    chunks = iter(chunks)
+
+    while True:
+        if skipping is not None:
+            position, skipping = _skip_record(buffer, position, skipping)
+            if skipping is None:
+                continue
+            if exhausted:
+                raise IngestError("Unexpected end of JSON array")
+            buffer, position = '', 0
+            try:
+                buffer = next(chunks)
+            except StopIteration:
+                exhausted = True
+            continue
+
+        # Skip whitespace and separators between elements
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position >= len(buffer):
+            if exhausted:
+                raise IngestError("Unexpected end of JSON array")
+            try:
+                buffer = buffer[position:] + next(chunks)
+                position = 0
+            except StopIteration:
+                exhausted = True
+            continue
+
+        if not started:
+            if buffer[position] != '[':
+                raise IngestError("Expected a JSON array of records")
+            started = True
+            position += 1
+            continue
+        if buffer[position] == ']':
+            return
+
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+            # A number or literal ending with the buffer may continue in the next chunk
+            incomplete = end >= len(buffer) and not exhausted
+        except json.JSONDecodeError as e:
+            if exhausted or not _truncated(e, buffer):
+                record_no += 1
+                yield record_no, ValueError(e.msg)
+                skipping = (0, False, False)
+                continue
+            incomplete = True
+        if incomplete:
+            # A record split across chunks: read more and retry
+            try:
+                buffer = buffer[position:] + next(chunks)
+                position = 0
+            except StopIteration:
+                exhausted = True
+            continue
+        record_no += 1
+        position = end
+        yield record_no, value
+
+def _truncated(error: json.JSONDecodeError, buffer: str) -> bool:
+    # Errors caused by the end of the buffer rather than by the record itself:
+    # an open string, or a token cut off within the last few characters
+    return error.msg.startswith('Unterminated string') or error.pos >= len(buffer) - 16
+
+def _skip_record(buffer: str, position: int, state: Tuple[int, bool, bool]):
+    # Scan past one (malformed) record to the next top-level ',' or ']'. Returns
+    # (position, None) when found, else (end of buffer, scanner state) to resume
+    # on the next chunk. Brackets of either kind are only counted, not matched.
+    depth, in_string, escaped = state
+    for i in range(position, len(buffer)):
+        char = buffer[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '[{':
+            depth += 1
+        elif char in ']}':
+            if depth == 0:
+                return i, None
+            depth -= 1
+        elif char == ',' and depth == 0:
+            return i, None
+    return len(buffer), (depth, in_string, escaped)
+
+def _require(record: Dict, field: str, kind: type):
+    value = record.get(field)
+    if value is None:
+        raise ValueError(f"missing field '{field}'")
+    if kind is int:
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError(f"field '{field}' must be an integer")
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError(f"field '{field}' must be an integer")
+    if not isinstance(value, kind) or (isinstance(value, str) and not value.strip()):
+        raise ValueError(f"field '{field}' must be a non-empty {kind.__name__}")
+    return value
+
+def _availability(record: Dict) -> bool:
+    value = record.get('availability', True)
+    if not isinstance(value, bool):
+        raise ValueError("field 'availability' must be a boolean")
+    return value
+
+def to_entity(kind: str, record: Dict):
+    # Validate one record and convert it to the matching data object
+    if not isinstance(record, dict):
+        raise ValueError("record must be a JSON object")
+    if kind == 'staff':
+        return Staff(_require(record, 'id', int), _require(record, 'name', str), _require(record, 'role', str), _availability(record))
+    if kind == 'patient':
+        appointment_time = _require(record, 'appointment_time', str)
+        try:
+            datetime.strptime(appointment_time, '%Y-%m-%d %H:%M')
+        except ValueError:
+            raise ValueError("field 'appointment_time' must look like 'YYYY-MM-DD HH:MM'")
+        return Patient(_require(record, 'id', int), _require(record, 'name', str), appointment_time)
+    if kind == 'equipment':
+        return Equipment(_require(record, 'id', int), _require(record, 'type', str), _availability(record))
+    raise ValueError(f"unknown kind '{kind}'")
+
+KIND_ALIASES = {'staff': 'staff', 'patient': 'patient', 'patients': 'patient', 'equipment': 'equipment'}
+
+def ingest_stream(stream, database: Database, content_type: Optional[str] = None, default_kind: Optional[str] = None,
+                  clinic: str = '', batch_size: int = INGEST_BATCH_SIZE) -> Dict:
+    # Stream records from NDJSON or a JSON array into the database. Each record
+    # names its type in 'kind' (or all records use `default_kind`). Valid records
+    # are written in transactions of `batch_size`; invalid ones are reported.
+    chunks = _iter_chunks(stream)
+    first = ''
+    for first in chunks:
+        if first.strip():
+            break
+    body = _prepend(first, chunks)
+    if first.lstrip().startswith('['):
+        records = iter_json_array(body)
+    elif content_type in (None, 'application/json', 'application/x-ndjson', 'application/jsonl', 'application/ndjson', 'text/plain'):
+        records = iter_ndjson(body)
+    else:
+        raise IngestError(f"Unsupported content type: {content_type}")
+
+    pending: Dict[str, List] = {'staff': [], 'patient': [], 'equipment': []}
+    summary = {'accepted': 0, 'rejected_count': 0, 'rejected': [], 'batches': [], 'dates': set(), 'resources_changed': False}
+
+    for number, record in records:
+        try:
+            if isinstance(record, ValueError):
+                raise ValueError(f"invalid JSON: {record}")
+            kind = record.get('kind', default_kind) if isinstance(record, dict) else default_kind
+            kind = KIND_ALIASES.get(kind) if isinstance(kind, str) else None
+            if kind is None:
+                raise ValueError("missing or unknown 'kind'")
+            pending[kind].append(to_entity(kind, record))
+        except ValueError as e:
+            summary['rejected_count'] += 1
+            if len(summary['rejected']) < INGEST_MAX_REPORTED_REJECTIONS:
+                summary['rejected'].append({'record': number, 'error': str(e)})
+            continue
+
+        if sum(len(entities) for entities in pending.values()) >= batch_size:
+            _flush(database, pending, clinic, summary)
+    _flush(database, pending, clinic, summary)
+
+    summary['dates'] = sorted(summary['dates'])
+    return summary
+
+def _prepend(first: str, chunks: Iterator[str]) -> Iterator[str]:
+    if first:
+        yield first
+    yield from chunks
+
+def _flush(database: Database, pending: Dict[str, List], clinic: str, summary: Dict):
+    if not any(pending.values()):
+        return
+    with database.transaction():
+        # Patients moved to another date leave their old date's schedule stale too
+        summary['dates'].update(database.get_patient_dates(p.id for p in pending['patient']))
+        database.upsert_staff(pending['staff'], clinic)
+        database.upsert_patients(pending['patient'], clinic)
+        database.upsert_equipment(pending['equipment'], clinic)
+
+    counts = {'staff': len(pending['staff']), 'patients': len(pending['patient']), 'equipment': len(pending['equipment'])}
+    summary['batches'].append(dict(counts, batch=len(summary['batches']) + 1))
+    summary['accepted'] += sum(counts.values())
+    summary['dates'].update(format_date(p.appointment_time) for p in pending['patient'])
+    if pending['staff'] or pending['equipment']:
+        summary['resources_changed'] = True
+    for entities in pending.values():
+        entities.clear()
@@ -1,15 +1,306 @@
-from flask import Blueprint, request, jsonify
+import threading
+import time
+from datetime import datetime
+from flask import Blueprint, request, jsonify, current_app, g
+from config.settings import (INGEST_BATCH_SIZE, SCHEDULE_PAGE_SIZE, PROFILE_SLOW_REQUEST_SECONDS,
+                             PROFILE_SAMPLE_INTERVAL, PROFILE_DIR, MAX_SCHEDULE_GENERATION_TIME)
+from src.api.ingest import ingest_stream, to_entity, IngestError
+from src.models.rescheduler import Rescheduler
+from src.models.scheduler import build_resources
+from src.services.analytics import Analytics, PERIODS
+from src.services.jobs import JobManager, JobQueueFull, planning_runner
+from src.services.planning import plan_day
+from src.services.schedule_cache import ScheduleCache, StaleSchedule
+from src.utils.database import get_database, minute_of_day
+from src.utils.metrics import REGISTRY, REQUEST_SECONDS, SLOW_REQUESTS, SamplingProfiler
 
 api = Blueprint('api', __name__)
+_cache_lock = threading.Lock()
+
+def _database():
+    # Tests and embedding apps can supply their own Database through app.config
+    return current_app.config.get('DATABASE') or get_database()
+
+def _schedule_cache() -> ScheduleCache:
+    with _cache_lock:
+        cache = current_app.extensions.get('opdps_schedule_cache')
+        if cache is None:
+            database = _database()
+
+            # Reads only plan; schedules are persisted by the planning jobs and reschedule
+            def compute(date):
+                resources = build_resources(database.get_staff(), database.get_equipment())
+                return plan_day(resources, database.get_patients(date), date), resources
+
+            cache = current_app.extensions['opdps_schedule_cache'] = ScheduleCache(compute)
+        return cache
+
+def _job_manager() -> JobManager:
+    cache = _schedule_cache()
+    with _cache_lock:
+        jobs = current_app.extensions.get('opdps_jobs')
+        if jobs is None:
+            database = _database()
+            jobs = current_app.extensions['opdps_jobs'] = JobManager(
+                database, {'plan': planning_runner(database, cache=cache)})
+        return jobs
+
+def _profiler():
+    # Sampling profiler for slow requests, enabled by PROFILE_SLOW_REQUEST_SECONDS
+    # (or the app config key of the same name)
+    threshold = current_app.config.get('PROFILE_SLOW_REQUEST_SECONDS', PROFILE_SLOW_REQUEST_SECONDS)
+    if threshold is None:
+        return None
+    with _cache_lock:
+        profiler = current_app.extensions.get('opdps_profiler')
+        if profiler is None:
+            profiler = current_app.extensions['opdps_profiler'] = SamplingProfiler(
+                current_app.config.get('PROFILE_DIR', PROFILE_DIR), threshold,
+                current_app.config.get('PROFILE_SAMPLE_INTERVAL', PROFILE_SAMPLE_INTERVAL))
+        return profiler
+
+@api.before_app_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+    g.profiler = _profiler()
+    if g.profiler is not None:
+        g.profiler.start()
+
+@api.teardown_app_request
+def _release_connection(exc):
+    # Request threads are short-lived; return their connection to the pool
+    _database().release()
+
+@api.after_app_request
+def _observe_request(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    REQUEST_SECONDS.observe(elapsed, method=request.method, endpoint=endpoint, status=response.status_code)
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        samples = profiler.stop()
+        if elapsed >= profiler.threshold:
+            SLOW_REQUESTS.inc(endpoint=endpoint)
+            path = profiler.dump(f"{request.method}-{endpoint}", samples)
+            current_app.logger.warning(f"Slow request {request.method} {request.path}: {elapsed:.3f}s, stacks in {path}")
+    return response
+
+@api.route('/metrics', methods=['GET'])
+def metrics():
+    return current_app.response_class(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 @api.route('/api/input_data', methods=['POST'])
 def receive_data():
-    data = request.json
-    # TODO: Process and store the input data
-    return jsonify({"message": "Data received successfully"}), 200
+    # Streams NDJSON (one record per line) or a JSON array of records straight
+    # into the database in batches; the body is never loaded as a whole
+    try:
+        summary = ingest_stream(
+            request.stream,
+            _database(),
+            content_type=request.mimetype or None,
+            default_kind=request.args.get('kind'),
+            clinic=request.args.get('clinic', ''),
+            batch_size=max(1, request.args.get('batch_size', INGEST_BATCH_SIZE, type=int))
+        )
+    except IngestError as e:
+        return jsonify({"error": str(e)}), 400
+
+    current_app.logger.info(f"Ingested {summary['accepted']} records, rejected {summary['rejected_count']}")
+    # Staff or equipment changes affect every day; patients only their own dates
+    if summary['resources_changed']:
+        _schedule_cache().invalidate()
+    elif summary['dates']:
+        _schedule_cache().invalidate(summary['dates'])
+    return jsonify(dict(summary, message="Data received successfully")), 200
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value or '', '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        return None
+
+@api.route('/api/reschedule', methods=['POST'])
+def reschedule():
+    # Repairs a date's current schedule for intraday changes and returns the diff.
+    # Body: {"date", optional "now" ("HH:MM"), "cancelled" (patient ids),
+    # "late" ({patient id: minutes}), "added" (patient records, optional
+    # "duration"), "staff_out" / "equipment_out" (ids or {"id", "from", "until"}
+    # with "HH:MM" times)}. A later full replan of the date starts over.
+    body = request.get_json(silent=True) or {}
+    date = _parse_date(body.get('date'))
+    if date is None:
+        return jsonify({"error": "Field 'date' must be YYYY-MM-DD"}), 400
+
+    try:
+        delta = {
+            'cancelled': [int(i) for i in body.get('cancelled', [])],
+            'late': {int(i): int(minutes) for i, minutes in body.get('late', {}).items()},
+            'added': [],
+            'staff_out': [_outage(o) for o in body.get('staff_out', [])],
+            'equipment_out': [_outage(o) for o in body.get('equipment_out', [])]
+        }
+        if body.get('now') is not None:
+            delta['now'] = _minute(body['now'])
+        added = []
+        for record in body.get('added', []):
+            patient = to_entity('patient', record)
+            added.append(patient)
+            delta['added'].append({'patient': patient, 'duration': int(record.get('duration', 30)),
+                                   'earliest': minute_of_day(patient.appointment_time)})
+    except (AttributeError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid delta: {e}"}), 400
+
+    # The date lock makes concurrent reschedules of one date apply in turn; an
+    # ingest that invalidates the date meanwhile makes the update fail with 409
+    cache = _schedule_cache()
+    database = _database()
+    with cache.locked(date):
+        base = cache.get(date)
+        try:
+            schedule, diff = Rescheduler().repair(base.schedule, base.resources, delta)
+        except KeyError as e:
+            return jsonify({"error": f"Unknown resource {e}"}), 400
+
+        try:
+            with database.transaction():
+                left = set(database.get_patient_dates(p.id for p in added)) - {date}
+                database.upsert_patients(added)
+                database.delete_patients(delta['cancelled'])
+                database.save_schedule(schedule)
+                entry = cache.put(date, schedule, base.resources, base=base)
+        except StaleSchedule as e:
+            return jsonify({"error": str(e)}), 409
+    if left:
+        cache.invalidate(left)
+    response = jsonify({'date': date, 'changes': diff, 'metrics': entry.metrics})
+    response.set_etag(entry.etag)
+    return response
+
+def _minute(value) -> int:
+    minute = minute_of_day(value)
+    if minute is None:
+        raise ValueError(f"'{value}' is not an HH:MM time")
+    return minute
+
+def _outage(value):
+    if not isinstance(value, dict):
+        return int(value)
+    outage = {'id': int(value['id'])}
+    for bound in ('from', 'until'):
+        if value.get(bound) is not None:
+            outage[bound] = _minute(value[bound])
+    return outage
 
 @api.route('/api/get_schedule', methods=['GET'])
 def return_schedule():
-    date = request.args.get('date')
-    # TODO: Generate and return the schedule for the given date
-    return jsonify({"message": "Schedule retrieval not implemented yet"}), 501
\ No newline at end of file
+    # Served from the per-date cache; clients revalidate with If-None-Match.
+    # Optional resource_type/resource_id restrict the rows to one staff member,
+    # piece of equipment or patient, and page/page_size paginate them.
+    date = _parse_date(request.args.get('date'))
+    if date is None:
+        return jsonify({"error": "Query parameter 'date' must be YYYY-MM-DD"}), 400
+    resource_type = request.args.get('resource_type')
+    resource_id = request.args.get('resource_id', type=int)
+    if resource_type is not None and (resource_type not in ('staff', 'equipment', 'patient') or resource_id is None):
+        return jsonify({"error": "resource_type must be staff, equipment or patient, with an integer resource_id"}), 400
+    page = max(1, request.args.get('page', 1, type=int))
+    page_size = min(max(1, request.args.get('page_size', SCHEDULE_PAGE_SIZE, type=int)), 10 * SCHEDULE_PAGE_SIZE)
+
+    entry = _schedule_cache().get(date)
+    etag = entry.etag
+    if resource_type is not None or request.args.get('page') or request.args.get('page_size'):
+        etag = f"{etag}-{resource_type or 'all'}-{resource_id}-{page}-{page_size}"
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    if resource_type is None:
+        positions = range(len(entry.rows))
+    else:
+        positions = entry.by_resource.get((resource_type, resource_id), [])
+    start = (page - 1) * page_size
+    response = jsonify({
+        'date': date,
+        'total': len(positions),
+        'page': page,
+        'page_size': page_size,
+        'assignments': [entry.rows[i] for i in positions[start:start + page_size]],
+        'metrics': entry.metrics
+    })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@api.route('/api/jobs', methods=['POST'])
+def submit_job():
+    # Queues a planning job and returns at once; poll /api/jobs/<id> for progress.
+    # Body: {"date", optional "engine" ("greedy" or "local_search") and
+    # "time_limit" (seconds of search, at most MAX_SCHEDULE_GENERATION_TIME)}.
+    # An identical job that is still queued or running is returned instead.
+    body = request.get_json(silent=True) or {}
+    kind = body.get('kind', 'plan')
+    date = _parse_date(body.get('date'))
+    if kind != 'plan' or date is None:
+        return jsonify({"error": "Only 'plan' jobs with a 'date' (YYYY-MM-DD) are supported"}), 400
+    params = {'date': date}
+    if body.get('engine') is not None:
+        if body['engine'] not in ('greedy', 'local_search'):
+            return jsonify({"error": "engine must be greedy or local_search"}), 400
+        params['engine'] = body['engine']
+    if body.get('time_limit') is not None:
+        try:
+            params['time_limit'] = min(max(float(body['time_limit']), 0.0), MAX_SCHEDULE_GENERATION_TIME)
+        except (TypeError, ValueError):
+            return jsonify({"error": "time_limit must be a number of seconds"}), 400
+
+    try:
+        job, created = _job_manager().submit(kind, params)
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 429
+    response = jsonify({'job_id': job.id, 'status': job.status, 'deduplicated': not created})
+    response.status_code = 202
+    response.headers['Location'] = f"/api/jobs/{job.id}"
+    return response
+
+@api.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    limit = min(max(1, request.args.get('limit', 100, type=int)), 1000)
+    return jsonify({'jobs': _job_manager().list(status=request.args.get('status'), limit=limit)})
+
+@api.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    # ?partial=1 adds the best schedule found so far while the job runs
+    job = _job_manager().get(job_id, partial=request.args.get('partial') in ('1', 'true'))
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job)
+
+@api.route('/api/jobs/<job_id>', methods=['DELETE'])
+@api.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = _job_manager().cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job)
+
+@api.route('/api/analytics', methods=['GET'])
+def analytics():
+    # Utilization and patient KPIs per period for start..end (YYYY-MM-DD);
+    # ?rollups=1 reads the precomputed daily rollups instead of assignments
+    start = _parse_date(request.args.get('start'))
+    end = _parse_date(request.args.get('end'))
+    if start is None or end is None:
+        return jsonify({"error": "Query parameters 'start' and 'end' must be YYYY-MM-DD"}), 400
+    period = request.args.get('period', 'month')
+    if period not in PERIODS:
+        return jsonify({"error": f"period must be one of {', '.join(PERIODS)}"}), 400
+    report = Analytics(_database()).report(start, end, period, clinic=request.args.get('clinic'),
+                                           rollups=request.args.get('rollups') in ('1', 'true'))
+    # NaN (e.g. no waits in a period) is not valid JSON
+    return jsonify({name: frame.astype(object).where(frame.notna(), None).to_dict(orient='records')
+                    for name, frame in report.items()})
@@ -0,0 +1,186 @@
+import numpy as np
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+from src.data.staff import Staff
+from src.data.patient import Patient
+from src.data.equipment import Equipment
+from src.data.schedule import Schedule
+
+# Column-oriented tables for large multi-day, multi-site data sets: one NumPy
+# array per field instead of one object per record. IDs are int64, times are
+# minutes since midnight, dates are datetime64[D] and roles/types are stored as
+# int32 codes into a sorted list of categories.
+
+NO_ID = -1
+NO_TIME = -1
+
+def encode_categories(values: Sequence) -> Tuple[np.ndarray, List[str]]:
+    # (codes, categories) with codes[i] indexing categories
+    values = np.asarray(values, dtype=str)
+    if not len(values):
+        return np.zeros(0, dtype=np.int32), []
+    categories, codes = np.unique(values, return_inverse=True)
+    return codes.astype(np.int32), categories.tolist()
+
+def _ids(values: Sequence) -> np.ndarray:
+    return np.asarray([NO_ID if v is None else v for v in values], dtype=np.int64)
+
+class ColumnarTable:
+    # Subclasses name their columns and which of them are categorical
+    columns: tuple = ()
+    categorical: tuple = ()
+
+    def __init__(self, categories: Optional[Dict[str, List[str]]] = None, **columns):
+        categories = categories or {}
+        self.data: Dict[str, np.ndarray] = {name: np.asarray(columns[name]) for name in self.columns}
+        self.categories: Dict[str, List[str]] = {name: list(categories.get(name, [])) for name in self.categorical}
+        lengths = {len(column) for column in self.data.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Columns of {type(self).__name__} have different lengths: {sorted(lengths)}")
+
+    def __len__(self):
+        return len(self.data[self.columns[0]]) if self.columns else 0
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.data[name]
+
+    def labels(self, name: str) -> np.ndarray:
+        # Category values of a categorical column, one per row
+        categories = np.asarray(self.categories[name], dtype=object)
+        return categories[self.data[name]] if len(categories) else np.zeros(0, dtype=object)
+
+    def take(self, rows) -> 'ColumnarTable':
+        # Row subset by index array or boolean mask; categories are shared
+        table = type(self).__new__(type(self))
+        table.data = {name: column[rows] for name, column in self.data.items()}
+        table.categories = self.categories
+        self._copy_extra(table)
+        return table
+
+    def _copy_extra(self, table: 'ColumnarTable'):
+        pass
+
+    def to_pandas(self):
+        import pandas as pd
+        frame = {}
+        for name in self.columns:
+            if name in self.categorical:
+                frame[name] = pd.Categorical.from_codes(self.data[name], self.categories[name])
+            else:
+                frame[name] = self.data[name]
+        return pd.DataFrame(frame)
+
+    @classmethod
+    def from_pandas(cls, frame) -> 'ColumnarTable':
+        columns = {}
+        categories = {}
+        for name in cls.columns:
+            if name in cls.categorical:
+                if hasattr(frame[name], 'cat'):
+                    columns[name] = frame[name].cat.codes.to_numpy(dtype=np.int32)
+                    categories[name] = [str(c) for c in frame[name].cat.categories]
+                else:
+                    columns[name], categories[name] = encode_categories(frame[name].to_numpy())
+            else:
+                columns[name] = frame[name].to_numpy()
+        return cls(categories=categories, **columns)
+
+class StaffTable(ColumnarTable):
+    columns = ('id', 'name', 'role', 'availability')
+    categorical = ('role',)
+
+    @classmethod
+    def from_objects(cls, staff: List[Staff]) -> 'StaffTable':
+        role, roles = encode_categories([s.role for s in staff])
+        return cls(categories={'role': roles},
+                   id=np.fromiter((s.id for s in staff), dtype=np.int64, count=len(staff)),
+                   name=np.asarray([s.name for s in staff], dtype=object),
+                   role=role,
+                   availability=np.fromiter((bool(s.availability) for s in staff), dtype=bool, count=len(staff)))
+
+    def to_objects(self) -> List[Staff]:
+        return list(map(Staff, self.data['id'].tolist(), self.data['name'].tolist(),
+                        self.labels('role').tolist(), self.data['availability'].tolist()))
+
+class EquipmentTable(ColumnarTable):
+    columns = ('id', 'type', 'availability')
+    categorical = ('type',)
+
+    @classmethod
+    def from_objects(cls, equipment: List[Equipment]) -> 'EquipmentTable':
+        type_codes, types = encode_categories([e.type for e in equipment])
+        return cls(categories={'type': types},
+                   id=np.fromiter((e.id for e in equipment), dtype=np.int64, count=len(equipment)),
+                   type=type_codes,
+                   availability=np.fromiter((bool(e.availability) for e in equipment), dtype=bool, count=len(equipment)))
+
+    def to_objects(self) -> List[Equipment]:
+        return list(map(Equipment, self.data['id'].tolist(), self.labels('type').tolist(),
+                        self.data['availability'].tolist()))
+
+class PatientTable(ColumnarTable):
+    # 'YYYY-MM-DD HH:MM' appointment times split into a date and a minute of the
+    # day; patients without an appointment time have a NaT date and minute NO_TIME
+    columns = ('id', 'name', 'appointment_date', 'appointment_minute')
+
+    @classmethod
+    def from_objects(cls, patients: List[Patient]) -> 'PatientTable':
+        times = np.asarray(['NaT' if p.appointment_time is None else str(p.appointment_time) for p in patients],
+                           dtype='datetime64[m]')
+        dates = times.astype('datetime64[D]')
+        minutes = np.where(np.isnat(times), NO_TIME, (times - dates).astype(np.int64))
+        return cls(id=np.fromiter((p.id for p in patients), dtype=np.int64, count=len(patients)),
+                   name=np.asarray([p.name for p in patients], dtype=object),
+                   appointment_date=dates,
+                   appointment_minute=minutes.astype(np.int32))
+
+    def appointment_times(self) -> np.ndarray:
+        # 'YYYY-MM-DD HH:MM' strings, None where the time is missing
+        times = self.data['appointment_date'].astype('datetime64[m]') + self.data['appointment_minute'].astype('timedelta64[m]')
+        labels = np.char.replace(np.datetime_as_string(times, unit='m'), 'T', ' ').astype(object)
+        labels[np.isnat(times)] = None
+        return labels
+
+    def to_objects(self) -> List[Patient]:
+        return list(map(Patient, self.data['id'].tolist(), self.data['name'].tolist(),
+                        self.appointment_times().tolist()))
+
+class AssignmentTable(ColumnarTable):
+    # A schedule's assignments by id; unassigned staff/equipment are NO_ID
+    columns = ('patient_id', 'staff_id', 'equipment_id', 'start_minute', 'duration')
+
+    def __init__(self, date=None, metrics: Optional[Dict] = None, **columns):
+        super().__init__(**columns)
+        self.date = date
+        self.metrics = metrics if metrics is not None else {}
+
+    def _copy_extra(self, table: 'AssignmentTable'):
+        table.date = self.date
+        table.metrics = self.metrics
+
+    @classmethod
+    def from_schedule(cls, schedule: Schedule) -> 'AssignmentTable':
+        assignments = schedule.assignments
+        return cls(date=schedule.date, metrics=schedule.metrics,
+                   patient_id=_ids([a['patient'].id for a in assignments]),
+                   staff_id=_ids([a['staff']['id'] if a['staff'] is not None else None for a in assignments]),
+                   equipment_id=_ids([a['equipment']['id'] if a['equipment'] is not None else None for a in assignments]),
+                   start_minute=np.asarray([a['time'].hour * 60 + a['time'].minute for a in assignments], dtype=np.int32),
+                   duration=np.asarray([a['duration'] for a in assignments], dtype=np.int32))
+
+    def to_schedule(self, patients: List[Patient], resources: List[Dict]) -> Schedule:
+        # Rebuild assignment dicts against the given patients and resource dicts
+        by_patient = {p.id: p for p in patients}
+        by_resource = {(r['type'], r['id']): r for r in resources}
+        day = datetime.strptime(str(np.datetime64(self.date, 'D')), '%Y-%m-%d')
+        assignments = []
+        for patient_id, staff_id, equipment_id, start, duration in zip(
+                *(self.data[name].tolist() for name in self.columns)):
+            assignments.append({
+                'time': day + timedelta(minutes=start),
+                'duration': duration,
+                'patient': by_patient[patient_id],
+                'staff': by_resource.get(('staff', staff_id)),
+                'equipment': by_resource.get(('equipment', equipment_id))
+            })
+        return Schedule(self.date, assignments, dict(self.metrics))
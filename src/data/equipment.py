@@ -1,4 +1,6 @@
 class Equipment:
+    __slots__ = ('id', 'type', 'availability')
+
     def __init__(self, id, type, availability):
         self.id = id
         self.type = type
@@ -1,4 +1,6 @@
 class Patient:
+    __slots__ = ('id', 'name', 'appointment_time')
+
     def __init__(self, id, name, appointment_time):
         self.id = id
         self.name = name
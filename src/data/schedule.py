@@ -1,4 +1,7 @@
 class Schedule:
-    def __init__(self, date, assignments):
+    __slots__ = ('date', 'assignments', 'metrics')
+
+    def __init__(self, date, assignments, metrics=None):
         self.date = date
-        self.assignments = assignments
\ No newline at end of file
+        self.assignments = assignments
+        self.metrics = metrics if metrics is not None else {}
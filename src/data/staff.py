@@ -1,4 +1,6 @@
 class Staff:
+    __slots__ = ('id', 'name', 'role', 'availability')
+
     def __init__(self, id, name, role, availability):
         self.id = id
         self.name = name
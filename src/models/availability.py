@@ -0,0 +1,95 @@
+from typing import Dict, List, Optional, Tuple
+
+class AvailabilityCalendar:
+    # Slot calendar for one day, stored as per-slot bitsets over the resources
+    # of each type: bit r of _free[type][slot] is set while resource r is free.
+    # Whether any resource is free for a whole duration is an AND over the
+    # covered slots, and the first such resource is the lowest set bit, so a
+    # query never walks the resource list. Times are minutes since midnight.
+    def __init__(self, slot_minutes: int = 15, day_start: int = 0, day_end: int = 24 * 60):
+        self.slot_minutes = slot_minutes
+        self.day_start = day_start
+        self.day_end = day_end
+        self.num_slots = -(-(day_end - day_start) // slot_minutes)
+        self._resources: Dict[str, List] = {}
+        self._free: Dict[str, List[int]] = {}
+
+    def add_resource(self, resource_type: str, resource=None) -> int:
+        resources = self._resources.setdefault(resource_type, [])
+        free = self._free.setdefault(resource_type, [0] * self.num_slots)
+        index = len(resources)
+        resources.append(resource)
+        bit = 1 << index
+        for slot in range(self.num_slots):
+            free[slot] |= bit
+        return index
+
+    def copy(self) -> 'AvailabilityCalendar':
+        clone = AvailabilityCalendar(self.slot_minutes, self.day_start, self.day_end)
+        clone._resources = {resource_type: list(resources) for resource_type, resources in self._resources.items()}
+        clone._free = {resource_type: list(slots) for resource_type, slots in self._free.items()}
+        return clone
+
+    def resource(self, resource_type: str, index: int):
+        return self._resources[resource_type][index]
+
+    def resources(self, resource_type: str) -> List:
+        return self._resources.get(resource_type, [])
+
+    def _slot_range(self, start: int, duration: int) -> Tuple[int, int]:
+        first = (start - self.day_start) // self.slot_minutes
+        last = -(-(start + duration - self.day_start) // self.slot_minutes)
+        return first, last
+
+    def free_mask(self, resource_type: str, start: int, duration: int) -> int:
+        # Bitset of resources free for the whole interval (0 if it leaves the day)
+        free = self._free.get(resource_type)
+        first, last = self._slot_range(start, duration)
+        if free is None or first < 0 or last > self.num_slots:
+            return 0
+        mask = free[first]
+        for slot in range(first + 1, last):
+            if not mask:
+                break
+            mask &= free[slot]
+        return mask
+
+    def is_free(self, resource_type: str, index: int, start: int, duration: int) -> bool:
+        return bool(self.free_mask(resource_type, start, duration) >> index & 1)
+
+    def first_free(self, resource_type: str, start: int, duration: int) -> Optional[int]:
+        mask = self.free_mask(resource_type, start, duration)
+        if not mask:
+            return None
+        return (mask & -mask).bit_length() - 1
+
+    def find_first(self, resource_type: str, start: int, duration: int, latest: Optional[int] = None) -> Optional[Tuple[int, int]]:
+        # First (resource index, start minute) of the given type free for `duration`
+        # minutes at or after `start`, trying slot boundaries up to `latest`
+        if latest is None:
+            latest = self.day_end - duration
+        offset = (start - self.day_start) % self.slot_minutes
+        if offset:
+            start += self.slot_minutes - offset
+        while start <= latest:
+            index = self.first_free(resource_type, start, duration)
+            if index is not None:
+                return index, start
+            start += self.slot_minutes
+        return None
+
+    def reserve(self, resource_type: str, index: int, start: int, duration: int):
+        self._set(resource_type, index, start, duration, False)
+
+    def release(self, resource_type: str, index: int, start: int, duration: int):
+        self._set(resource_type, index, start, duration, True)
+
+    def _set(self, resource_type: str, index: int, start: int, duration: int, free: bool):
+        slots = self._free[resource_type]
+        first, last = self._slot_range(start, duration)
+        bit = 1 << index
+        for slot in range(max(first, 0), min(last, self.num_slots)):
+            if free:
+                slots[slot] |= bit
+            else:
+                slots[slot] &= ~bit
@@ -0,0 +1,225 @@
+import math
+import random
+import time
+from typing import Callable, List, Dict, Optional, Tuple
+from datetime import datetime, timedelta
+from config.settings import MAX_SCHEDULE_GENERATION_TIME, SCHEDULE_OVERTIME_LIMIT, SCHEDULE_MAX_STALL_ITERATIONS
+from src.data.schedule import Schedule
+from src.models.availability import AvailabilityCalendar
+from src.models.scheduler import Scheduler, DAY_START, DAY_END, APPOINTMENT_MINUTES
+from src.utils.metrics import timed_stage, record_unassigned
+
+# Objective weights: an unscheduled patient outweighs any amount of idle time or overtime
+UNSCHEDULED_WEIGHT = 10000
+OVERTIME_WEIGHT = 3
+IDLE_WEIGHT = 1
+
+class LocalSearchScheduler(Scheduler):
+    # Anytime large-neighbourhood search over (start, staff, equipment) assignments.
+    # A parallel earliest-fit construction gives the first solution; each iteration
+    # then removes a group of patients (random, a time window or one resource's
+    # day) and reinserts them together with the unscheduled ones. The best
+    # schedule found is returned once the deadline or the stall limit is hit.
+    # `progress(info, best)` is called about every `progress_interval` seconds
+    # with search statistics and a function building the best schedule so far;
+    # returning True stops the search early (reported as 'cancelled').
+    def __init__(self, time_limit: float = MAX_SCHEDULE_GENERATION_TIME, max_iterations: Optional[int] = None,
+                 max_stall_iterations: int = SCHEDULE_MAX_STALL_ITERATIONS,
+                 overtime_limit: int = SCHEDULE_OVERTIME_LIMIT, seed: Optional[int] = None,
+                 progress: Optional[Callable[[Dict, Callable[[], Schedule]], bool]] = None, progress_interval: float = 0.5):
+        self.time_limit = time_limit
+        self.max_iterations = max_iterations
+        self.max_stall_iterations = max_stall_iterations
+        self.overtime_limit = overtime_limit
+        self.seed = seed
+        self.progress = progress
+        self.progress_interval = progress_interval
+
+    @timed_stage('schedule')
+    def generate_daily_schedule(self, resources: List[Dict], appointments: List[Dict], date=None):
+        started = time.monotonic()
+        deadline = started + self.time_limit
+        rng = random.Random(self.seed)
+        day = self._midnight(date)
+
+        base_calendar = self._build_calendar(resources)
+        durations = [appointment.get('duration', APPOINTMENT_MINUTES) for appointment in appointments]
+
+        # Construction: every patient in arrival order at its earliest joint slot
+        calendar = base_calendar.copy()
+        solution: Dict[int, Tuple[int, int, int]] = {}
+        self._repair(calendar, solution, range(len(appointments)), durations)
+        current_cost = self._evaluate(solution, durations)[0]
+        best_solution, best_cost = dict(solution), current_cost
+
+        iterations = 0
+        stall = 0
+        temperature = max(current_cost * 0.01, 1.0)
+        timed_out = False
+        cancelled = False
+        next_report = started
+        while best_cost > 0 and stall < self.max_stall_iterations:
+            if self.max_iterations is not None and iterations >= self.max_iterations:
+                break
+            now = time.monotonic()
+            if now >= deadline:
+                timed_out = True
+                break
+            if self.progress is not None and now >= next_report:
+                next_report = now + self.progress_interval
+                if self._report(day, base_calendar, best_solution, appointments, durations, iterations, started):
+                    cancelled = True
+                    break
+            iterations += 1
+
+            candidate_calendar = calendar.copy()
+            candidate = dict(solution)
+            self._destroy(rng, candidate_calendar, candidate, durations)
+            unscheduled = [i for i in range(len(appointments)) if i not in candidate]
+            rng.shuffle(unscheduled)
+            # Longest first packs better; the shuffle above breaks ties differently each time
+            unscheduled.sort(key=lambda i: -durations[i])
+            self._repair(candidate_calendar, candidate, unscheduled, durations)
+            cost = self._evaluate(candidate, durations)[0]
+
+            # Simulated-annealing acceptance lets the search leave local optima
+            if cost <= current_cost or rng.random() < math.exp((current_cost - cost) / temperature):
+                calendar, solution, current_cost = candidate_calendar, candidate, cost
+            temperature = max(temperature * 0.995, 1e-3)
+
+            if cost < best_cost:
+                best_solution, best_cost = dict(candidate), cost
+                stall = 0
+            else:
+                stall += 1
+
+        cost, metrics = self._evaluate(best_solution, durations)
+        metrics.update({
+            'engine': 'local_search',
+            'iterations': iterations,
+            'elapsed_seconds': time.monotonic() - started,
+            'timed_out': timed_out,
+            'cancelled': cancelled
+        })
+        record_unassigned('patient', metrics['unscheduled'])
+        return Schedule(day.date(), self._to_assignments(day, base_calendar.resource, best_solution, appointments, durations), metrics)
+
+    def _report(self, day: datetime, calendar: AvailabilityCalendar, solution: Dict[int, Tuple[int, int, int]],
+                appointments: List[Dict], durations: List[int], iterations: int, started: float) -> bool:
+        cost, metrics = self._evaluate(solution, durations)
+        info = dict(metrics, iterations=iterations, elapsed_seconds=time.monotonic() - started,
+                    time_limit=self.time_limit)
+        # The partial schedule may be built on another thread while this one keeps
+        # searching and finally books the resource dicts, so build it from copies
+        solution = dict(solution)
+        resources = {resource_type: [dict(r, availability=dict(r['availability'])) for r in calendar.resources(resource_type)]
+                     for resource_type in ('staff', 'equipment')}
+        return bool(self.progress(info, lambda: Schedule(
+            day.date(), self._to_assignments(day, lambda resource_type, index: resources[resource_type][index], solution,
+                                             appointments, durations, book=False),
+            dict(info, engine='local_search'))))
+
+    def _earliest_joint_slot(self, calendar: AvailabilityCalendar, duration: int) -> Optional[Tuple[int, int, int]]:
+        # Alternate between resource types until both are free at the same start
+        latest = DAY_END + self.overtime_limit - duration
+        start = DAY_START
+        while start <= latest:
+            staff = calendar.find_first('staff', start, duration, latest)
+            if staff is None:
+                return None
+            equipment = calendar.find_first('equipment', staff[1], duration, latest)
+            if equipment is None:
+                return None
+            if equipment[1] == staff[1]:
+                return staff[1], staff[0], equipment[0]
+            start = equipment[1]
+        return None
+
+    def _repair(self, calendar: AvailabilityCalendar, solution: Dict[int, Tuple[int, int, int]], patients, durations: List[int]):
+        for patient in patients:
+            slot = self._earliest_joint_slot(calendar, durations[patient])
+            if slot is None:
+                continue
+            start, staff, equipment = slot
+            calendar.reserve('staff', staff, start, durations[patient])
+            calendar.reserve('equipment', equipment, start, durations[patient])
+            solution[patient] = slot
+
+    def _destroy(self, rng: random.Random, calendar: AvailabilityCalendar, solution: Dict[int, Tuple[int, int, int]], durations: List[int]) -> List[int]:
+        if not solution:
+            return []
+        scheduled = list(solution)
+        size = max(1, min(len(scheduled) // 5, 30))
+        operator = rng.random()
+        if operator < 0.4:
+            removed = rng.sample(scheduled, min(size, len(scheduled)))
+        elif operator < 0.7:
+            # Everyone starting inside a random window of the day
+            window_start = rng.randrange(DAY_START, DAY_END, 15)
+            window_end = window_start + rng.choice((30, 60, 120))
+            removed = [p for p in scheduled if window_start <= solution[p][0] < window_end]
+        else:
+            # The whole day of one staff member or one piece of equipment
+            column = rng.choice((1, 2))
+            pick = solution[rng.choice(scheduled)][column]
+            removed = [p for p in scheduled if solution[p][column] == pick]
+
+        for patient in removed:
+            start, staff, equipment = solution.pop(patient)
+            calendar.release('staff', staff, start, durations[patient])
+            calendar.release('equipment', equipment, start, durations[patient])
+        return removed
+
+    def _evaluate(self, solution: Dict[int, Tuple[int, int, int]], durations: List[int]) -> Tuple[float, Dict]:
+        # Idle time is the unused part of each booked resource's span from opening
+        # to its last booking; overtime is how far that last booking runs past closing
+        busy: Dict[Tuple[int, int], int] = {}
+        last_end: Dict[Tuple[int, int], int] = {}
+        for patient, (start, staff, equipment) in solution.items():
+            end = start + durations[patient]
+            for key in ((1, staff), (2, equipment)):
+                busy[key] = busy.get(key, 0) + durations[patient]
+                if end > last_end.get(key, 0):
+                    last_end[key] = end
+
+        idle = sum(max(0, end - DAY_START - busy[key]) for key, end in last_end.items())
+        overtime = sum(max(0, end - DAY_END) for end in last_end.values())
+        unscheduled = len(durations) - len(solution)
+        cost = UNSCHEDULED_WEIGHT * unscheduled + OVERTIME_WEIGHT * overtime + IDLE_WEIGHT * idle
+        return cost, {
+            'objective': cost,
+            'scheduled': len(solution),
+            'unscheduled': unscheduled,
+            'idle_minutes': idle,
+            'overtime_minutes': overtime,
+            'makespan': max(last_end.values(), default=DAY_START) - DAY_START
+        }
+
+    def _to_assignments(self, day: datetime, resource: Callable[[str, int], Dict], solution: Dict[int, Tuple[int, int, int]],
+                        appointments: List[Dict], durations: List[int], book: bool = True) -> List[Dict]:
+        assignments = []
+        for patient in sorted(solution, key=lambda p: (solution[p][0], solution[p][1])):
+            start, staff, equipment = solution[patient]
+            staff_resource = resource('staff', staff)
+            equipment_resource = resource('equipment', equipment)
+            assignments.append({
+                'time': day + timedelta(minutes=start),
+                'duration': durations[patient],
+                'patient': appointments[patient]['patient'],
+                'staff': staff_resource,
+                'equipment': equipment_resource
+            })
+            if book:
+                self._update_resource_availability(staff_resource, start, durations[patient])
+                self._update_resource_availability(equipment_resource, start, durations[patient])
+
+        for patient in range(len(appointments)):
+            if patient not in solution:
+                assignments.append({
+                    'time': day + timedelta(minutes=DAY_START),
+                    'duration': 0,
+                    'patient': appointments[patient]['patient'],
+                    'staff': None,
+                    'equipment': None
+                })
+        return assignments
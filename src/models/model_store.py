@@ -0,0 +1,160 @@
+import json
+import os
+import struct
+import tempfile
+import time
+import numpy as np
+from typing import Dict, Optional, Tuple
+from src.models.rl_model import Policy
+from src.models.state_encoder import StateEncoder, SparseQTable
+
+# On-disk Q-table format (.opq):
+#   8 bytes   magic
+#   4 bytes   little-endian header length
+#   n bytes   JSON header (sizes, dtype, encoder metadata, version, hyperparameters)
+#   padding   up to DATA_ALIGNMENT
+#   data      the Q-table as raw C-ordered values
+# The data block is page aligned so it can be mapped read-only with np.memmap
+# and shared through the page cache by every worker on the node.
+MAGIC = b'OPDPSQT\x01'
+FORMAT_VERSION = 1
+DATA_ALIGNMENT = 4096
+
+def write_qtable(path: str, q_table: np.ndarray, header: Dict):
+    q_table = np.ascontiguousarray(q_table)
+    header = dict(header, format_version=FORMAT_VERSION, shape=list(q_table.shape), dtype=q_table.dtype.str)
+    encoded = json.dumps(header, sort_keys=True).encode('utf-8')
+    data_offset = -(-(len(MAGIC) + 4 + len(encoded)) // DATA_ALIGNMENT) * DATA_ALIGNMENT
+
+    # Write next to the target and rename, so readers never see a partial file
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<I', len(encoded)))
+            f.write(encoded)
+            f.write(b'\0' * (data_offset - f.tell()))
+            f.write(q_table.tobytes(order='C'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+def read_header(path: str) -> Tuple[Dict, int]:
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an OPDPS Q-table file")
+        (length,) = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(length).decode('utf-8'))
+    if header.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported Q-table format version {header.get('format_version')}")
+    data_offset = -(-(len(MAGIC) + 4 + length) // DATA_ALIGNMENT) * DATA_ALIGNMENT
+    return header, data_offset
+
+def open_qtable(path: str, mmap: bool = True) -> Tuple[np.ndarray, Dict]:
+    header, data_offset = read_header(path)
+    shape = tuple(header['shape'])
+    dtype = np.dtype(header['dtype'])
+    if mmap:
+        q_table = np.memmap(path, dtype=dtype, mode='r', offset=data_offset, shape=shape)
+    else:
+        with open(path, 'rb') as f:
+            f.seek(data_offset)
+            q_table = np.fromfile(f, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+    return q_table, header
+
+class ModelStore:
+    # Directory of versioned Q-table files plus a CURRENT pointer. Publishing
+    # writes a new version and then atomically repoints CURRENT; workers call
+    # refresh() (a single stat when nothing changed) to swap to the new table
+    # without a restart. Old mappings stay valid after a version is pruned.
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._current_path = os.path.join(directory, 'CURRENT')
+        self._seen_stat: Optional[Tuple[int, int]] = None
+
+    def path_for(self, version: int) -> str:
+        return os.path.join(self.directory, f'qtable-v{version:06d}.opq')
+
+    def versions(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(int(name[len('qtable-v'):-len('.opq')]) for name in os.listdir(self.directory)
+                      if name.startswith('qtable-v') and name.endswith('.opq'))
+
+    def current_version(self) -> Optional[int]:
+        try:
+            with open(self._current_path) as f:
+                return int(f.read().strip())
+        except FileNotFoundError:
+            return None
+
+    def publish(self, model) -> int:
+        if isinstance(model.q_table, SparseQTable):
+            raise TypeError("Only dense Q-tables can be published; convert with q_table.to_dense() first")
+        os.makedirs(self.directory, exist_ok=True)
+        version = max(self.versions(), default=0) + 1
+        while True:
+            # Claim the version number so concurrent publishers cannot overwrite each other
+            try:
+                os.close(os.open(self.path_for(version), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                version += 1
+
+        write_qtable(self.path_for(version), model.q_table, {
+            'version': version,
+            'created_at': time.time(),
+            'state_size': model.state_size,
+            'action_size': model.action_size,
+            'encoder': model.encoder.to_dict(),
+            'learning_rate': model.learning_rate,
+            'discount_factor': model.discount_factor,
+            'epsilon': model.epsilon
+        })
+        self._write_current(version)
+        return version
+
+    def _write_current(self, version: int):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write(f'{version}\n')
+        os.replace(tmp_path, self._current_path)
+
+    def load(self, model, version: Optional[int] = None, mmap: bool = True) -> int:
+        version = self.current_version() if version is None else version
+        if version is None:
+            raise FileNotFoundError(f"No published model in {self.directory}")
+        q_table, header = open_qtable(self.path_for(version), mmap=mmap)
+        # Encoder, table and sizes are published as one Policy reference, so a
+        # concurrent prediction never pairs the new encoder with the old table
+        model.set_policy(Policy(StateEncoder.from_dict(header['encoder']), q_table,
+                                header['state_size'], header['action_size'], version))
+        return version
+
+    def refresh(self, model) -> bool:
+        # Load the current version if it differs from the model's; True if swapped
+        try:
+            stat = os.stat(self._current_path)
+        except FileNotFoundError:
+            return False
+        # CURRENT is replaced by rename, so a new inode means a new pointer
+        signature = (stat.st_ino, stat.st_mtime_ns)
+        if signature == self._seen_stat:
+            return False
+        self._seen_stat = signature
+        version = self.current_version()
+        if version is None or version == getattr(model, 'model_version', None):
+            return False
+        self.load(model, version)
+        return True
+
+    def prune(self, keep: int = 3):
+        current = self.current_version()
+        for version in self.versions()[:-keep] if keep else self.versions():
+            if version != current:
+                os.unlink(self.path_for(version))
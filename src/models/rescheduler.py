@@ -0,0 +1,172 @@
+from typing import List, Dict, Optional, Tuple
+from datetime import datetime, timedelta
+from config.settings import SCHEDULE_OVERTIME_LIMIT
+from src.data.schedule import Schedule
+from src.models.availability import AvailabilityCalendar
+from src.models.scheduler import Scheduler, SLOT_MINUTES, DAY_START, DAY_END, APPOINTMENT_MINUTES
+from src.utils.metrics import timed_stage
+
+class Rescheduler(Scheduler):
+    # Incremental repair of an existing schedule. Only the assignments hit by a
+    # delta are released and re-placed, together with patients that were left
+    # unscheduled (they may now fit into freed slots); everyone else keeps their
+    # time, staff and equipment. The calendar is rebuilt from the schedule itself,
+    # so the resource dicts are only used to know which resources exist.
+    #
+    # A delta may contain:
+    #   'now':           minute of the day; assignments starting earlier are not moved
+    #   'cancelled':     patient ids to drop
+    #   'late':          {patient id: minutes late}
+    #   'added':         appointments ({'patient', optional 'duration' and 'earliest' minute})
+    #   'staff_out':     staff outages, each an id or {'id', optional 'from' and 'until' minutes}
+    #   'equipment_out': equipment outages, same format
+    def __init__(self, overtime_limit: int = SCHEDULE_OVERTIME_LIMIT):
+        self.overtime_limit = overtime_limit
+
+    @timed_stage('reschedule')
+    def repair(self, schedule: Schedule, resources: List[Dict], delta: Dict) -> Tuple[Schedule, List[Dict]]:
+        now = delta.get('now', DAY_START)
+        day = datetime.combine(schedule.date, datetime.min.time())
+        calendar = AvailabilityCalendar(slot_minutes=SLOT_MINUTES)
+        index_of = {}
+        for resource in resources:
+            index_of[(resource['type'], resource['id'])] = calendar.add_resource(resource['type'], resource)
+
+        # Current bookings: patient id -> (assignment, start, staff index, equipment index)
+        booked: Dict[object, Tuple[Dict, int, int, int]] = {}
+        unscheduled: List[Dict] = []
+        for assignment in schedule.assignments:
+            if assignment['staff'] is None or assignment['equipment'] is None:
+                unscheduled.append(assignment)
+                continue
+            start = assignment['time'].hour * 60 + assignment['time'].minute
+            staff = index_of[('staff', assignment['staff']['id'])]
+            equipment = index_of[('equipment', assignment['equipment']['id'])]
+            calendar.reserve('staff', staff, start, assignment['duration'])
+            calendar.reserve('equipment', equipment, start, assignment['duration'])
+            booked[assignment['patient'].id] = (assignment, start, staff, equipment)
+
+        diff = []
+        cancelled = set(delta.get('cancelled', ()))
+        for patient_id in cancelled:
+            if patient_id in booked:
+                assignment, start, staff, equipment = booked.pop(patient_id)
+                self._release(calendar, assignment, start, staff, equipment)
+                diff.append(self._change(patient_id, 'cancelled', assignment, None))
+        for assignment in unscheduled:
+            if assignment['patient'].id in cancelled:
+                diff.append(self._change(assignment['patient'].id, 'cancelled', assignment, None))
+        unscheduled = [a for a in unscheduled if a['patient'].id not in cancelled]
+
+        # (assignment, earliest start) pairs that need a new place
+        affected: List[Tuple[Dict, int]] = []
+        for patient_id, minutes_late in delta.get('late', {}).items():
+            if patient_id in booked:
+                assignment, start, staff, equipment = booked[patient_id]
+                if start >= now and minutes_late > 0:
+                    del booked[patient_id]
+                    self._release(calendar, assignment, start, staff, equipment)
+                    affected.append((assignment, start + minutes_late))
+
+        outages = [('staff', outage) for outage in delta.get('staff_out', ())]
+        outages += [('equipment', outage) for outage in delta.get('equipment_out', ())]
+        blocks = []
+        for resource_type, outage in outages:
+            if not isinstance(outage, dict):
+                outage = {'id': outage}
+            index = index_of[(resource_type, outage['id'])]
+            begin = outage.get('from', now)
+            end = outage.get('until', DAY_END + self.overtime_limit)
+            for patient_id, (assignment, start, staff, equipment) in list(booked.items()):
+                uses = staff if resource_type == 'staff' else equipment
+                if uses == index and start < end and start + assignment['duration'] > begin and start >= now:
+                    del booked[patient_id]
+                    self._release(calendar, assignment, start, staff, equipment)
+                    affected.append((assignment, start))
+            blocks.append((resource_type, index, begin, end))
+        # Block outages only after releasing, so freed bookings do not reopen them
+        for resource_type, index, begin, end in blocks:
+            calendar.reserve(resource_type, index, begin, end - begin)
+
+        affected.sort(key=lambda item: item[1])
+        for appointment in delta.get('added', ()):
+            added = {'time': None, 'duration': appointment.get('duration', APPOINTMENT_MINUTES),
+                     'patient': appointment['patient'], 'staff': None, 'equipment': None}
+            affected.append((added, max(appointment.get('earliest', now), now)))
+        # Waiting patients go last so repairs never push them ahead of booked ones
+        for assignment in unscheduled:
+            waiting = dict(assignment, duration=assignment['duration'] or APPOINTMENT_MINUTES)
+            affected.append((waiting, max(now, DAY_START)))
+
+        placed: Dict[object, Dict] = {}
+        for assignment, earliest in affected:
+            was_booked = assignment['staff'] is not None
+            prefer_staff = index_of[('staff', assignment['staff']['id'])] if was_booked else None
+            prefer_equipment = index_of[('equipment', assignment['equipment']['id'])] if was_booked else None
+            slot = self._place(calendar, assignment['duration'], max(earliest, now, DAY_START), prefer_staff, prefer_equipment)
+            patient_id = assignment['patient'].id
+
+            if slot is None:
+                if was_booked:
+                    diff.append(self._change(patient_id, 'unscheduled', assignment, None))
+                elif assignment['time'] is None:
+                    diff.append(self._change(patient_id, 'unscheduled', None, None))
+                placed[patient_id] = {'time': day + timedelta(minutes=max(now, DAY_START)), 'duration': 0,
+                                      'patient': assignment['patient'], 'staff': None, 'equipment': None}
+                continue
+
+            start, staff, equipment = slot
+            new = {
+                'time': day + timedelta(minutes=start),
+                'duration': assignment['duration'],
+                'patient': assignment['patient'],
+                'staff': calendar.resource('staff', staff),
+                'equipment': calendar.resource('equipment', equipment)
+            }
+            placed[patient_id] = new
+            if not was_booked:
+                diff.append(self._change(patient_id, 'scheduled' if assignment['time'] is not None else 'added', None, new))
+            elif new['time'] != assignment['time']:
+                diff.append(self._change(patient_id, 'moved', assignment, new))
+            elif new['staff'] is not assignment['staff'] or new['equipment'] is not assignment['equipment']:
+                diff.append(self._change(patient_id, 'reassigned', assignment, new))
+
+        assignments = [entry[0] for entry in booked.values()] + [a for a in placed.values() if a['staff'] is not None]
+        assignments.sort(key=lambda a: (a['time'], a['staff']['id']))
+        assignments += [a for a in placed.values() if a['staff'] is None]
+        return Schedule(schedule.date, assignments, dict(schedule.metrics, changed=len(diff))), diff
+
+    def _release(self, calendar: AvailabilityCalendar, assignment: Dict, start: int, staff: int, equipment: int):
+        calendar.release('staff', staff, start, assignment['duration'])
+        calendar.release('equipment', equipment, start, assignment['duration'])
+
+    def _place(self, calendar: AvailabilityCalendar, duration: int, earliest: int,
+               prefer_staff: Optional[int], prefer_equipment: Optional[int]) -> Optional[Tuple[int, int, int]]:
+        # Earliest slot boundary where both a staff member and equipment are free,
+        # keeping the previous staff member and equipment when they are
+        start = -(-earliest // SLOT_MINUTES) * SLOT_MINUTES
+        latest = DAY_END + self.overtime_limit - duration
+        while start <= latest:
+            staff_mask = calendar.free_mask('staff', start, duration)
+            equipment_mask = calendar.free_mask('equipment', start, duration) if staff_mask else 0
+            if staff_mask and equipment_mask:
+                staff = self._pick(staff_mask, prefer_staff)
+                equipment = self._pick(equipment_mask, prefer_equipment)
+                calendar.reserve('staff', staff, start, duration)
+                calendar.reserve('equipment', equipment, start, duration)
+                return start, staff, equipment
+            start += SLOT_MINUTES
+        return None
+
+    def _pick(self, mask: int, preferred: Optional[int]) -> int:
+        if preferred is not None and mask >> preferred & 1:
+            return preferred
+        return (mask & -mask).bit_length() - 1
+
+    def _change(self, patient_id, change: str, before: Optional[Dict], after: Optional[Dict]) -> Dict:
+        def describe(assignment):
+            if assignment is None or assignment['staff'] is None:
+                return None
+            return {'time': assignment['time'].strftime('%H:%M'), 'duration': assignment['duration'],
+                    'staff_id': assignment['staff']['id'], 'equipment_id': assignment['equipment']['id']}
+        return {'patient_id': patient_id, 'change': change, 'before': describe(before), 'after': describe(after)}
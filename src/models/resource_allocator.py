@@ -1,25 +1,106 @@
-from typing import List
+import heapq
+import numpy as np
+from typing import Dict, List, Optional, Sequence
 from src.data.staff import Staff
 from src.data.patient import Patient
 from src.data.equipment import Equipment
+from src.utils.metrics import timed_stage, record_unassigned
+
+class ResourcePool:
+    # Free-lists of available resources keyed by a category attribute
+    # (staff role or equipment type). Heaps hold list positions, so resources
+    # are handed out in the same order as a linear scan would find them.
+    # Entries made stale by an acquire through another heap are skipped lazily;
+    # each position is in a heap at most once, so a release only pushes onto
+    # the heaps it was popped from.
+    def __init__(self, resources: Sequence, key: str):
+        self.resources = list(resources)
+        self.key = key
+        self._free = [bool(r.availability) for r in self.resources]
+        self._in_any = list(self._free)
+        self._in_category = list(self._free)
+        self._any: List[int] = []
+        self._heaps: Dict[object, List[int]] = {}
+        self._counts: Dict[object, int] = {}
+        self._total = 0
+
+        # Positions are appended in increasing order, so every list is already a valid heap
+        for index, resource in enumerate(self.resources):
+            if self._free[index]:
+                category = getattr(resource, key)
+                self._any.append(index)
+                self._heaps.setdefault(category, []).append(index)
+                self._counts[category] = self._counts.get(category, 0) + 1
+                self._total += 1
+
+    def __len__(self):
+        return self.available()
+
+    def available(self, category=None) -> int:
+        if category is None:
+            return self._total
+        return self._counts.get(category, 0)
+
+    def acquire_index(self, category=None) -> Optional[int]:
+        if category is None:
+            heap, members = self._any, self._in_any
+        else:
+            if not self._counts.get(category):
+                return None
+            heap, members = self._heaps[category], self._in_category
+
+        while heap:
+            index = heapq.heappop(heap)
+            members[index] = False
+            if self._free[index]:
+                self._free[index] = False
+                self.resources[index].availability = False
+                self._counts[getattr(self.resources[index], self.key)] -= 1
+                self._total -= 1
+                return index
+        return None
+
+    def acquire(self, category=None):
+        index = self.acquire_index(category)
+        return None if index is None else self.resources[index]
+
+    def release_index(self, index: int):
+        if self._free[index]:
+            return
+        resource = self.resources[index]
+        category = getattr(resource, self.key)
+        self._free[index] = True
+        resource.availability = True
+        if not self._in_any[index]:
+            self._in_any[index] = True
+            heapq.heappush(self._any, index)
+        if not self._in_category[index]:
+            self._in_category[index] = True
+            heapq.heappush(self._heaps.setdefault(category, []), index)
+        self._counts[category] = self._counts.get(category, 0) + 1
+        self._total += 1
 
 class ResourceAllocator:
+    @timed_stage('allocate')
     def allocate_resources(self, staff: List[Staff], patients: List[Patient], equipment: List[Equipment]):
-        # Simple allocation algorithm (can be improved with more complex logic)
+        # Pools make every lookup O(log n) instead of rescanning the lists per patient
         allocations = []
-        
+        staff_pool = ResourcePool(staff, 'role')
+        equipment_pool = ResourcePool(equipment, 'type')
+
         for patient in patients:
-            allocated_staff = self._find_available_staff(staff)
-            allocated_equipment = self._find_available_equipment(equipment)
-            
+            allocated_staff = None
+            allocated_equipment = None
+            if staff_pool.available() and equipment_pool.available():
+                allocated_staff = self._find_available_staff(staff_pool)
+                allocated_equipment = self._find_available_equipment(equipment_pool)
+
             if allocated_staff and allocated_equipment:
                 allocations.append({
                     'patient': patient,
                     'staff': allocated_staff,
                     'equipment': allocated_equipment
                 })
-                allocated_staff.availability = False
-                allocated_equipment.availability = False
             else:
                 # Handle case when resources are not available
                 allocations.append({
@@ -27,17 +108,51 @@ class ResourceAllocator:
                     'staff': None,
                     'equipment': None
                 })
-        
+
+        record_unassigned('allocation', sum(a['staff'] is None for a in allocations))
         return allocations
 
-    def _find_available_staff(self, staff: List[Staff]):
-        for s in staff:
-            if s.availability:
-                return s
-        return None
+    @timed_stage('allocate')
+    def allocate_batch(self, staff: List[Staff], patients: List[Patient], equipment: List[Equipment],
+                       staff_roles: Optional[Sequence] = None, equipment_types: Optional[Sequence] = None) -> Dict[str, np.ndarray]:
+        # Columnar variant of allocate_resources. Optional per-patient role and
+        # equipment type constraints select the matching pool (None means any).
+        # Unallocated rows hold -1 in the index and id columns.
+        staff_pool = ResourcePool(staff, 'role')
+        equipment_pool = ResourcePool(equipment, 'type')
+        n = len(patients)
+
+        staff_index = np.full(n, -1, dtype=np.int64)
+        equipment_index = np.full(n, -1, dtype=np.int64)
+
+        for i in range(n):
+            role = staff_roles[i] if staff_roles is not None else None
+            equipment_type = equipment_types[i] if equipment_types is not None else None
+            if not (staff_pool.available(role) and equipment_pool.available(equipment_type)):
+                continue
+
+            staff_index[i] = staff_pool.acquire_index(role)
+            equipment_index[i] = equipment_pool.acquire_index(equipment_type)
+
+        record_unassigned('allocation', int(np.count_nonzero(staff_index < 0)))
+        return {
+            'patient_id': np.asarray([p.id for p in patients], dtype=np.int64),
+            'staff_index': staff_index,
+            'equipment_index': equipment_index,
+            'staff_id': self._take_ids(staff, staff_index),
+            'equipment_id': self._take_ids(equipment, equipment_index),
+            'allocated': staff_index >= 0
+        }
+
+    def _take_ids(self, resources: Sequence, index: np.ndarray) -> np.ndarray:
+        ids = np.full(len(index), -1, dtype=np.int64)
+        mask = index >= 0
+        if mask.any():
+            ids[mask] = np.asarray([r.id for r in resources], dtype=np.int64)[index[mask]]
+        return ids
+
+    def _find_available_staff(self, staff_pool: ResourcePool, role=None):
+        return staff_pool.acquire(role)
 
-    def _find_available_equipment(self, equipment: List[Equipment]):
-        for e in equipment:
-            if e.availability:
-                return e
-        return None
\ No newline at end of file
+    def _find_available_equipment(self, equipment_pool: ResourcePool, equipment_type=None):
+        return equipment_pool.acquire(equipment_type)
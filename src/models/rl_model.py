@@ -1,16 +1,57 @@
+import time
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, NamedTuple, Optional
+from src.models.state_encoder import HashingStateEncoder, SparseQTable
+from src.utils.metrics import timed_stage
+
+class Policy(NamedTuple):
+    # Everything a prediction reads, swapped as one reference (see ModelStore.load)
+    encoder: object
+    q_table: object
+    state_size: int
+    action_size: int
+    model_version: Optional[int] = None
+
+def _policy_field(name: str) -> property:
+    def get(self):
+        return getattr(self._policy, name)
+
+    def set(self, value):
+        self._policy = self._policy._replace(**{name: value})
+    return property(get, set)
 
 class RLModel:
-    def __init__(self, state_size: int, action_size: int, learning_rate: float = 0.1, discount_factor: float = 0.95, epsilon: float = 0.1):
-        self.state_size = state_size
-        self.action_size = action_size
+    encoder = _policy_field('encoder')
+    q_table = _policy_field('q_table')
+    state_size = _policy_field('state_size')
+    action_size = _policy_field('action_size')
+    model_version = _policy_field('model_version')
+
+    def __init__(self, state_size: Optional[int], action_size: int, learning_rate: float = 0.1, discount_factor: float = 0.95, epsilon: float = 0.1,
+                 encoder=None, sparse: bool = False):
+        # `encoder` maps state dicts to table rows (see src/models/state_encoder.py);
+        # without one a deterministic hashing encoder over `state_size` rows is used.
+        # `sparse` keeps only visited rows, for encoders with very large spaces.
+        if encoder is not None:
+            if state_size is not None and state_size != encoder.size:
+                raise ValueError(f"state_size {state_size} does not match encoder size {encoder.size}")
+            state_size = encoder.size
+        elif state_size is None:
+            raise ValueError("Either state_size or encoder is required")
         self.learning_rate = learning_rate
         self.discount_factor = discount_factor
         self.epsilon = epsilon
-        self.q_table = np.zeros((state_size, action_size))
+        self._policy = Policy(encoder if encoder is not None else HashingStateEncoder(state_size),
+                              SparseQTable(state_size, action_size) if sparse else np.zeros((state_size, action_size)),
+                              state_size, action_size)
+
+    def set_policy(self, policy: Policy):
+        # A single attribute store: concurrent predictions see either the old or the new policy
+        self._policy = policy
 
+    @timed_stage('train')
     def train(self, data: List[Dict]):
+        self._ensure_writable()
         for episode in data:
             state = self._get_state(episode['initial_state'])
             for step in episode['steps']:
@@ -26,9 +67,126 @@ class RLModel:
                 
                 state = next_state
 
+    @timed_stage('train')
+    def train_batch(self, states, actions, rewards, next_states, dones=None, epochs: int = 1,
+                    batch_size: int = 65536, tolerance: Optional[float] = None) -> List[Dict]:
+        # Vectorized Q-learning over pre-encoded transitions (state indices, actions,
+        # rewards, next state indices). Each chunk is evaluated against the table as
+        # it stood before the chunk. Returns per-epoch convergence stats and stops
+        # early once the mean absolute TD error drops below `tolerance`.
+        states = np.asarray(states, dtype=np.int64)
+        actions = np.asarray(actions, dtype=np.int64)
+        rewards = np.asarray(rewards, dtype=np.float64)
+        next_states = np.asarray(next_states, dtype=np.int64)
+        dones = np.zeros(len(states), dtype=bool) if dones is None else np.asarray(dones, dtype=bool)
+        if not (len(states) == len(actions) == len(rewards) == len(next_states) == len(dones)):
+            raise ValueError("Transition arrays must all have the same length")
+        if len(states) and (states.min() < 0 or states.max() >= self.state_size
+                            or next_states.min() < 0 or next_states.max() >= self.state_size):
+            raise ValueError("State index out of range")
+        if len(actions) and (actions.min() < 0 or actions.max() >= self.action_size):
+            raise ValueError("Action index out of range")
+
+        self._ensure_writable()
+        n = len(states)
+        history = []
+        for epoch in range(epochs):
+            started = time.perf_counter()
+            abs_error_sum = 0.0
+            max_error = 0.0
+            for begin in range(0, n, batch_size):
+                end = begin + batch_size
+                td_error = self._apply_batch(states[begin:end], actions[begin:end], rewards[begin:end],
+                                             next_states[begin:end], dones[begin:end])
+                abs_error = np.abs(td_error)
+                abs_error_sum += abs_error.sum()
+                max_error = max(max_error, abs_error.max())
+
+            elapsed = time.perf_counter() - started
+            stats = {
+                'epoch': epoch + 1,
+                'transitions': n,
+                'mean_abs_td_error': float(abs_error_sum / n) if n else 0.0,
+                'max_abs_td_error': float(max_error),
+                'seconds': elapsed,
+                'transitions_per_second': n / elapsed if elapsed > 0 else float('inf')
+            }
+            history.append(stats)
+            if tolerance is not None and stats['mean_abs_td_error'] < tolerance:
+                break
+        return history
+
+    def _apply_batch(self, states: np.ndarray, actions: np.ndarray, rewards: np.ndarray,
+                     next_states: np.ndarray, dones: np.ndarray) -> np.ndarray:
+        max_next_q = np.where(dones, 0.0, self.q_table[next_states].max(axis=1))
+        td_error = rewards + self.discount_factor * max_next_q - self.q_table[states, actions]
+
+        # Fancy-index assignment would drop repeated (state, action) pairs. Merge them
+        # instead: k updates toward the same target close 1 - (1 - lr)^k of the gap,
+        # so each pair moves by that fraction of its mean TD error.
+        flat = states * self.action_size + actions
+        unique, inverse = np.unique(flat, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        counts = np.bincount(inverse)
+        mean_error = np.bincount(inverse, weights=td_error) / counts
+        step = 1.0 - (1.0 - self.learning_rate) ** counts
+        unique_states, unique_actions = np.divmod(unique, self.action_size)
+        self.q_table[unique_states, unique_actions] += step * mean_error
+        return td_error
+
+    def episodes_to_arrays(self, data: List[Dict]) -> Dict[str, np.ndarray]:
+        # Encode episodes in the `train` format into transition arrays for `train_batch`.
+        # Steps without an 'action' key get one from the current policy, as `train` does.
+        states, actions, rewards, next_states = [], [], [], []
+        for episode in data:
+            state = self._get_state(episode['initial_state'])
+            for step in episode['steps']:
+                next_state = self._get_state(step['next_state'])
+                states.append(state)
+                actions.append(step['action'] if 'action' in step else self._choose_action(state))
+                rewards.append(step['reward'])
+                next_states.append(next_state)
+                state = next_state
+        return {
+            'states': np.asarray(states, dtype=np.int64),
+            'actions': np.asarray(actions, dtype=np.int64),
+            'rewards': np.asarray(rewards, dtype=np.float64),
+            'next_states': np.asarray(next_states, dtype=np.int64)
+        }
+
+    def _ensure_writable(self):
+        # Tables loaded from a ModelStore are read-only shared mappings; train on a private copy
+        if isinstance(self.q_table, np.ndarray) and not self.q_table.flags.writeable:
+            self.q_table = np.array(self.q_table)
+
+    @timed_stage('predict')
     def predict(self, state: Dict) -> int:
-        state_index = self._get_state(state)
-        return np.argmax(self.q_table[state_index])
+        policy = self._policy
+        return np.argmax(policy.q_table[policy.encoder.encode(state)])
+
+    @timed_stage('predict')
+    def predict_batch(self, states, top_k: Optional[int] = None, epsilon: Optional[float] = None,
+                      rng: Optional[np.random.Generator] = None) -> Dict[str, np.ndarray]:
+        # Score many states in one call. `states` may be a list of state dicts, a
+        # DataFrame or mapping of feature columns, or (with a StateEncoder) a 2D
+        # array of feature values; rows are encoded exactly as `predict` does.
+        # Optionally adds the top-k actions with their Q-values and epsilon-greedy samples.
+        policy = self._policy
+        indices = np.asarray(policy.encoder.encode_batch(states), dtype=np.int64)
+        q_values = np.asarray(policy.q_table[indices])
+        result = {'states': indices, 'actions': np.argmax(q_values, axis=1)}
+
+        if top_k:
+            # A stable sort keeps ties in index order, matching np.argmax
+            order = np.argsort(-q_values, axis=1, kind='stable')[:, :min(top_k, policy.action_size)]
+            result['top_actions'] = order
+            result['top_q_values'] = np.take_along_axis(q_values, order, axis=1)
+
+        if epsilon is not None:
+            rng = rng if rng is not None else np.random.default_rng()
+            explore = rng.random(len(indices)) < epsilon
+            result['sampled_actions'] = np.where(explore, rng.integers(0, policy.action_size, len(indices)), result['actions'])
+        return result
 
     def _choose_action(self, state: int) -> int:
         if np.random.rand() < self.epsilon:
@@ -36,18 +194,35 @@ class RLModel:
         return np.argmax(self.q_table[state])
 
     def _get_state(self, state: Dict) -> int:
-        # Convert state dictionary to a unique integer index
-        # This is a simple hash function and might need to be improved for complex state spaces
-        return hash(frozenset(state.items())) % self.state_size
+        # Convert state dictionary to an integer index, identically in every process
+        return self.encoder.encode(state)
 
     def save_model(self, filename: str):
-        np.save(filename, self.q_table)
+        # Written through a handle so numpy does not append .npy/.npz to the name
+        with open(filename, 'wb') as f:
+            if isinstance(self.q_table, SparseQTable):
+                states = np.fromiter(self.q_table.rows, dtype=np.int64, count=len(self.q_table))
+                rows = np.stack([self.q_table.rows[s] for s in states.tolist()]) if len(states) else np.zeros((0, self.action_size))
+                np.savez(f, states=states, rows=rows, shape=np.asarray(self.q_table.shape))
+            else:
+                np.save(f, self.q_table)
 
     def load_model(self, filename: str):
-        self.q_table = np.load(filename)
+        data = np.load(filename)
+        if hasattr(data, 'files'):
+            with data:
+                q_table = SparseQTable(*data['shape'].tolist())
+                for state, row in zip(data['states'].tolist(), data['rows']):
+                    q_table.rows[state] = row.copy()
+            self.q_table = q_table
+        else:
+            self.q_table = data
 
 # Example usage:
 # rl_model = RLModel(state_size=1000, action_size=10)
+# or, with declared features and a collision-free encoding:
+# encoder = StateEncoder({'staff_available': 51, 'patients_waiting': [0, 5, 10, 20, 50, 100]})
+# rl_model = RLModel(state_size=None, action_size=10, encoder=encoder)
 # training_data = [
 #     {
 #         'initial_state': {'staff_available': 5, 'patients_waiting': 10},
@@ -59,4 +234,5 @@ class RLModel:
 #     # ... more episodes ...
 # ]
 # rl_model.train(training_data)
+# history = rl_model.train_batch(**rl_model.episodes_to_arrays(training_data), epochs=5)
 # best_action = rl_model.predict({'staff_available': 5, 'patients_waiting': 10})
\ No newline at end of file
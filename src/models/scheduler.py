@@ -1,57 +1,106 @@
-from typing import List, Dict
-from datetime import datetime, timedelta
+from typing import List, Dict, Optional
+from datetime import datetime, time, timedelta
+from config.settings import SCHEDULER_ENGINE, DAY_START, DAY_END
 from src.data.schedule import Schedule
+from src.models.availability import AvailabilityCalendar
+from src.utils.metrics import timed_stage, record_unassigned
+
+SLOT_MINUTES = 15
+APPOINTMENT_MINUTES = 30
+
+# 'HH:MM' keys used by the resource availability dicts, one per slot of the day
+SLOT_LABELS = [f"{m // 60:02d}:{m % 60:02d}" for m in range(0, 24 * 60, SLOT_MINUTES)]
 
 class Scheduler:
-    def generate_daily_schedule(self, resources: List[Dict], appointments: List[Dict]):
+    @timed_stage('schedule')
+    def generate_daily_schedule(self, resources: List[Dict], appointments: List[Dict], date=None):
         # Simple scheduling algorithm (can be improved with more complex logic)
         daily_schedule = []
-        current_time = datetime.now().replace(hour=9, minute=0, second=0, microsecond=0)  # Start at 9:00 AM
-        end_time = current_time.replace(hour=17, minute=0)  # End at 5:00 PM
+        day = self._midnight(date)
+        calendar = self._build_calendar(resources)
+        current = DAY_START
 
         for appointment in appointments:
-            if current_time >= end_time:
+            if current >= DAY_END:
                 break
 
             patient = appointment['patient']
-            staff = self._find_available_resource(resources, 'staff', current_time)
-            equipment = self._find_available_resource(resources, 'equipment', current_time)
+            duration = APPOINTMENT_MINUTES  # Assume 30-minute appointments
+            staff = self._find_available_resource(calendar, 'staff', current, duration)
+            equipment = self._find_available_resource(calendar, 'equipment', current, duration)
 
-            if staff and equipment:
-                duration = timedelta(minutes=30)  # Assume 30-minute appointments
+            if staff is not None and equipment is not None:
                 daily_schedule.append({
-                    'time': current_time,
+                    'time': day + timedelta(minutes=current),
+                    'duration': duration,
                     'patient': patient,
-                    'staff': staff,
-                    'equipment': equipment
+                    'staff': calendar.resource('staff', staff),
+                    'equipment': calendar.resource('equipment', equipment)
                 })
-                current_time += duration
-                self._update_resource_availability(staff, current_time, duration)
-                self._update_resource_availability(equipment, current_time, duration)
+                self._book(calendar, 'staff', staff, current, duration)
+                self._book(calendar, 'equipment', equipment, current, duration)
+                current += duration
             else:
                 # Handle case when resources are not available
                 daily_schedule.append({
-                    'time': current_time,
+                    'time': day + timedelta(minutes=current),
+                    'duration': 0,
                     'patient': patient,
                     'staff': None,
                     'equipment': None
                 })
-                current_time += timedelta(minutes=15)  # Move to next 15-minute slot
+                current += SLOT_MINUTES  # Move to next 15-minute slot
 
-        return Schedule(datetime.now().date(), daily_schedule)
+        record_unassigned('patient', sum(a['staff'] is None for a in daily_schedule))
+        return Schedule(day.date(), daily_schedule)
 
-    def _find_available_resource(self, resources: List[Dict], resource_type: str, current_time: datetime):
+    def _midnight(self, date=None) -> datetime:
+        # Schedules are for `date` (a date, datetime or 'YYYY-MM-DD'), today if omitted
+        if date is None:
+            date = datetime.now().date()
+        elif isinstance(date, str):
+            date = datetime.strptime(date[:10], '%Y-%m-%d').date()
+        elif isinstance(date, datetime):
+            date = date.date()
+        return datetime.combine(date, time())
+
+    def _build_calendar(self, resources: List[Dict]) -> AvailabilityCalendar:
+        # Bookings already recorded in the availability dicts are loaded once up front
+        calendar = AvailabilityCalendar(slot_minutes=SLOT_MINUTES)
         for resource in resources:
-            if resource['type'] == resource_type and self._is_resource_available(resource, current_time):
-                return resource
-        return None
-
-    def _is_resource_available(self, resource: Dict, current_time: datetime):
-        return resource['availability'].get(current_time.strftime('%H:%M'), True)
-
-    def _update_resource_availability(self, resource: Dict, start_time: datetime, duration: timedelta):
-        end_time = start_time + duration
-        current = start_time
-        while current < end_time:
-            resource['availability'][current.strftime('%H:%M')] = False
-            current += timedelta(minutes=15)
\ No newline at end of file
+            index = calendar.add_resource(resource['type'], resource)
+            for label, available in resource['availability'].items():
+                if not available:
+                    hours, minutes = label.split(':')
+                    calendar.reserve(resource['type'], index, int(hours) * 60 + int(minutes), SLOT_MINUTES)
+        return calendar
+
+    def _find_available_resource(self, calendar: AvailabilityCalendar, resource_type: str, start: int, duration: int) -> Optional[int]:
+        return calendar.first_free(resource_type, start, duration)
+
+    def _book(self, calendar: AvailabilityCalendar, resource_type: str, index: int, start: int, duration: int):
+        calendar.reserve(resource_type, index, start, duration)
+        self._update_resource_availability(calendar.resource(resource_type, index), start, duration)
+
+    def _update_resource_availability(self, resource: Dict, start: int, duration: int):
+        # Keep the resource dict in sync so later runs see this booking
+        availability = resource['availability']
+        for slot in range(start // SLOT_MINUTES, -(-(start + duration) // SLOT_MINUTES)):
+            availability[SLOT_LABELS[slot]] = False
+
+def build_resources(staff: List, equipment: List) -> List[Dict]:
+    # Resource dicts in the format the schedulers consume, for available staff and equipment
+    resources = [{'type': 'staff', 'id': s.id, 'name': s.name, 'role': s.role, 'availability': {}}
+                 for s in staff if s.availability]
+    resources += [{'type': 'equipment', 'id': e.id, 'name': e.type, 'availability': {}}
+                  for e in equipment if e.availability]
+    return resources
+
+def create_scheduler(engine: Optional[str] = None, **options) -> Scheduler:
+    engine = engine or SCHEDULER_ENGINE
+    if engine == 'greedy':
+        return Scheduler()
+    if engine == 'local_search':
+        from src.models.local_search_scheduler import LocalSearchScheduler
+        return LocalSearchScheduler(**options)
+    raise ValueError(f"Unknown scheduling engine: {engine}")
@@ -0,0 +1,165 @@
+import zlib
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+
+class StateEncoder:
+    # Mixed-radix state encoder. Each declared feature is discretized into bins
+    # and the bin numbers are combined as digits, so every state maps to one
+    # index in [0, size) and the mapping is identical in every process.
+    #
+    # A feature is declared either with an integer number of levels (values are
+    # clipped to 0..levels-1) or with a sorted sequence of bin edges
+    # (np.digitize semantics, giving len(edges) + 1 bins).
+    def __init__(self, features: Dict[str, object]):
+        if not features:
+            raise ValueError("At least one feature must be declared")
+        self.features = list(features)
+        self.bins: Dict[str, object] = {}
+        radices = []
+        for name, spec in features.items():
+            if isinstance(spec, (int, np.integer)):
+                if spec < 1:
+                    raise ValueError(f"Feature {name!r} needs at least one level")
+                self.bins[name] = int(spec)
+                radices.append(int(spec))
+            else:
+                edges = np.asarray(spec, dtype=np.float64)
+                if edges.ndim != 1 or np.any(np.diff(edges) <= 0):
+                    raise ValueError(f"Bin edges for feature {name!r} must be strictly increasing")
+                self.bins[name] = edges
+                radices.append(len(edges) + 1)
+
+        self.radices = np.asarray(radices, dtype=np.int64)
+        # Place value of each digit, last feature varying fastest
+        self.strides = np.concatenate([np.cumprod(self.radices[::-1])[::-1][1:], [1]]).astype(np.int64)
+        self.size = int(np.prod(self.radices))
+
+    def _digits(self, name: str, values: np.ndarray) -> np.ndarray:
+        spec = self.bins[name]
+        if isinstance(spec, int):
+            return np.clip(np.asarray(values, dtype=np.float64).astype(np.int64), 0, spec - 1)
+        return np.digitize(np.asarray(values, dtype=np.float64), spec)
+
+    def encode(self, state: Dict) -> int:
+        return int(self.encode_batch({name: [state[name]] for name in self.features})[0])
+
+    def encode_batch(self, states) -> np.ndarray:
+        # Accepts a DataFrame or mapping of feature columns, a 2D array with one
+        # column per declared feature, or a list of state dicts
+        if isinstance(states, np.ndarray):
+            if states.ndim != 2 or states.shape[1] != len(self.features):
+                raise ValueError(f"Expected an array with {len(self.features)} columns")
+            columns = {name: states[:, i] for i, name in enumerate(self.features)}
+        elif isinstance(states, (list, tuple)):
+            columns = {name: [state[name] for state in states] for name in self.features}
+        else:
+            columns = states
+
+        index = None
+        for name, stride in zip(self.features, self.strides):
+            digits = self._digits(name, np.asarray(columns[name])) * stride
+            index = digits if index is None else index + digits
+        return index
+
+    def decode(self, index: int) -> Dict[str, int]:
+        # Bin number of each feature for a state index
+        return {name: int(index // stride % radix)
+                for name, stride, radix in zip(self.features, self.strides, self.radices)}
+
+    def to_dict(self) -> Dict:
+        return {
+            'type': 'mixed_radix',
+            'features': [
+                {'name': name, 'levels': spec} if isinstance(spec, int) else {'name': name, 'edges': spec.tolist()}
+                for name, spec in self.bins.items()
+            ]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'StateEncoder':
+        if data.get('type') == 'hashing':
+            return HashingStateEncoder.from_dict(data)
+        return cls({f['name']: f['levels'] if 'levels' in f else f['edges'] for f in data['features']})
+
+class HashingStateEncoder:
+    # Fallback for undeclared state spaces: a CRC32 of the sorted items modulo
+    # the table size. Unlike hash() it does not change between processes, but
+    # distinct states can still collide.
+    def __init__(self, size: int):
+        self.size = size
+        self.features: Optional[List[str]] = None
+
+    def encode(self, state: Dict) -> int:
+        # NumPy scalars are unwrapped so rows from arrays hash like plain Python values
+        items = sorted((name, value.item() if isinstance(value, np.generic) else value) for name, value in state.items())
+        key = repr(items).encode('utf-8')
+        return zlib.crc32(key) % self.size
+
+    def encode_batch(self, states) -> np.ndarray:
+        if hasattr(states, 'to_dict') and not isinstance(states, dict):
+            states = states.to_dict('records')
+        elif isinstance(states, dict):
+            names = list(states)
+            states = [dict(zip(names, values)) for values in zip(*(states[name] for name in names))]
+        return np.fromiter((self.encode(state) for state in states), dtype=np.int64, count=len(states))
+
+    def to_dict(self) -> Dict:
+        return {'type': 'hashing', 'size': self.size}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'HashingStateEncoder':
+        return cls(data['size'])
+
+class SparseQTable:
+    # Dict-backed Q-store for state spaces too large to allocate densely. Rows
+    # are created on first write; unseen states read as zeros. Supports the
+    # indexing forms RLModel uses on the dense table: q[s], q[s, a], q[states]
+    # and q[states, actions] for reads, and q[s, a] / q[states, actions] for writes.
+    def __init__(self, state_size: int, action_size: int, dtype=np.float64):
+        self.shape = (state_size, action_size)
+        self.dtype = np.dtype(dtype)
+        self.rows: Dict[int, np.ndarray] = {}
+        self._zeros = np.zeros(action_size, dtype=self.dtype)
+        self._zeros.setflags(write=False)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _row(self, state: int) -> np.ndarray:
+        return self.rows.get(int(state), self._zeros)
+
+    def _gather(self, states: Sequence[int]) -> np.ndarray:
+        states = np.asarray(states, dtype=np.int64).reshape(-1)
+        out = np.zeros((len(states), self.shape[1]), dtype=self.dtype)
+        for position, state in enumerate(states.tolist()):
+            row = self.rows.get(state)
+            if row is not None:
+                out[position] = row
+        return out
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            states, actions = key
+            if np.ndim(states) == 0:
+                return self._row(states)[actions]
+            return self._gather(states)[np.arange(len(states)), np.asarray(actions)]
+        if np.ndim(key) == 0:
+            return self._row(key).copy()
+        return self._gather(key)
+
+    def __setitem__(self, key, value):
+        states, actions = key
+        states = np.atleast_1d(np.asarray(states, dtype=np.int64))
+        actions = np.atleast_1d(np.asarray(actions, dtype=np.int64))
+        values = np.broadcast_to(np.asarray(value, dtype=self.dtype), states.shape)
+        for state, action, v in zip(states.tolist(), actions.tolist(), values.tolist()):
+            row = self.rows.get(state)
+            if row is None:
+                row = self.rows[state] = np.zeros(self.shape[1], dtype=self.dtype)
+            row[action] = v
+
+    def to_dense(self) -> np.ndarray:
+        table = np.zeros(self.shape, dtype=self.dtype)
+        for state, row in self.rows.items():
+            table[state] = row
+        return table
@@ -1,15 +1,53 @@
-from typing import List, Dict
+import heapq
+import numpy as np
+from typing import List, Dict, Optional
+from config.settings import MAX_STAFF_WORKLOAD
 from src.data.staff import Staff
+from src.utils.metrics import timed_stage, record_unassigned
 
 class WorkloadDistributor:
-    def distribute_workload(self, staff: List[Staff], tasks: List[Dict]):
-        # Simple workload distribution algorithm (can be improved with more complex logic)
+    def __init__(self, default_capacity: float = MAX_STAFF_WORKLOAD):
+        self.default_capacity = default_capacity
+        # Running totals of the last distribution, keyed by staff id
+        self.workload: Dict = {}
+        self._last_distribution: Optional[List[Dict]] = None
+
+    @timed_stage('distribute')
+    def distribute_workload(self, staff: List[Staff], tasks: List[Dict], capacity: Optional[Dict] = None):
+        # Least-loaded-first assignment kept in priority queues: one heap over all
+        # available staff and one per role, ordered by (load, list position) so ties
+        # go to the earlier staff member. Heap entries carry a version number and
+        # are discarded lazily once that staff member's load has changed.
+        # A task may restrict eligible staff with 'role' (one role) or 'roles' (several),
+        # and weighs duration * weight (defaults 1 and 1). `capacity` maps staff ids
+        # to their own cap; a staff member stops taking tasks once it is reached.
+        capacity = capacity or {}
         distributed_tasks = []
-        staff_workload = {s.id: 0 for s in staff}
+        loads = [0] * len(staff)
+        versions = [0] * len(staff)
+
+        any_heap = []
+        role_heaps: Dict[str, List] = {}
+        for position, s in enumerate(staff):
+            if s.availability:
+                entry = (0, position, 0)
+                any_heap.append(entry)
+                role_heaps.setdefault(s.role, []).append(entry)
+        heapq.heapify(any_heap)
+        for heap in role_heaps.values():
+            heapq.heapify(heap)
 
         for task in tasks:
-            available_staff = [s for s in staff if s.availability]
-            if not available_staff:
+            heaps = self._eligible_heaps(task, any_heap, role_heaps)
+            best = None
+            for heap in heaps:
+                # Drop entries made stale by a later assignment or by reaching capacity
+                while heap and heap[0][2] != versions[heap[0][1]]:
+                    heapq.heappop(heap)
+                if heap and (best is None or heap[0] < best):
+                    best = heap[0]
+
+            if best is None:
                 # Handle case when no staff is available
                 distributed_tasks.append({
                     'task': task,
@@ -17,23 +55,165 @@ class WorkloadDistributor:
                 })
                 continue
 
-            # Assign task to the staff member with the lowest current workload
-            assigned_staff = min(available_staff, key=lambda s: staff_workload[s.id])
+            position = best[1]
+            assigned_staff = staff[position]
             distributed_tasks.append({
                 'task': task,
                 'assigned_to': assigned_staff
             })
-            staff_workload[assigned_staff.id] += task.get('duration', 1)  # Assume default duration of 1 if not specified
+            loads[position] += self._task_load(task)
+            versions[position] += 1
 
             # Update staff availability based on workload
-            if staff_workload[assigned_staff.id] >= 8:  # Assume 8 hours is full workload
+            if loads[position] >= capacity.get(assigned_staff.id, self.default_capacity):
                 assigned_staff.availability = False
+                versions[position] = -1
+            else:
+                entry = (loads[position], position, versions[position])
+                heapq.heappush(any_heap, entry)
+                heapq.heappush(role_heaps[assigned_staff.role], entry)
 
+        self.workload = {s.id: 0 for s in staff}
+        for position, s in enumerate(staff):
+            self.workload[s.id] += loads[position]
+        self._last_distribution = distributed_tasks
+        record_unassigned('task', sum(t['assigned_to'] is None for t in distributed_tasks))
         return distributed_tasks
 
+    @timed_stage('distribute')
+    def balance_workload(self, staff: List[Staff], tasks: List[Dict], capacity: Optional[Dict] = None,
+                         max_moves: int = 10000, candidates: int = 32) -> Dict:
+        # Min-makespan mode: longest-processing-time-first placement followed by
+        # improvement passes that move or swap tasks away from the most loaded
+        # staff member while that strictly lowers the pair's maximum load and
+        # keeps the receiver within its cap. Each pass scores the busiest staff
+        # member's tasks against the `candidates` least loaded eligible staff
+        # (and their tasks) with NumPy, so memory stays bounded for large rosters.
+        # Eligibility and capacity follow distribute_workload.
+        capacity = capacity or {}
+        available = [position for position, s in enumerate(staff) if s.availability]
+        roles = np.asarray([staff[position].role for position in available], dtype=object)
+        caps = np.asarray([capacity.get(staff[position].id, self.default_capacity) for position in available], dtype=float)
+        sizes = np.asarray([self._task_load(task) for task in tasks], dtype=float)
+        group, group_eligible = self._eligibility_groups(tasks, roles)
+
+        loads = np.zeros(len(available))
+        owner = np.full(len(tasks), -1, dtype=np.int64)
+        for t in np.argsort(-sizes, kind='stable'):
+            loads_left = np.where(group_eligible[group[t]] & (loads < caps), loads, np.inf)
+            if len(loads_left) and np.isfinite(loads_left.min()):
+                j = int(np.argmin(loads_left))
+                owner[t] = j
+                loads[j] += sizes[t]
+
+        moves = 0
+        while moves < max_moves and len(loads):
+            b = int(np.argmax(loads))
+            own = np.flatnonzero(owner == b)
+            if not len(own):
+                break
+            own_eligible = group_eligible[group[own]]
+
+            # Move one of b's tasks to one of the least loaded eligible staff
+            pool = own_eligible.any(axis=0)
+            pool[b] = False
+            targets = self._least_loaded(loads, pool, candidates)
+            if len(targets):
+                pair_max = np.maximum(loads[b] - sizes[own, None], loads[None, targets] + sizes[own, None])
+                allowed = own_eligible[:, targets] & (loads[None, targets] + sizes[own, None] <= caps[None, targets])
+                pair_max[~allowed] = np.inf
+                i, k = np.unravel_index(np.argmin(pair_max), pair_max.shape)
+                if pair_max[i, k] < loads[b] - 1e-9:
+                    t, j = own[i], targets[k]
+                    owner[t] = j
+                    loads[b] -= sizes[t]
+                    loads[j] += sizes[t]
+                    moves += 1
+                    continue
+
+            # Swap a task of b with a smaller task held by one of those staff
+            others = np.flatnonzero(np.isin(owner, targets))
+            if not len(others):
+                break
+            delta = sizes[own, None] - sizes[None, others]
+            holders = owner[others]
+            pair_max = np.maximum(loads[b] - delta, loads[holders][None, :] + delta)
+            allowed = ((delta > 0) & own_eligible[:, holders] & group_eligible[group[others], b][None, :]
+                       & (loads[holders][None, :] + delta <= caps[holders][None, :]))
+            pair_max[~allowed] = np.inf
+            i, k = np.unravel_index(np.argmin(pair_max), pair_max.shape)
+            if not pair_max[i, k] < loads[b] - 1e-9:
+                break
+            t, u = own[i], others[k]
+            j = owner[u]
+            owner[t], owner[u] = j, b
+            loads[b] -= delta[i, k]
+            loads[j] += delta[i, k]
+            moves += 1
+
+        distributed_tasks = [{
+            'task': task,
+            'assigned_to': staff[available[owner[t]]] if owner[t] >= 0 else None
+        } for t, task in enumerate(tasks)]
+
+        self.workload = {s.id: 0 for s in staff}
+        for j, position in enumerate(available):
+            self.workload[staff[position].id] += float(loads[j])
+            if loads[j] >= caps[j]:
+                staff[position].availability = False
+        self._last_distribution = distributed_tasks
+        record_unassigned('task', int(np.count_nonzero(owner < 0)))
+
+        return {
+            'assignments': distributed_tasks,
+            'workload': dict(self.workload),
+            'max_load': float(loads.max()) if len(loads) else 0.0,
+            'mean_load': float(loads.mean()) if len(loads) else 0.0,
+            'unassigned': int(np.count_nonzero(owner < 0)),
+            'moves': moves
+        }
+
+    def _eligibility_groups(self, tasks: List[Dict], roles: np.ndarray):
+        # (group per task, groups x staff boolean matrix) with one group per
+        # distinct role requirement, instead of a dense tasks x staff matrix
+        keys: Dict = {}
+        group = np.empty(len(tasks), dtype=np.int64)
+        for t, task in enumerate(tasks):
+            if task.get('roles') is not None:
+                key = tuple(task['roles'])
+            elif task.get('role') is not None:
+                key = (task['role'],)
+            else:
+                key = None
+            group[t] = keys.setdefault(key, len(keys))
+        group_eligible = np.zeros((len(keys), len(roles)), dtype=bool)
+        for key, g in keys.items():
+            group_eligible[g] = True if key is None else np.isin(roles, list(key))
+        return group, group_eligible
+
+    def _least_loaded(self, loads: np.ndarray, mask: np.ndarray, k: int) -> np.ndarray:
+        # Positions of up to k smallest loads among mask
+        positions = np.flatnonzero(mask)
+        if len(positions) > k:
+            positions = positions[np.argpartition(loads[positions], k - 1)[:k]]
+        return positions
+
+    def _eligible_heaps(self, task: Dict, any_heap: List, role_heaps: Dict[str, List]) -> List[List]:
+        if task.get('roles') is not None:
+            return [role_heaps[role] for role in task['roles'] if role in role_heaps]
+        if task.get('role') is not None:
+            return [role_heaps[task['role']]] if task['role'] in role_heaps else []
+        return [any_heap]
+
+    def _task_load(self, task: Dict):
+        return task.get('duration', 1) * task.get('weight', 1)  # Assume default duration of 1 if not specified
+
     def get_staff_workload(self, staff: List[Staff], distributed_tasks: List[Dict]):
+        # The result of the last distribute_workload call already has running totals
+        if distributed_tasks is self._last_distribution:
+            return dict(self.workload)
         workload = {s.id: 0 for s in staff}
         for task in distributed_tasks:
             if task['assigned_to']:
-                workload[task['assigned_to'].id] += task['task'].get('duration', 1)
-        return workload
\ No newline at end of file
+                workload[task['assigned_to'].id] += self._task_load(task['task'])
+        return workload
@@ -0,0 +1,106 @@
+from typing import Dict, Optional, Tuple
+from src.models.scheduler import DAY_START, DAY_END
+from src.utils.database import Database, format_date, patient_days_query, resource_days_query
+from src.utils.metrics import timed_stage
+
+# KPIs over stored schedules, computed by SQL aggregates on the assignments
+# table instead of replaying schedules in Python. Each query first reduces the
+# rows to one per resource (or clinic) and day, then sums those per period, so
+# period queries can read the daily rollup tables that save_schedule keeps
+# current instead (the per-day queries live in src/utils/database.py).
+#
+# Per resource: bookings, busy/idle/overtime minutes, the longest gap between
+# bookings and utilization (busy minutes over the opening hours of every day
+# the clinic has a schedule). Per clinic: patients, unassigned rate and the wait
+# from the requested to the booked start (bookings before the request count 0).
+
+PERIODS = {'day': "date", 'month': "substr(date, 1, 7)", 'year': "substr(date, 1, 4)"}
+
+def _range(start, end, clinic: Optional[str]) -> Tuple[str, Dict]:
+    where = "date >= :start AND date <= :end"
+    params = {'start': format_date(start), 'end': format_date(end)}
+    if clinic is not None:
+        where += " AND clinic = :clinic"
+        params['clinic'] = clinic
+    return where, params
+
+class Analytics:
+    def __init__(self, database: Database, day_start: int = DAY_START, day_end: int = DAY_END):
+        self.database = database
+        self.day_start = day_start
+        self.day_end = day_end
+
+    @timed_stage('analytics')
+    def refresh_rollups(self, start, end, clinic: Optional[str] = None) -> int:
+        # Rebuild the daily rollups of a date range, e.g. with other opening
+        # hours; save_schedule keeps them current otherwise. Returns the number
+        # of clinic days written.
+        return self.database.refresh_rollups(start, end, clinic, day_end=self.day_end)
+
+    def utilization(self, start, end, resource_type: str = 'staff', period: str = 'month',
+                    clinic: Optional[str] = None, rollups: bool = False):
+        # DataFrame with one row per period, clinic and booked resource
+        if resource_type not in ('staff', 'equipment'):
+            raise ValueError(f"Unknown resource type: {resource_type}")
+        group = self._period(period)
+        where, params = _range(start, end, clinic)
+        params.update(day_end=self.day_end, resource_type=resource_type, open_minutes=self.day_end - self.day_start)
+        if rollups:
+            source = f"SELECT * FROM daily_rollups WHERE resource_type = :resource_type AND {where}"
+        else:
+            source = resource_days_query(resource_type, where)
+        query = f"""
+            WITH opened AS (
+                SELECT {group} AS period, clinic, COUNT(*) AS days
+                FROM schedules WHERE {where}
+                GROUP BY period, clinic
+            ), daily AS ({source})
+            SELECT opened.period, daily.clinic, resource_id,
+                   SUM(bookings) AS bookings,
+                   SUM(busy_minutes) AS busy_minutes,
+                   SUM(idle_minutes) AS idle_minutes,
+                   MAX(longest_gap) AS longest_gap,
+                   SUM(overtime_minutes) AS overtime_minutes,
+                   opened.days,
+                   CAST(SUM(busy_minutes) AS REAL) / (opened.days * :open_minutes) AS utilization
+            FROM daily JOIN opened ON opened.period = {group.replace('date', 'daily.date')} AND opened.clinic = daily.clinic
+            GROUP BY opened.period, daily.clinic, resource_id
+            ORDER BY opened.period, daily.clinic, resource_id"""
+        return self._frame(query, params)
+
+    def patients(self, start, end, period: str = 'month', clinic: Optional[str] = None, rollups: bool = False):
+        # DataFrame with one row per period and clinic
+        group = self._period(period)
+        where, params = _range(start, end, clinic)
+        source = f"SELECT * FROM daily_patient_rollups WHERE {where}" if rollups else patient_days_query(where)
+        query = f"""
+            SELECT {group} AS period, clinic,
+                   COUNT(*) AS days,
+                   SUM(patients) AS patients,
+                   SUM(patients) - SUM(assigned) AS unassigned,
+                   CAST(SUM(patients) - SUM(assigned) AS REAL) / SUM(patients) AS unassigned_rate,
+                   CAST(SUM(wait_minutes) AS REAL) / NULLIF(SUM(waited), 0) AS mean_wait,
+                   MAX(max_wait) AS max_wait
+            FROM ({source})
+            GROUP BY period, clinic
+            ORDER BY period, clinic"""
+        return self._frame(query, params)
+
+    def report(self, start, end, period: str = 'month', clinic: Optional[str] = None, rollups: bool = False) -> Dict:
+        # All KPIs of a date range, e.g. a month-over-month report across clinics
+        return {
+            'staff': self.utilization(start, end, 'staff', period, clinic, rollups),
+            'equipment': self.utilization(start, end, 'equipment', period, clinic, rollups),
+            'patients': self.patients(start, end, period, clinic, rollups)
+        }
+
+    def _period(self, period: str) -> str:
+        if period not in PERIODS:
+            raise ValueError(f"Unknown period: {period}")
+        return PERIODS[period]
+
+    @timed_stage('analytics')
+    def _frame(self, query: str, params: Dict):
+        import pandas as pd
+        cursor = self.database.connect().execute(query, params)
+        return pd.DataFrame.from_records([tuple(row) for row in cursor], columns=[c[0] for c in cursor.description])
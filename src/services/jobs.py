@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Dict, List, Optional, Tuple
+from config.settings import (JOB_MAX_WORKERS, JOB_MAX_PENDING, JOB_PROGRESS_INTERVAL, MAX_SCHEDULE_GENERATION_TIME,
+                             SCHEDULER_ENGINE)
+from src.data.schedule import Schedule
+from src.models.scheduler import build_resources
+from src.services.planning import plan_day, serialize_schedule
+from src.services.schedule_cache import ScheduleCache
+from src.utils.database import Database
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+class JobQueueFull(Exception):
+    pass
+
+class JobCancelled(Exception):
+    pass
+
+class Job:
+    # A submitted job. Runners report progress with report() and check
+    # `cancelled` to stop early; `partial` builds the best result so far on demand.
+    # `owner` names the process running it (host:pid).
+    def __init__(self, kind: str, params: Dict, key: str, owner: Optional[str] = None,
+                 on_report: Optional[Callable[['Job'], None]] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.key = key
+        self.status = QUEUED
+        self.progress: Optional[Dict] = None
+        self.partial: Optional[Callable[[], Dict]] = None
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.future: Optional[Future] = None
+        self.owner = owner
+        self._on_report = on_report
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def report(self, progress: Dict, partial: Optional[Callable[[], Dict]] = None):
+        self.progress = progress
+        if partial is not None:
+            self.partial = partial
+        if self._on_report is not None:
+            self._on_report(self)
+
+    def record(self) -> Dict:
+        return {'id': self.id, 'kind': self.kind, 'key': self.key, 'params': self.params, 'status': self.status,
+                'progress': self.progress, 'result': self.result, 'error': self.error, 'created_at': self.created_at,
+                'started_at': self.started_at, 'finished_at': self.finished_at, 'owner': self.owner}
+
+class JobManager:
+    # Runs jobs on a bounded thread pool. `runners` maps a job kind to a function
+    # taking the Job and returning its JSON-ready result. Submitting the same kind
+    # and params while an identical job is queued or running returns that job.
+    # Every state change, and progress at most every `progress_interval`
+    # seconds, is written to the jobs table, so jobs can be polled through any
+    # process sharing the database and fetched after a restart. Deduplication,
+    # cancellation and partial results only work in the process running the job.
+    def __init__(self, database: Database, runners: Dict[str, Callable[[Job], Dict]],
+                 max_workers: int = JOB_MAX_WORKERS, max_pending: int = JOB_MAX_PENDING,
+                 progress_interval: float = JOB_PROGRESS_INTERVAL):
+        self.database = database
+        self.runners = runners
+        self.max_pending = max_pending
+        self.progress_interval = progress_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._saved_at: Dict[str, float] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='opdps-job')
+        self._active: Dict[str, Job] = {}
+        self._by_key: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._recover()
+
+    def _recover(self):
+        # Jobs left queued or running by a process that has exited will never finish
+        for status in (QUEUED, RUNNING):
+            for record in self.database.get_jobs(status=status, limit=self.max_pending * 100):
+                if not _owner_alive(record.get('owner')):
+                    record.update(status=FAILED, error="interrupted by a restart", finished_at=time.time())
+                    self.database.save_job(record)
+
+    def submit(self, kind: str, params: Dict) -> Tuple[Job, bool]:
+        # (job, created); created is False for a deduplicated submission
+        if kind not in self.runners:
+            raise ValueError(f"Unknown job kind: {kind}")
+        key = hashlib.sha1(json.dumps([kind, params], sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        with self._lock:
+            existing = self._by_key.get(key)
+            if existing is not None:
+                return existing, False
+            if len(self._active) >= self.max_pending:
+                raise JobQueueFull(f"{len(self._active)} jobs are already queued or running")
+            job = Job(kind, params, key, owner=self.owner, on_report=self._save_progress)
+            self._active[job.id] = job
+            self._by_key[key] = job
+        self.database.save_job(job.record())
+        job.future = self._executor.submit(self._run, job)
+        return job, True
+
+    def _run(self, job: Job):
+        if job.cancelled:
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        self.database.save_job(job.record())
+        try:
+            result = self.runners[job.kind](job)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            self._finish(job, FAILED, error=f"{type(e).__name__}: {e}")
+        else:
+            self._finish(job, CANCELLED if job.cancelled else SUCCEEDED, result=result)
+
+    def _save_progress(self, job: Job):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._saved_at.get(job.id, -self.progress_interval) < self.progress_interval:
+                return
+            self._saved_at[job.id] = now
+        self.database.save_job(job.record())
+
+    def _finish(self, job: Job, status: str, result: Optional[Dict] = None, error: Optional[str] = None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = time.time()
+        self.database.save_job(job.record())
+        with self._lock:
+            self._active.pop(job.id, None)
+            self._saved_at.pop(job.id, None)
+            if self._by_key.get(job.key) is job:
+                del self._by_key[job.key]
+
+    def get(self, job_id: str, partial: bool = False) -> Optional[Dict]:
+        job = self._active.get(job_id)
+        if job is None:
+            return self.database.get_job(job_id)
+        record = job.record()
+        if partial and job.partial is not None:
+            record['partial'] = job.partial()
+        return record
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        # Queued jobs are dropped, running ones stop at their next progress check
+        job = self._active.get(job_id)
+        if job is None:
+            return self.database.get_job(job_id)
+        job._cancel.set()
+        if job.future is not None and job.future.cancel():
+            self._finish(job, CANCELLED)
+        return job.record()
+
+    def list(self, status: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        records = self.database.get_jobs(status=status, limit=limit)
+        # In-flight jobs carry fresher progress in memory
+        return [self._active[r['id']].record() if r['id'] in self._active else r for r in records]
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            jobs = list(self._active.values())
+        for job in jobs:
+            self.cancel(job.id)
+        self._executor.shutdown(wait=wait)
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    # Jobs of other hosts are left to them; rows without an owner predate it
+    host, _, pid = (owner or '').rpartition(':')
+    if host != socket.gethostname():
+        return bool(owner)
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def planning_runner(database: Database, cache: Optional[ScheduleCache] = None,
+                    progress_interval: float = JOB_PROGRESS_INTERVAL) -> Callable[[Job], Dict]:
+    # Job runner planning one stored date ({'date', optional 'engine' and
+    # 'time_limit'}). The local search reports progress and a partial schedule
+    # and stops when the job is cancelled; only completed plans are saved and
+    # put into `cache`. A plan whose date was invalidated while it ran (e.g. by
+    # an ingest) is neither saved nor cached and the job fails with StaleSchedule.
+    def run(job: Job) -> Dict:
+        date = job.params['date']
+        engine = job.params.get('engine') or SCHEDULER_ENGINE
+        generation = cache.generation(date) if cache is not None else None
+        resources = build_resources(database.get_staff(), database.get_equipment())
+        patients = database.get_patients(date)
+
+        options = {}
+        if engine == 'local_search':
+            def progress(info: Dict, best: Callable[[], Schedule]) -> bool:
+                job.report(info, lambda: {'assignments': serialize_schedule(best())})
+                return job.cancelled
+            options = {'time_limit': job.params.get('time_limit', MAX_SCHEDULE_GENERATION_TIME),
+                       'progress': progress, 'progress_interval': progress_interval}
+
+        schedule = plan_day(resources, patients, date, engine, **options)
+        result = {'date': date, 'metrics': schedule.metrics, 'assignments': serialize_schedule(schedule)}
+        if job.cancelled:
+            return result
+        if cache is None:
+            database.save_schedule(schedule)
+            return result
+        with cache.locked(date):
+            with database.transaction():
+                database.save_schedule(schedule)
+                cache.put(date, schedule, resources, generation=generation)
+        return result
+    return run
@@ -0,0 +1,124 @@
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, List, Optional, Tuple
+from config.settings import PLANNING_MAX_WORKERS
+from src.data.columnar import StaffTable, EquipmentTable, PatientTable, AssignmentTable
+from src.models.scheduler import build_resources
+from src.services.planning import plan_day
+from src.utils.database import Database, format_date
+
+# Plans many (clinic, date) shards at once. Every clinic's staff and equipment
+# are sent to each worker process once, as columnar tables, when the worker
+# starts; a task then only carries that shard's patient rows. Workers return
+# AssignmentTables rather than schedules full of object references.
+
+_worker_resources: Dict[str, Tuple[StaffTable, EquipmentTable]] = {}
+
+def _init_worker(resources: Dict[str, Tuple[StaffTable, EquipmentTable]]):
+    global _worker_resources
+    _worker_resources = resources
+
+def _plan_shard(clinic: str, date: str, patients: PatientTable, engine: Optional[str]) -> Tuple[AssignmentTable, float]:
+    started = time.perf_counter()
+    staff, equipment = _worker_resources[clinic]
+    resources = build_resources(staff.to_objects(), equipment.to_objects())
+    schedule = plan_day(resources, patients.to_objects(), date, engine=engine)
+    return AssignmentTable.from_schedule(schedule), time.perf_counter() - started
+
+class ParallelPlanner:
+    # max_workers=None uses every core; 0 plans the shards in this process
+    def __init__(self, max_workers: Optional[int] = PLANNING_MAX_WORKERS, engine: Optional[str] = None):
+        self.max_workers = max_workers
+        self.engine = engine
+
+    def plan(self, resources: Dict[str, Tuple[StaffTable, EquipmentTable]], patients: Dict[str, PatientTable],
+             dates: Iterable) -> Dict:
+        # `resources` maps clinic -> (staff, equipment) tables and `patients`
+        # maps clinic -> patient table; every clinic is planned for every date.
+        # A failing shard is reported in 'failures' and does not stop the others.
+        started = time.perf_counter()
+        dates = [format_date(d) for d in dates]
+        shards = []
+        for clinic in sorted(resources):
+            table = patients.get(clinic, PatientTable.from_objects([]))
+            for date in dates:
+                shards.append((clinic, date, table.take(table['appointment_date'] == np.datetime64(date))))
+
+        results: Dict[Tuple[str, str], Tuple[AssignmentTable, float]] = {}
+        failures: List[Dict] = []
+        if self.max_workers == 0:
+            _init_worker(resources)
+            for clinic, date, shard in shards:
+                try:
+                    results[(clinic, date)] = _plan_shard(clinic, date, shard, self.engine)
+                except Exception as e:
+                    failures.append({'clinic': clinic, 'date': date, 'error': f"{type(e).__name__}: {e}"})
+        elif shards:
+            workers = min(self.max_workers or os.cpu_count() or 1, len(shards))
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(resources,)) as pool:
+                futures = {pool.submit(_plan_shard, clinic, date, shard, self.engine): (clinic, date)
+                           for clinic, date, shard in shards}
+                for future in as_completed(futures):
+                    clinic, date = futures[future]
+                    try:
+                        results[(clinic, date)] = future.result()
+                    except BrokenProcessPool as e:
+                        # A worker died; every unfinished shard fails with it
+                        failures.append({'clinic': clinic, 'date': date, 'error': f"worker crashed: {e}"})
+                    except Exception as e:
+                        failures.append({'clinic': clinic, 'date': date, 'error': f"{type(e).__name__}: {e}"})
+
+        return self._report(shards, results, failures, time.perf_counter() - started)
+
+    def plan_database(self, database: Database, dates: Iterable, clinics: Optional[List[str]] = None,
+                      save: bool = True) -> Dict:
+        # Plan stored clinics (all of them by default) and save the schedules
+        clinics = clinics if clinics is not None else database.get_clinics()
+        dates = list(dates)
+        resources = {clinic: (StaffTable.from_objects(database.get_staff(clinic=clinic)),
+                              EquipmentTable.from_objects(database.get_equipment(clinic=clinic)))
+                     for clinic in clinics}
+        # Only the requested days are loaded and sent to the workers
+        patients = {clinic: PatientTable.from_objects(database.get_patients(clinic=clinic, dates=dates)) for clinic in clinics}
+        report = self.plan(resources, patients, dates)
+
+        if save:
+            with database.transaction():
+                for (clinic, date), table in report['schedules'].items():
+                    staff, equipment = resources[clinic]
+                    patient_table = patients[clinic]
+                    day = patient_table.take(patient_table['appointment_date'] == np.datetime64(date))
+                    schedule = table.to_schedule(day.to_objects(),
+                                                 build_resources(staff.to_objects(), equipment.to_objects()))
+                    database.save_schedule(schedule, clinic=clinic)
+        return report
+
+    def _report(self, shards: List, results: Dict, failures: List[Dict], seconds: float) -> Dict:
+        rows = []
+        schedules = {}
+        for clinic, date, _ in shards:
+            if (clinic, date) not in results:
+                continue
+            table, shard_seconds = results[(clinic, date)]
+            schedules[(clinic, date)] = table
+            scheduled = int(np.count_nonzero(table['staff_id'] >= 0))
+            rows.append({'clinic': clinic, 'date': date, 'scheduled': scheduled,
+                         'unscheduled': len(table) - scheduled, 'seconds': shard_seconds,
+                         'metrics': table.metrics})
+        failures.sort(key=lambda failure: (failure['clinic'], failure['date']))
+        return {
+            'shards': rows,
+            'schedules': schedules,
+            'failures': failures,
+            'totals': {
+                'shards': len(shards),
+                'succeeded': len(rows),
+                'failed': len(failures),
+                'scheduled': sum(row['scheduled'] for row in rows),
+                'unscheduled': sum(row['unscheduled'] for row in rows),
+                'seconds': seconds
+            }
+        }
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from src.data.schedule import Schedule
+from src.services.planning import serialize_schedule
+from src.utils.metrics import CACHE_REQUESTS
+
+class StaleSchedule(Exception):
+    pass
+
+class CachedSchedule:
+    # A computed schedule with the resources it was planned on (needed to repair
+    # it incrementally) and its serialized rows, ETag and per-resource row index.
+    # `generation` identifies the inputs it was built from.
+    def __init__(self, date: str, schedule: Schedule, resources: List[Dict], generation: Optional[Tuple[int, int]] = None):
+        self.date = date
+        self.generation = generation
+        self.schedule = schedule
+        self.resources = resources
+        self.rows = serialize_schedule(schedule)
+        self.metrics = schedule.metrics
+        digest = hashlib.sha1(json.dumps([self.rows, self.metrics], sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        self.etag = f"{date}-{digest[:20]}"
+        # Row positions per (resource type, id) for per-resource pages
+        self.by_resource: Dict[Tuple[str, object], List[int]] = {}
+        for position, row in enumerate(self.rows):
+            for resource_type in ('staff', 'equipment', 'patient'):
+                resource_id = row.get(f'{resource_type}_id')
+                if resource_id is not None:
+                    self.by_resource.setdefault((resource_type, resource_id), []).append(position)
+
+class ScheduleCache:
+    # Per-date cache of computed schedules. An entry is rebuilt only after
+    # invalidate() names its date (or everything, when staff or equipment
+    # change); concurrent misses for one date wait for a single computation.
+    def __init__(self, compute: Callable[[str], Tuple[Schedule, List[Dict]]], max_dates: int = 400):
+        self._compute = compute
+        self._max_dates = max_dates
+        self._entries: 'OrderedDict[str, CachedSchedule]' = OrderedDict()
+        self._generation: Dict[str, int] = {}
+        self._global_generation = 0
+        self._lock = threading.Lock()
+        # Per-date [lock, users]; dropped once no thread holds or waits for it
+        self._date_locks: Dict[str, list] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, date: str) -> CachedSchedule:
+        with self._lock:
+            entry = self._entries.get(date)
+            if entry is not None:
+                self._entries.move_to_end(date)
+                self.hits += 1
+                CACHE_REQUESTS.inc(result='hit')
+                return entry
+
+        with self.locked(date):
+            with self._lock:
+                entry = self._entries.get(date)
+                if entry is not None:
+                    self.hits += 1
+                    CACHE_REQUESTS.inc(result='hit')
+                    return entry
+                self.misses += 1
+                CACHE_REQUESTS.inc(result='miss')
+                generation = (self._global_generation, self._generation.get(date, 0))
+
+            entry = CachedSchedule(date, *self._compute(date), generation=generation)
+
+            with self._lock:
+                # Inputs changed while computing: serve this result but do not keep it
+                if (self._global_generation, self._generation.get(date, 0)) == generation:
+                    self._entries[date] = entry
+                    while len(self._entries) > self._max_dates:
+                        self._entries.popitem(last=False)
+            return entry
+
+    @contextmanager
+    def locked(self, date: str):
+        # Serializes computations and updates of one date (reentrant)
+        with self._lock:
+            slot = self._date_locks.get(date)
+            if slot is None:
+                slot = self._date_locks[date] = [threading.RLock(), 0]
+            slot[1] += 1
+        try:
+            with slot[0]:
+                yield
+        finally:
+            with self._lock:
+                slot[1] -= 1
+                if not slot[1]:
+                    del self._date_locks[date]
+
+    def generation(self, date: str) -> Tuple[int, int]:
+        # Identifies a date's current inputs; changes whenever the date is invalidated
+        with self._lock:
+            return self._global_generation, self._generation.get(date, 0)
+
+    def put(self, date: str, schedule: Schedule, resources: List[Dict], base: Optional[CachedSchedule] = None,
+            generation: Optional[Tuple[int, int]] = None) -> CachedSchedule:
+        # Replace a date's entry, e.g. with an incrementally repaired schedule.
+        # With `base` (the entry it was derived from) or the `generation` its
+        # inputs were read at, the write is refused with StaleSchedule if the
+        # date was invalidated since.
+        if base is not None:
+            generation = base.generation
+        entry = CachedSchedule(date, schedule, resources)
+        with self._lock:
+            entry.generation = (self._global_generation, self._generation.get(date, 0))
+            if generation is not None and generation != entry.generation:
+                raise StaleSchedule(f"The schedule for {date} changed while it was being updated")
+            self._entries[date] = entry
+            self._entries.move_to_end(date)
+            while len(self._entries) > self._max_dates:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, dates: Optional[Iterable[str]] = None):
+        # No dates means every date, e.g. after staff or equipment changed
+        with self._lock:
+            if dates is None:
+                self._entries.clear()
+                self._global_generation += 1
+                return
+            for date in dates:
+                self._entries.pop(date, None)
+                self._generation[date] = self._generation.get(date, 0) + 1
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / total if total else 0.0,
+                'dates': len(self._entries)}
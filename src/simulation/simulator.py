@@ -0,0 +1,347 @@
+import heapq
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+from config.settings import SCHEDULE_OVERTIME_LIMIT
+from src.data.staff import Staff
+from src.data.patient import Patient
+from src.data.equipment import Equipment
+from src.models.resource_allocator import ResourceAllocator
+from src.models.scheduler import Scheduler, build_resources, DAY_START, DAY_END, APPOINTMENT_MINUTES
+from src.models.local_search_scheduler import LocalSearchScheduler
+
+# Event kinds; at equal times, lower values are handled first so resources
+# freed at a minute can serve patients arriving at that minute
+SERVICE_END = 0
+RESOURCE_CHANGE = 1  # shift starts and ends, equipment failures and repairs
+DECISION = 2
+ARRIVAL = 3
+CLOSE = 4
+
+class SimulationConfig:
+    # One clinic day. Times are minutes since midnight and rates are per hour
+    # (walk-ins) or per day (equipment failures). `shifts` gives (start, end)
+    # per regular staff member, repeated when shorter than `staff`. On-call staff
+    # are off duty until the staffing policy calls them in.
+    def __init__(self, staff: int = 8, equipment: int = 6, on_call_staff: int = 3, booked_patients: int = 100,
+                 walk_in_rate: float = 2.0, no_show_probability: float = 0.1, lateness_sd: float = 10.0,
+                 service_mean: float = APPOINTMENT_MINUTES, service_cv: float = 0.35,
+                 shifts: Optional[Sequence[Tuple[int, int]]] = None, equipment_failure_rate: float = 0.1,
+                 repair_mean: float = 60.0, decision_interval: int = 60, day_start: int = DAY_START,
+                 day_end: int = DAY_END, overtime_limit: int = SCHEDULE_OVERTIME_LIMIT, wait_cost: float = 1.0,
+                 on_call_cost: float = 2.0, max_waiting_state: int = 50):
+        self.staff = staff
+        self.equipment = equipment
+        self.on_call_staff = on_call_staff
+        self.booked_patients = booked_patients
+        self.walk_in_rate = walk_in_rate
+        self.no_show_probability = no_show_probability
+        self.lateness_sd = lateness_sd
+        self.service_mean = service_mean
+        self.service_cv = service_cv
+        self.shifts = list(shifts) if shifts else [(day_start, day_end)]
+        self.equipment_failure_rate = equipment_failure_rate
+        self.repair_mean = repair_mean
+        self.decision_interval = decision_interval
+        self.day_start = day_start
+        self.day_end = day_end
+        self.overtime_limit = overtime_limit
+        # Reward per interval: -(wait_cost * patient-hours waited + on_call_cost * on-call staff-hours)
+        self.wait_cost = wait_cost
+        self.on_call_cost = on_call_cost
+        self.max_waiting_state = max_waiting_state
+
+class FixedStaffingPolicy:
+    # Always keeps the same number of on-call staff on duty
+    def __init__(self, on_call: int = 0):
+        self.on_call = on_call
+
+    def __call__(self, state: Dict, rng: np.random.Generator) -> int:
+        return self.on_call
+
+class RLStaffingPolicy:
+    # Number of on-call staff on duty from an RLModel's greedy action, with
+    # optional epsilon exploration to generate varied training data
+    def __init__(self, model, epsilon: float = 0.0):
+        self.model = model
+        self.epsilon = epsilon
+
+    def __call__(self, state: Dict, rng: np.random.Generator) -> int:
+        if self.epsilon and rng.random() < self.epsilon:
+            return int(rng.integers(self.model.action_size))
+        return int(self.model.predict(state))
+
+class OutpatientSimulator:
+    # Discrete-event simulation of one day. The scheduler books the day's
+    # patients, the allocator pairs waiting patients with free staff and equipment
+    # whenever something changes, and the staffing policy decides every
+    # `decision_interval` minutes how many on-call staff are on duty. Each day
+    # yields metrics and an episode in the RLModel.train format.
+    def __init__(self, config: Optional[SimulationConfig] = None, scheduler: Optional[Scheduler] = None,
+                 allocator: Optional[ResourceAllocator] = None, staffing_policy=None):
+        self.config = config or SimulationConfig()
+        # Construction pass only: cheap and packs appointments in parallel
+        self.scheduler = scheduler or LocalSearchScheduler(max_iterations=0)
+        self.allocator = allocator or ResourceAllocator()
+        self.staffing_policy = staffing_policy or FixedStaffingPolicy(0)
+
+    def run_day(self, seed=None, date: str = '2023-05-01') -> Dict:
+        return _Day(self, np.random.default_rng(seed), date).run()
+
+class _Day:
+    def __init__(self, simulator: OutpatientSimulator, rng: np.random.Generator, date: str):
+        self.sim = simulator
+        self.config = config = simulator.config
+        self.rng = rng
+        self.date = date
+        self.close = config.day_end
+        self.events: List[Tuple] = []
+        self.sequence = 0
+
+        n_staff = config.staff + config.on_call_staff
+        self.staff = [Staff(i, f"Staff {i}", 'On-call' if i >= config.staff else 'Staff', False) for i in range(n_staff)]
+        self.equipment = [Equipment(j, f"Equipment {j}", False) for j in range(config.equipment)]
+        self.on_duty = [False] * n_staff
+        self.staff_busy = [False] * n_staff
+        self.equipment_up = [True] * config.equipment
+        self.equipment_busy = [False] * config.equipment
+
+        self.queue: List[int] = []
+        self.arrival_minute: Dict[int, float] = {}
+        self.service_time: Dict[int, float] = {}
+        self.waits: List[float] = []
+        self.unserved_waits: List[float] = []
+        self.now = float(config.day_start)
+        self.closed = False
+        # Integrals over time, updated as the clock advances
+        self.queue_area = 0.0
+        self.interval_queue_area = 0.0
+        self.interval_on_call_area = 0.0
+        self.duty_area = 0.0
+        self.staff_busy_area = 0.0
+        self.equipment_busy_area = 0.0
+        self.downtime = 0.0
+        self.overtime = 0.0
+        self.served = 0
+        self.counts = {'booked': 0, 'not_booked': 0, 'no_shows': 0, 'walk_ins': 0}
+
+    def push(self, time: float, kind: int, payload=None):
+        self.sequence += 1
+        heapq.heappush(self.events, (time, kind, self.sequence, payload))
+
+    def run(self) -> Dict:
+        self._book_patients()
+        self._plan_shifts()
+        self._plan_downtime()
+        for minute in range(self.config.day_start, self.close + 1, self.config.decision_interval):
+            self.push(minute, DECISION)
+        self.push(self.close + self.config.overtime_limit, CLOSE)
+
+        episode = {'initial_state': None, 'steps': []}
+        last_action = None
+        while self.events:
+            time, kind, _, payload = heapq.heappop(self.events)
+            self._advance(time)
+            if kind == ARRIVAL:
+                self.arrival_minute[payload] = time
+                self.queue.append(payload)
+            elif kind == SERVICE_END:
+                staff, equipment = payload
+                self.staff_busy[staff] = False
+                self.equipment_busy[equipment] = False
+            elif kind == DECISION:
+                state = self._state()
+                if episode['initial_state'] is None:
+                    episode['initial_state'] = state
+                else:
+                    episode['steps'].append({'action': last_action, 'next_state': state, 'reward': self._interval_reward()})
+                if time < self.close:
+                    last_action = self._apply_staffing(state)
+            elif kind == CLOSE:
+                self.closed = True
+                # Patients never seen count with their wait until closing, so serving
+                # fewer patients does not lower the wait metrics of a lean policy
+                self.unserved_waits = [time - self.arrival_minute[p] for p in self.queue]
+                self.waits.extend(self.unserved_waits)
+            else:
+                self._resource_event(payload)
+            if not self.closed:
+                self._dispatch()
+
+        return {'metrics': self._metrics(episode), 'episode': episode}
+
+    def _book_patients(self):
+        config = self.config
+        patients = [Patient(i, f"Patient {i}", f"{self.date} {config.day_start // 60:02d}:{config.day_start % 60:02d}")
+                    for i in range(config.booked_patients)]
+        regular = [Staff(s.id, s.name, s.role, True) for s in self.staff[:config.staff]]
+        equipment = [Equipment(e.id, e.type, True) for e in self.equipment]
+        schedule = self.sim.scheduler.generate_daily_schedule(build_resources(regular, equipment),
+                                                              [{'patient': p} for p in patients], date=self.date)
+        booked = [a['time'].hour * 60 + a['time'].minute for a in schedule.assignments if a['staff'] is not None]
+        self.counts['booked'] = len(booked)
+        self.counts['not_booked'] = config.booked_patients - len(booked)
+
+        # Vectorized draws for the booked patients, then the walk-ins
+        booked = np.asarray(booked, dtype=float)
+        shows = self.rng.random(len(booked)) >= config.no_show_probability
+        self.counts['no_shows'] = int(np.count_nonzero(~shows))
+        arrivals = booked[shows] + self.rng.normal(0.0, config.lateness_sd, int(shows.sum()))
+        arrivals = np.maximum(arrivals, config.day_start - 30)
+        hours = (self.close - config.day_start) / 60
+        walk_ins = np.sort(self.rng.uniform(config.day_start, self.close, self.rng.poisson(config.walk_in_rate * hours)))
+        self.counts['walk_ins'] = len(walk_ins)
+        arrivals = np.concatenate([arrivals, walk_ins])
+
+        # Lognormal service times with the configured mean and coefficient of variation
+        sigma = np.sqrt(np.log1p(config.service_cv ** 2))
+        mu = np.log(config.service_mean) - sigma ** 2 / 2
+        services = self.rng.lognormal(mu, sigma, len(arrivals))
+        for patient, (arrival, service) in enumerate(zip(arrivals.tolist(), services.tolist())):
+            self.service_time[patient] = service
+            self.push(arrival, ARRIVAL, patient)
+
+    def _plan_shifts(self):
+        for i in range(self.config.staff):
+            start, end = self.config.shifts[i % len(self.config.shifts)]
+            self.push(start, RESOURCE_CHANGE, ('on', i))
+            self.push(end, RESOURCE_CHANGE, ('off', i))
+
+    def _plan_downtime(self):
+        config = self.config
+        for j in range(config.equipment):
+            failures = self.rng.poisson(config.equipment_failure_rate)
+            for start in np.sort(self.rng.uniform(config.day_start, self.close, failures)).tolist():
+                self.push(start, RESOURCE_CHANGE, ('down', j))
+                self.push(start + self.rng.exponential(config.repair_mean), RESOURCE_CHANGE, ('up', j))
+
+    def _advance(self, time: float):
+        dt = max(0.0, time - self.now)
+        if dt:
+            on_call = sum(self.on_duty[self.config.staff:])
+            self.queue_area += len(self.queue) * dt
+            self.interval_queue_area += len(self.queue) * dt
+            self.interval_on_call_area += on_call * dt
+            # Staff sent home mid-service count as on duty until they finish
+            self.duty_area += sum(d or b for d, b in zip(self.on_duty, self.staff_busy)) * dt
+            self.staff_busy_area += sum(self.staff_busy) * dt
+            self.equipment_busy_area += sum(self.equipment_busy) * dt
+            self.downtime += self.equipment_up.count(False) * dt
+        self.now = max(self.now, time)
+
+    def _resource_event(self, payload: Tuple[str, int]):
+        action, index = payload
+        if action == 'on':
+            self.on_duty[index] = True
+        elif action == 'off':
+            self.on_duty[index] = False
+        elif action == 'down':
+            self.equipment_up[index] = False
+        else:
+            self.equipment_up[index] = True
+        self._sync()
+
+    def _sync(self):
+        # Availability seen by the allocator: on duty (or up) and not busy
+        for i, s in enumerate(self.staff):
+            s.availability = self.on_duty[i] and not self.staff_busy[i]
+        for j, e in enumerate(self.equipment):
+            e.availability = self.equipment_up[j] and not self.equipment_busy[j]
+
+    def _dispatch(self):
+        self._sync()
+        if not self.queue:
+            return
+        free = min(sum(s.availability for s in self.staff), sum(e.availability for e in self.equipment))
+        if not free:
+            return
+        waiting = [Patient(p, f"Patient {p}", None) for p in self.queue[:free]]
+        allocations = self.sim.allocator.allocate_resources(self.staff, waiting, self.equipment)
+        started = set()
+        for allocation in allocations:
+            if allocation['staff'] is None or allocation['equipment'] is None:
+                continue
+            patient = allocation['patient'].id
+            staff, equipment = allocation['staff'].id, allocation['equipment'].id
+            self.staff_busy[staff] = True
+            self.equipment_busy[equipment] = True
+            end = self.now + self.service_time[patient]
+            self.overtime += max(0.0, end - max(self.now, self.close))
+            self.waits.append(self.now - self.arrival_minute[patient])
+            self.served += 1
+            started.add(patient)
+            self.push(end, SERVICE_END, (staff, equipment))
+        self.queue = [p for p in self.queue if p not in started]
+
+    def _state(self) -> Dict:
+        return {'staff_available': sum(self.on_duty),
+                'patients_waiting': min(len(self.queue), self.config.max_waiting_state)}
+
+    def _apply_staffing(self, state: Dict) -> int:
+        action = int(self.sim.staffing_policy(state, self.rng))
+        wanted = min(max(action, 0), self.config.on_call_staff)
+        for k, index in enumerate(range(self.config.staff, self.config.staff + self.config.on_call_staff)):
+            # Staff sent home finish their current patient first (busy stays True)
+            self.on_duty[index] = k < wanted
+        self._sync()
+        return action
+
+    def _interval_reward(self) -> float:
+        config = self.config
+        reward = -(config.wait_cost * self.interval_queue_area + config.on_call_cost * self.interval_on_call_area) / 60
+        self.interval_queue_area = 0.0
+        self.interval_on_call_area = 0.0
+        return reward
+
+    def _metrics(self, episode: Dict) -> Dict:
+        waits = np.asarray(self.waits) if self.waits else np.zeros(1)
+        arrivals = len(self.arrival_minute)
+        return dict(self.counts, **{
+            'arrivals': arrivals,
+            'served': self.served,
+            'unserved': arrivals - self.served,
+            'mean_wait': float(waits.mean()),
+            'p90_wait': float(np.percentile(waits, 90)),
+            'max_wait': float(waits.max()),
+            'mean_unserved_wait': float(np.mean(self.unserved_waits)) if self.unserved_waits else 0.0,
+            'mean_queue': self.queue_area / max(self.now - self.config.day_start, 1.0),
+            'staff_utilization': self.staff_busy_area / self.duty_area if self.duty_area else 0.0,
+            'equipment_utilization': self.equipment_busy_area / ((self.now - self.config.day_start) * max(self.config.equipment, 1)),
+            'equipment_downtime_minutes': self.downtime,
+            'overtime_minutes': self.overtime,
+            'reward': float(sum(step['reward'] for step in episode['steps']))
+        })
+
+def _run_days(simulator: OutpatientSimulator, seeds: List[np.random.SeedSequence], date: str) -> List[Dict]:
+    return [simulator.run_day(seed, date) for seed in seeds]
+
+def simulate_days(simulator: OutpatientSimulator, days: int, seed: int = 0, processes: int = 0,
+                  date: str = '2023-05-01', chunk_size: int = 50) -> Dict:
+    # Independent replications of one day. Each day gets its own child of
+    # SeedSequence(seed), so results do not depend on `processes`; with
+    # processes > 0 chunks of days run in a process pool (the simulator and its
+    # policies must be picklable).
+    seeds = np.random.SeedSequence(seed).spawn(days)
+    chunks = [seeds[i:i + chunk_size] for i in range(0, days, chunk_size)]
+    if processes:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = [day for chunk in pool.map(_run_days, [simulator] * len(chunks), chunks, [date] * len(chunks))
+                       for day in chunk]
+    else:
+        results = [day for chunk in chunks for day in _run_days(simulator, chunk, date)]
+
+    metrics = [result['metrics'] for result in results]
+    return {
+        'days': metrics,
+        'episodes': [result['episode'] for result in results],
+        'summary': summarize(metrics)
+    }
+
+def summarize(metrics: List[Dict]) -> Dict[str, Dict[str, float]]:
+    # Mean, standard deviation and 5th/95th percentiles of every metric across days
+    summary = {}
+    for name in (metrics[0] if metrics else {}):
+        values = np.asarray([m[name] for m in metrics], dtype=float)
+        summary[name] = {'mean': float(values.mean()), 'std': float(values.std()),
+                         'p5': float(np.percentile(values, 5)), 'p95': float(np.percentile(values, 95))}
+    return summary
@@ -0,0 +1,100 @@
+import numpy as np
+from typing import Dict, Optional, Tuple
+from src.data.columnar import StaffTable, PatientTable, EquipmentTable, AssignmentTable, NO_ID
+from src.models.scheduler import build_resources, DAY_START, DAY_END, SLOT_MINUTES
+
+# Data preparation for the Streamlit dashboard (main.py), kept free of
+# Streamlit so it can be cached there and tested here. Frames are built from
+# whole columns; names are looked up by id with one searchsorted per column.
+
+ROLES = ('Doctor', 'Nurse')
+
+def generate_dataset(n_staff: int, n_patients: int, n_equipment: int, seed: int = 0,
+                     date: str = '2023-05-01') -> Tuple[StaffTable, PatientTable, EquipmentTable]:
+    rng = np.random.default_rng(seed)
+    staff_ids = np.arange(n_staff, dtype=np.int64)
+    staff = StaffTable(categories={'role': list(ROLES)},
+                       id=staff_ids,
+                       name=np.char.add('Staff ', staff_ids.astype(str)).astype(object),
+                       role=(staff_ids % 3 != 0).astype(np.int32),
+                       availability=np.ones(n_staff, dtype=bool))
+    patient_ids = np.arange(n_patients, dtype=np.int64)
+    minutes = rng.integers(0, (DAY_END - DAY_START) // SLOT_MINUTES, n_patients) * SLOT_MINUTES + DAY_START
+    patients = PatientTable(id=patient_ids,
+                            name=np.char.add('Patient ', patient_ids.astype(str)).astype(object),
+                            appointment_date=np.full(n_patients, np.datetime64(date, 'D')),
+                            appointment_minute=np.sort(minutes).astype(np.int32))
+    equipment_ids = np.arange(n_equipment, dtype=np.int64)
+    equipment = EquipmentTable(categories={'type': [f"Equipment {i}" for i in range(n_equipment)]},
+                               id=equipment_ids,
+                               type=equipment_ids.astype(np.int32),
+                               availability=np.ones(n_equipment, dtype=bool))
+    return staff, patients, equipment
+
+def lookup(ids: np.ndarray, table_ids: np.ndarray, values: np.ndarray, missing: str = 'N/A') -> np.ndarray:
+    # values[i] for every id, `missing` for ids not in the table (e.g. -1)
+    result = np.full(len(ids), missing, dtype=object)
+    if not len(table_ids):
+        return result
+    order = np.argsort(table_ids, kind='stable')
+    positions = np.clip(np.searchsorted(table_ids, ids, sorter=order), 0, len(order) - 1)
+    found = table_ids[order[positions]] == ids
+    result[found] = values[order[positions[found]]]
+    return result
+
+def clock(minutes: np.ndarray) -> np.ndarray:
+    hours = np.char.zfill((minutes // 60).astype(str), 2)
+    return np.char.add(np.char.add(hours, ':'), np.char.zfill((minutes % 60).astype(str), 2))
+
+def run_pipeline(staff: StaffTable, patients: PatientTable, equipment: EquipmentTable, rl_model,
+                 engine: Optional[str] = None, seed: int = 0, date: str = '2023-05-01') -> Dict:
+    # Allocation, schedule, workload and RL action as pandas frames. Model
+    # objects get fresh entities on every run since they mark them as taken.
+    import pandas as pd
+    from src.models.resource_allocator import ResourceAllocator
+    from src.models.workload_distributor import WorkloadDistributor
+    from src.services.planning import plan_day
+
+    staff_names, patient_names = staff['name'], patients['name']
+    equipment_names = equipment.labels('type')
+
+    allocation = ResourceAllocator().allocate_batch(staff.to_objects(), patients.to_objects(), equipment.to_objects())
+    allocations = pd.DataFrame({
+        'Patient': patient_names,
+        'Staff': lookup(allocation['staff_id'], staff['id'], staff_names),
+        'Equipment': lookup(allocation['equipment_id'], equipment['id'], equipment_names)
+    })
+
+    resources = build_resources(staff.to_objects(), equipment.to_objects())
+    table = AssignmentTable.from_schedule(plan_day(resources, patients.to_objects(), date, engine))
+    # The greedy engine leaves out patients it cannot fit before closing; list them as unscheduled
+    dropped = patients['id'][~np.isin(patients['id'], table['patient_id'])]
+    unassigned = np.full(len(dropped), NO_ID, dtype=np.int64)
+    schedule = pd.DataFrame({
+        'Time': np.concatenate([clock(table['start_minute']), np.full(len(dropped), 'Unscheduled')]),
+        'Patient': lookup(np.concatenate([table['patient_id'], dropped]), patients['id'], patient_names),
+        'Staff': lookup(np.concatenate([table['staff_id'], unassigned]), staff['id'], staff_names),
+        'Equipment': lookup(np.concatenate([table['equipment_id'], unassigned]), equipment['id'], equipment_names)
+    })
+
+    rng = np.random.default_rng(seed)
+    durations = rng.integers(1, 4, len(patients)).tolist()
+    tasks = [{'id': i, 'duration': d} for i, d in enumerate(durations)]
+    distributed = WorkloadDistributor().distribute_workload(staff.to_objects(), tasks)
+    assigned = np.fromiter((-1 if t['assigned_to'] is None else t['assigned_to'].id for t in distributed),
+                           dtype=np.int64, count=len(distributed))
+    workload = pd.DataFrame({
+        'Task ID': np.arange(len(tasks)),
+        'Assigned To': lookup(assigned, staff['id'], staff_names, missing='Unassigned')
+    })
+
+    state = {'staff_available': int(staff['availability'].sum()), 'patients_waiting': len(patients)}
+    return {
+        'allocations': allocations,
+        'schedule': schedule,
+        'workload': workload,
+        'rl_action': int(rl_model.predict(state)),
+        'scheduled': int(np.count_nonzero(table['staff_id'] >= 0)),
+        'patients': len(patients),
+        'metrics': table.metrics
+    }
@@ -1,14 +1,12 @@
 from flask import Blueprint, render_template, current_app
-import requests
 
-ui = Blueprint('ui', __name__)
+ui = Blueprint('ui', __name__, template_folder='templates')
 
 @ui.route('/schedule')
 def view_schedule():
     try:
-        # Make a request to the /simulate endpoint
-        response = requests.get('http://localhost:5000/simulate')
-        data = response.json()
+        # Same in-process (and cached) pipeline as /simulate, no HTTP round trip
+        data = current_app.extensions['opdps_simulation'].run()
 
         # Render the template with the simulation data
         return render_template('simulation_results.html',
@@ -1,20 +1,466 @@
+import json
 import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date as date_type, datetime
+from typing import Dict, Iterable, List, Optional
+from config.settings import DB_NAME, DB_POOL_SIZE, DAY_END
+from src.data.staff import Staff
+from src.data.patient import Patient
+from src.data.equipment import Equipment
+
+# Times inside a day are stored as minutes since midnight, dates as 'YYYY-MM-DD'.
+# Assignments repeat the schedule's date and clinic so range queries by
+# date/resource/time are answered from a single covering index. The daily
+# rollup tables are derived from assignments whenever a schedule is saved and
+# are read by src/services/analytics.py.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS staff (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    role TEXT NOT NULL,
+    availability INTEGER NOT NULL DEFAULT 1,
+    clinic TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_staff_clinic_role ON staff (clinic, role);
+
+CREATE TABLE IF NOT EXISTS patients (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    appointment_time TEXT,
+    appointment_date TEXT,
+    clinic TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_patients_date ON patients (appointment_date, clinic);
+
+CREATE TABLE IF NOT EXISTS equipment (
+    id INTEGER PRIMARY KEY,
+    type TEXT NOT NULL,
+    availability INTEGER NOT NULL DEFAULT 1,
+    clinic TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_equipment_clinic_type ON equipment (clinic, type);
+
+CREATE TABLE IF NOT EXISTS schedules (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,
+    clinic TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    metrics TEXT,
+    UNIQUE (date, clinic)
+);
+
+CREATE TABLE IF NOT EXISTS assignments (
+    schedule_id INTEGER NOT NULL REFERENCES schedules (id) ON DELETE CASCADE,
+    date TEXT NOT NULL,
+    clinic TEXT NOT NULL DEFAULT '',
+    patient_id INTEGER,
+    staff_id INTEGER,
+    equipment_id INTEGER,
+    start_minute INTEGER NOT NULL,
+    duration INTEGER NOT NULL DEFAULT 0,
+    requested_minute INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_assignments_schedule ON assignments (schedule_id);
+CREATE INDEX IF NOT EXISTS idx_assignments_staff ON assignments (date, staff_id, start_minute);
+CREATE INDEX IF NOT EXISTS idx_assignments_equipment ON assignments (date, equipment_id, start_minute);
+CREATE INDEX IF NOT EXISTS idx_assignments_patient ON assignments (date, patient_id);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    owner TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+
+CREATE TABLE IF NOT EXISTS daily_rollups (
+    date TEXT NOT NULL,
+    clinic TEXT NOT NULL DEFAULT '',
+    resource_type TEXT NOT NULL,
+    resource_id INTEGER NOT NULL,
+    bookings INTEGER NOT NULL,
+    busy_minutes INTEGER NOT NULL,
+    first_minute INTEGER,
+    last_minute INTEGER,
+    idle_minutes INTEGER NOT NULL,
+    longest_gap INTEGER NOT NULL,
+    overtime_minutes INTEGER NOT NULL,
+    PRIMARY KEY (date, clinic, resource_type, resource_id)
+);
+
+CREATE TABLE IF NOT EXISTS daily_patient_rollups (
+    date TEXT NOT NULL,
+    clinic TEXT NOT NULL DEFAULT '',
+    patients INTEGER NOT NULL,
+    assigned INTEGER NOT NULL,
+    waited INTEGER NOT NULL,
+    wait_minutes INTEGER NOT NULL,
+    max_wait INTEGER,
+    PRIMARY KEY (date, clinic)
+);
+"""
+
+RESOURCE_COLUMNS = {'staff': 'staff_id', 'equipment': 'equipment_id', 'patient': 'patient_id'}
+
+def resource_days_query(resource_type: str, where: str) -> str:
+    # One row per booked resource and day; `gap` is the time since the latest
+    # end of any earlier booking of the same resource that day
+    column = RESOURCE_COLUMNS[resource_type]
+    return f"""
+        SELECT date, clinic, '{resource_type}' AS resource_type, resource_id,
+               COUNT(*) AS bookings,
+               SUM(duration) AS busy_minutes,
+               MIN(start_minute) AS first_minute,
+               MAX(start_minute + duration) AS last_minute,
+               COALESCE(SUM(MAX(gap, 0)), 0) AS idle_minutes,
+               COALESCE(MAX(MAX(gap, 0)), 0) AS longest_gap,
+               SUM(MAX(start_minute + duration - MAX(start_minute, :day_end), 0)) AS overtime_minutes
+        FROM (
+            SELECT date, clinic, {column} AS resource_id, start_minute, duration,
+                   start_minute - MAX(start_minute + duration) OVER (
+                       PARTITION BY date, clinic, {column} ORDER BY start_minute
+                       ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING) AS gap
+            FROM assignments
+            WHERE {column} IS NOT NULL AND {where}
+        )
+        GROUP BY date, clinic, resource_id"""
+
+def patient_days_query(where: str) -> str:
+    # One row per clinic and day; a patient counts as assigned once booked with staff
+    return f"""
+        SELECT date, clinic,
+               COUNT(*) AS patients,
+               COUNT(staff_id) AS assigned,
+               COUNT(wait) AS waited,
+               COALESCE(SUM(wait), 0) AS wait_minutes,
+               MAX(wait) AS max_wait
+        FROM (
+            SELECT date, clinic, staff_id,
+                   CASE WHEN staff_id IS NOT NULL THEN MAX(start_minute - requested_minute, 0) END AS wait
+            FROM assignments
+            WHERE {where}
+        )
+        GROUP BY date, clinic"""
+
+def format_date(value) -> str:
+    if isinstance(value, (datetime, date_type)):
+        return value.strftime('%Y-%m-%d')
+    return str(value)[:10]
+
+def minute_of_day(value) -> Optional[int]:
+    # Minutes since midnight for a datetime or a 'YYYY-MM-DD HH:MM' / 'HH:MM' string
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.hour * 60 + value.minute
+    text = str(value).strip()
+    clock = text[11:16] if len(text) >= 16 else text[:5]
+    try:
+        hours, minutes = clock.split(':')
+        return int(hours) * 60 + int(minutes)
+    except ValueError:
+        return None
+
+def _entity_id(entity):
+    if entity is None:
+        return None
+    if isinstance(entity, dict):
+        return entity.get('id')
+    return entity.id
 
 class Database:
-    def __init__(self, db_name='opdps.db'):
+    def __init__(self, db_name=DB_NAME):
         self.db_name = db_name
+        # One connection per thread while in use. release() hands it back to a
+        # bounded idle pool, so servers that run each request on a new thread
+        # reuse connections instead of opening one per request
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._idle: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
 
     def connect(self):
-        return sqlite3.connect(self.db_name)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is not None:
+                self._local.conn = conn
+                return conn
+            # Autocommit mode: transactions are opened explicitly by transaction()
+            conn = sqlite3.connect(self.db_name, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def release(self):
+        # Give this thread's connection back to the idle pool (closed when the
+        # pool is full); called at the end of every web request
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        self._local.conn = None
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        with self._lock:
+            if len(self._idle) < DB_POOL_SIZE:
+                self._idle.append(conn)
+                return
+            self._connections.remove(conn)
+        conn.close()
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.conn = None
+            with self._lock:
+                self._connections.remove(conn)
+            conn.close()
+
+    def close_all(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._idle = []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    @contextmanager
+    def transaction(self):
+        # Nested calls join the outer transaction
+        conn = self.connect()
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute('BEGIN')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
 
     def create_tables(self):
         conn = self.connect()
-        cursor = conn.cursor()
+        conn.executescript(SCHEMA)
 
-        # Create tables: staff, patients, equipment, schedules
-        # TODO: Implement table creation SQL statements
+    # Bulk upserts: one executemany inside one transaction per call
 
-        conn.commit()
-        conn.close()
+    def upsert_staff(self, staff: Iterable[Staff], clinic: str = '') -> int:
+        rows = [(s.id, s.name, s.role, int(bool(s.availability)), clinic) for s in staff]
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO staff (id, name, role, availability, clinic) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET name = excluded.name, role = excluded.role, "
+                "availability = excluded.availability, clinic = excluded.clinic", rows)
+        return len(rows)
+
+    def upsert_patients(self, patients: Iterable[Patient], clinic: str = '') -> int:
+        rows = []
+        for p in patients:
+            appointment_time = p.appointment_time
+            if isinstance(appointment_time, datetime):
+                appointment_time = appointment_time.strftime('%Y-%m-%d %H:%M')
+            appointment_date = format_date(appointment_time) if appointment_time else None
+            rows.append((p.id, p.name, appointment_time, appointment_date, clinic))
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO patients (id, name, appointment_time, appointment_date, clinic) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET name = excluded.name, appointment_time = excluded.appointment_time, "
+                "appointment_date = excluded.appointment_date, clinic = excluded.clinic", rows)
+        return len(rows)
+
+    def upsert_equipment(self, equipment: Iterable[Equipment], clinic: str = '') -> int:
+        rows = [(e.id, e.type, int(bool(e.availability)), clinic) for e in equipment]
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO equipment (id, type, availability, clinic) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET type = excluded.type, "
+                "availability = excluded.availability, clinic = excluded.clinic", rows)
+        return len(rows)
+
+    def delete_patients(self, patient_ids: Iterable) -> int:
+        with self.transaction() as conn:
+            return conn.executemany("DELETE FROM patients WHERE id = ?", ((i,) for i in patient_ids)).rowcount
+
+    def get_staff(self, clinic: Optional[str] = None, role: Optional[str] = None) -> List[Staff]:
+        query, params = self._filtered("SELECT id, name, role, availability FROM staff", clinic=clinic, role=role)
+        return [Staff(r['id'], r['name'], r['role'], bool(r['availability']))
+                for r in self.connect().execute(query + " ORDER BY id", params)]
+
+    def get_patients(self, date=None, clinic: Optional[str] = None, dates: Optional[Iterable] = None) -> List[Patient]:
+        # One date, or any of several `dates` (queried in date order, 500 at a time)
+        if dates is not None:
+            dates = sorted({format_date(d) for d in dates})
+            return [p for begin in range(0, len(dates), 500) for p in self._patients(clinic, dates[begin:begin + 500])]
+        query, params = self._filtered("SELECT id, name, appointment_time FROM patients",
+                                       appointment_date=format_date(date) if date is not None else None, clinic=clinic)
+        return [Patient(r['id'], r['name'], r['appointment_time'])
+                for r in self.connect().execute(query + " ORDER BY appointment_time, id", params)]
+
+    def _patients(self, clinic: Optional[str], dates: List[str]) -> List[Patient]:
+        query, params = self._filtered("SELECT id, name, appointment_time FROM patients", clinic=clinic)
+        query += (" AND " if params else " WHERE ") + f"appointment_date IN ({', '.join('?' * len(dates))})"
+        return [Patient(r['id'], r['name'], r['appointment_time'])
+                for r in self.connect().execute(query + " ORDER BY appointment_time, id", params + dates)]
+
+    def get_patient_dates(self, patient_ids: Iterable) -> List[str]:
+        # Stored appointment dates of the given patients, e.g. before an upsert moves them
+        ids = list(patient_ids)
+        dates = set()
+        conn = self.connect()
+        for begin in range(0, len(ids), 500):
+            chunk = ids[begin:begin + 500]
+            dates.update(r['appointment_date'] for r in conn.execute(
+                f"SELECT DISTINCT appointment_date FROM patients WHERE id IN ({', '.join('?' * len(chunk))}) "
+                "AND appointment_date IS NOT NULL", chunk))
+        return sorted(dates)
+
+    def get_equipment(self, clinic: Optional[str] = None, type: Optional[str] = None) -> List[Equipment]:
+        query, params = self._filtered("SELECT id, type, availability FROM equipment", clinic=clinic, type=type)
+        return [Equipment(r['id'], r['type'], bool(r['availability']))
+                for r in self.connect().execute(query + " ORDER BY id", params)]
+
+    def get_clinics(self) -> List[str]:
+        query = "SELECT clinic FROM staff UNION SELECT clinic FROM equipment UNION SELECT clinic FROM patients"
+        return sorted(r['clinic'] for r in self.connect().execute(query))
+
+    def _filtered(self, query: str, **filters):
+        clauses = [f"{column} = ?" for column, value in filters.items() if value is not None]
+        params = [value for value in filters.values() if value is not None]
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        return query, params
+
+    def save_schedule(self, schedule, clinic: str = '') -> int:
+        # Replaces any stored schedule for the same date and clinic
+        date = format_date(schedule.date)
+        rows = []
+        for a in schedule.assignments:
+            patient = a['patient']
+            rows.append((
+                date, clinic, _entity_id(patient), _entity_id(a['staff']), _entity_id(a['equipment']),
+                minute_of_day(a['time']), a.get('duration', 0),
+                minute_of_day(getattr(patient, 'appointment_time', None))
+            ))
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM schedules WHERE date = ? AND clinic = ?", (date, clinic))
+            schedule_id = conn.execute(
+                "INSERT INTO schedules (date, clinic, metrics) VALUES (?, ?, ?)",
+                (date, clinic, json.dumps(getattr(schedule, 'metrics', None) or {}, default=str))).lastrowid
+            conn.executemany(
+                "INSERT INTO assignments (schedule_id, date, clinic, patient_id, staff_id, equipment_id, "
+                "start_minute, duration, requested_minute) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((schedule_id,) + row for row in rows))
+            self.refresh_rollups(date, date, clinic)
+        return schedule_id
+
+    def refresh_rollups(self, start, end, clinic: Optional[str] = None, day_end: int = DAY_END) -> int:
+        # Recompute the daily rollups of a date range from its assignments;
+        # returns the number of clinic days written
+        where = "date >= :start AND date <= :end"
+        params = {'start': format_date(start), 'end': format_date(end), 'day_end': day_end}
+        if clinic is not None:
+            where += " AND clinic = :clinic"
+            params['clinic'] = clinic
+        with self.transaction() as conn:
+            conn.execute(f"DELETE FROM daily_rollups WHERE {where}", params)
+            conn.execute(f"DELETE FROM daily_patient_rollups WHERE {where}", params)
+            for resource_type in ('staff', 'equipment'):
+                conn.execute("INSERT INTO daily_rollups " + resource_days_query(resource_type, where), params)
+            return conn.execute("INSERT INTO daily_patient_rollups " + patient_days_query(where), params).rowcount
+
+    def get_assignments(self, date, resource_type: Optional[str] = None, resource_id=None,
+                        start_minute: Optional[int] = None, end_minute: Optional[int] = None,
+                        clinic: Optional[str] = None) -> List[Dict]:
+        # All assignments for a date, optionally for one staff member, piece of
+        # equipment or patient and a [start_minute, end_minute) window
+        query = ("SELECT date, clinic, patient_id, staff_id, equipment_id, start_minute, duration, requested_minute "
+                 "FROM assignments WHERE date = ?")
+        params: list = [format_date(date)]
+        if resource_type is not None:
+            if resource_type not in RESOURCE_COLUMNS:
+                raise ValueError(f"Unknown resource type: {resource_type}")
+            query += f" AND {RESOURCE_COLUMNS[resource_type]} = ?"
+            params.append(resource_id)
+        if start_minute is not None:
+            query += " AND start_minute >= ?"
+            params.append(start_minute)
+        if end_minute is not None:
+            query += " AND start_minute < ?"
+            params.append(end_minute)
+        if clinic is not None:
+            query += " AND clinic = ?"
+            params.append(clinic)
+        return [dict(r) for r in self.connect().execute(query + " ORDER BY start_minute", params)]
+
+    def get_schedule_dates(self, start=None, end=None, clinic: Optional[str] = None) -> List[str]:
+        query = "SELECT DISTINCT date FROM schedules WHERE 1 = 1"
+        params: list = []
+        if start is not None:
+            query += " AND date >= ?"
+            params.append(format_date(start))
+        if end is not None:
+            query += " AND date <= ?"
+            params.append(format_date(end))
+        if clinic is not None:
+            query += " AND clinic = ?"
+            params.append(clinic)
+        return [r['date'] for r in self.connect().execute(query + " ORDER BY date", params)]
+
+    # Background jobs (see src/services/jobs.py); JSON columns are decoded on read
+
+    def save_job(self, job: Dict):
+        row = {column: job.get(column) for column in ('id', 'kind', 'key', 'status', 'error', 'created_at', 'started_at',
+                                                      'finished_at', 'owner')}
+        row['params'] = json.dumps(job.get('params') or {}, default=str)
+        for column in ('progress', 'result'):
+            row[column] = json.dumps(job[column], default=str) if job.get(column) is not None else None
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, key, params, status, progress, result, error, created_at, started_at, finished_at, owner) "
+                "VALUES (:id, :kind, :key, :params, :status, :progress, :result, :error, :created_at, :started_at, :finished_at, :owner) "
+                "ON CONFLICT (id) DO UPDATE SET status = excluded.status, progress = excluded.progress, "
+                "result = excluded.result, error = excluded.error, started_at = excluded.started_at, "
+                "finished_at = excluded.finished_at", row)
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        row = self.connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row is not None else None
+
+    def get_jobs(self, status: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        query, params = self._filtered("SELECT * FROM jobs", status=status)
+        return [self._job(r) for r in self.connect().execute(query + " ORDER BY created_at DESC LIMIT ?", params + [limit])]
+
+    def _job(self, row) -> Dict:
+        job = dict(row)
+        for column in ('params', 'progress', 'result'):
+            if job[column] is not None:
+                job[column] = json.loads(job[column])
+        return job
+
+_default_database: Optional[Database] = None
+_default_lock = threading.Lock()
 
-    # TODO: Add methods for CRUD operations on each table
\ No newline at end of file
+def get_database() -> Database:
+    # Process-wide database for the web app, created with its tables on first use
+    global _default_database
+    with _default_lock:
+        if _default_database is None:
+            _default_database = Database(DB_NAME)
+            _default_database.create_tables()
+        return _default_database
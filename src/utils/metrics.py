@@ -0,0 +1,231 @@
+import functools
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as StackCounter
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# In-process metrics rendered in the Prometheus text exposition format (served
+# on /metrics) plus a sampling profiler for slow requests. Metrics are per
+# process: worker processes of the parallel planner keep their own.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(labels.get(name, '') for name in self.labelnames), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines += [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series: Dict[Tuple, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(labels.get(name, '') for name in self.labelnames))
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+class Gauge:
+    # Evaluated when rendered, e.g. a ratio of two counters
+    def __init__(self, name: str, documentation: str, function: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge",
+                f"{self.name} {_format_value(self.function())}"]
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, function: Callable[[], float]) -> Gauge:
+        return self.register(Gauge(name, documentation, function))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram('opdps_stage_seconds', "Time spent in each planning stage", ['stage'])
+UNASSIGNED = REGISTRY.counter('opdps_unassigned_total', "Patients, allocations and tasks left without resources", ['kind'])
+CACHE_REQUESTS = REGISTRY.counter('opdps_schedule_cache_requests_total', "Schedule cache lookups", ['result'])
+REQUEST_SECONDS = REGISTRY.histogram('opdps_request_seconds', "HTTP request latency", ['method', 'endpoint', 'status'])
+SLOW_REQUESTS = REGISTRY.counter('opdps_slow_requests_total', "Requests over the profiling threshold", ['endpoint'])
+
+def _cache_hit_ratio() -> float:
+    hits, misses = CACHE_REQUESTS.value(result='hit'), CACHE_REQUESTS.value(result='miss')
+    return hits / (hits + misses) if hits + misses else 0.0
+
+REGISTRY.gauge('opdps_schedule_cache_hit_ratio', "Share of schedule cache lookups served from the cache", _cache_hit_ratio)
+
+def timed_stage(stage: str):
+    # Decorator recording the call's duration under opdps_stage_seconds{stage}
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+        return wrapper
+    return decorate
+
+def record_unassigned(kind: str, count: int):
+    if count:
+        UNASSIGNED.inc(count, kind=kind)
+
+class SamplingProfiler:
+    # One background thread samples the stacks of the threads registered with
+    # start() every `interval` seconds. stop() returns the thread's samples as
+    # collapsed stacks ("outer;inner;leaf" -> count), the input format of
+    # flamegraph.pl and speedscope. Sampling only runs while a request is active.
+    def __init__(self, output_dir: str, threshold: float, interval: float = 0.005):
+        self.output_dir = output_dir
+        self.threshold = threshold
+        self.interval = interval
+        self._active: Dict[int, StackCounter] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        with self._lock:
+            self._active[threading.get_ident()] = StackCounter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='opdps-profiler', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def stop(self) -> StackCounter:
+        with self._lock:
+            return self._active.pop(threading.get_ident(), StackCounter())
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            self._wakeup.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                if not self._active:
+                    self._wakeup.clear()
+                    continue
+                for thread_id, samples in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None and thread_id != own:
+                        samples[self._collapse(frame)] += 1
+
+    def _collapse(self, frame) -> str:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ';'.join(reversed(stack))
+
+    def dump(self, name: str, samples: StackCounter) -> Optional[str]:
+        if not samples:
+            return None
+        os.makedirs(self.output_dir, exist_ok=True)
+        safe = ''.join(c if c.isalnum() or c in '-_' else '_' for c in name).strip('_') or 'request'
+        path = os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{safe}-{threading.get_ident()}.folded")
+        with open(path, 'w') as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from flask import Flask
+from src.api.routes import api
+from src.data.patient import Patient
+from src.data.schedule import Schedule
+from src.services.analytics import Analytics
+from src.utils.database import Database
+
+def booking(patient, start, staff=None, equipment=None, duration=30):
+    return {'time': datetime.strptime(f"{patient.appointment_time[:10]} {start}", '%Y-%m-%d %H:%M'), 'duration': duration,
+            'patient': patient, 'staff': {'id': staff} if staff is not None else None,
+            'equipment': {'id': equipment} if equipment is not None else None}
+
+class TestAnalytics(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.tmp.name, 'opdps.db'))
+        self.db.create_tables()
+        patients = [Patient(i, f"Patient {i}", f"2023-05-01 {t}") for i, t in enumerate(['09:00', '09:30', '16:45', '10:00'])]
+        self.db.save_schedule(Schedule('2023-05-01', [
+            booking(patients[0], '09:00', staff=1, equipment=1),
+            booking(patients[1], '10:00', staff=1, equipment=1),
+            booking(patients[2], '16:45', staff=1),
+            booking(patients[3], '10:00', duration=0)
+        ]), clinic='north')
+        self.db.save_schedule(Schedule('2023-06-01', [booking(Patient(4, "Patient 4", "2023-06-01 09:00"), '09:00', staff=1)]),
+                              clinic='north')
+        self.db.save_schedule(Schedule('2023-05-02', [booking(Patient(5, "Patient 5", "2023-05-02 09:00"), '09:15', staff=2)]),
+                              clinic='south')
+        self.analytics = Analytics(self.db)
+
+    def tearDown(self):
+        self.db.close_all()
+        self.tmp.cleanup()
+
+    def test_month_over_month_kpis(self):
+        staff = self.analytics.utilization('2023-05-01', '2023-06-30').set_index(['period', 'clinic', 'resource_id'])
+        may = staff.loc[('2023-05', 'north', 1)]
+        self.assertEqual((may['bookings'], may['busy_minutes'], may['idle_minutes']), (3, 90, 405))
+        self.assertEqual((may['longest_gap'], may['overtime_minutes']), (375, 15))
+        self.assertAlmostEqual(may['utilization'], 90 / 480)
+        self.assertAlmostEqual(staff.loc[('2023-06', 'north', 1), 'utilization'], 30 / 480)
+        self.assertEqual(len(self.analytics.utilization('2023-05-01', '2023-06-30', 'equipment')), 1)
+
+        patients = self.analytics.patients('2023-05-01', '2023-06-30').set_index(['period', 'clinic'])
+        may = patients.loc[('2023-05', 'north')]
+        self.assertEqual((may['patients'], may['unassigned'], may['max_wait']), (4, 1, 30))
+        self.assertAlmostEqual(may['unassigned_rate'], 0.25)
+        self.assertAlmostEqual(may['mean_wait'], 10)
+        self.assertAlmostEqual(patients.loc[('2023-05', 'south'), 'mean_wait'], 15)
+
+    def test_rollups_match_direct_queries(self):
+        self.assertEqual(self.analytics.refresh_rollups('2023-05-01', '2023-06-30'), 3)
+        for period in ('day', 'month', 'year'):
+            direct = self.analytics.report('2023-05-01', '2023-06-30', period)
+            rolled = self.analytics.report('2023-05-01', '2023-06-30', period, rollups=True)
+            for name in direct:
+                self.assertTrue(direct[name].equals(rolled[name]), (period, name))
+        # Refreshing again replaces rather than duplicates
+        self.analytics.refresh_rollups('2023-05-01', '2023-05-31', clinic='north')
+        self.assertEqual(len(self.analytics.patients('2023-05-01', '2023-06-30', rollups=True)), 3)
+        with self.assertRaises(ValueError):
+            self.analytics.patients('2023-05-01', '2023-06-30', period='week')
+
+    def test_saved_schedules_keep_rollups_current(self):
+        def assert_rollups_match():
+            direct = self.analytics.report('2023-05-01', '2023-06-30', 'day')
+            rolled = self.analytics.report('2023-05-01', '2023-06-30', 'day', rollups=True)
+            for name in direct:
+                self.assertTrue(direct[name].equals(rolled[name]), name)
+
+        assert_rollups_match()
+        # Replanning a date replaces its rollups in the same transaction
+        patient = Patient(5, "Patient 5", "2023-05-02 09:00")
+        self.db.save_schedule(Schedule('2023-05-02', [booking(patient, '17:00', staff=3, equipment=2)]), clinic='south')
+        assert_rollups_match()
+        self.assertEqual(self.analytics.utilization('2023-05-02', '2023-05-02', period='day', rollups=True)
+                         ['overtime_minutes'].tolist(), [30])
+
+    def test_analytics_endpoint(self):
+        app = Flask(__name__)
+        app.config['DATABASE'] = self.db
+        app.register_blueprint(api)
+        client = app.test_client()
+        report = client.get('/api/analytics?start=2023-05-01&end=2023-05-31&clinic=north&period=day').get_json()
+        self.assertEqual([r['period'] for r in report['patients']], ['2023-05-01'])
+        self.assertEqual(report['equipment'][0]['busy_minutes'], 60)
+        self.assertEqual(client.get('/api/analytics?start=2023-05-01').status_code, 400)
+        self.assertEqual(client.get('/api/analytics?start=2023-05-01&end=2023-05-31&period=week').status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from flask import Flask
+from src.api.routes import api
+from src.models.rescheduler import Rescheduler
+from src.utils.database import Database
+
+class TestApi(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.tmp.name, 'opdps.db'))
+        self.db.create_tables()
+        app = Flask(__name__)
+        app.config['DATABASE'] = self.db
+        app.register_blueprint(api)
+        self.app = app
+        self.client = app.test_client()
+
+    def tearDown(self):
+        self.db.close_all()
+        self.tmp.cleanup()
+
+    def test_input_data_ndjson(self):
+        lines = [json.dumps({'kind': 'staff', 'id': i, 'name': f"Staff {i}", 'role': 'Nurse'}) for i in range(5)]
+        lines += [json.dumps({'kind': 'patient', 'id': i, 'name': f"Patient {i}", 'appointment_time': '2023-05-01 09:00'})
+                  for i in range(3)]
+        lines += ['{"kind": "equipment", "id": 1}', 'not json', '', json.dumps({'kind': 'equipment', 'id': 2, 'type': 'MRI'})]
+        response = self.client.post('/api/input_data?batch_size=4', data='\n'.join(lines),
+                                    content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual(body['accepted'], 9)
+        self.assertEqual(body['rejected_count'], 2)
+        self.assertEqual([r['record'] for r in body['rejected']], [9, 10])
+        self.assertEqual([b['batch'] for b in body['batches']], [1, 2, 3])
+        self.assertEqual(body['dates'], ['2023-05-01'])
+        self.assertEqual(len(self.db.get_staff()), 5)
+        self.assertEqual(len(self.db.get_patients('2023-05-01')), 3)
+
+    def test_input_data_json_array(self):
+        records = [{'id': i, 'type': 'XRay', 'availability': i % 2 == 0} for i in range(100)]
+        records.append({'id': 'x', 'type': 'XRay'})
+        response = self.client.post('/api/input_data?kind=equipment', data=json.dumps(records),
+                                    content_type='application/json')
+
+        body = response.get_json()
+        self.assertEqual(body['accepted'], 100)
+        self.assertEqual(body['rejected'], [{'record': 101, 'error': "field 'id' must be an integer"}])
+        self.assertTrue(body['resources_changed'])
+        self.assertEqual(len(self.db.get_equipment()), 100)
+
+        response = self.client.post('/api/input_data', data='[{"kind": "staff"', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_input_data_json_array_rejects_malformed_records(self):
+        # Bad rows in the middle of an array are rejected one at a time, as in NDJSON
+        good = [json.dumps({'id': i, 'type': 'XRay'}) for i in range(3)]
+        body = f'[{good[0]}, {{"id": 9 "type": ["]"]}}, {good[1]}, {{"kind": ["staff"], "id": 5}}, {good[2]}]'
+        response = self.client.post('/api/input_data?kind=equipment', data=body, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual(body['accepted'], 3)
+        self.assertEqual([r['record'] for r in body['rejected']], [2, 4])
+        self.assertTrue(body['rejected'][0]['error'].startswith('invalid JSON'))
+        self.assertEqual(body['rejected'][1]['error'], "missing or unknown 'kind'")
+
+    def test_input_data_rejects_invalid_utf8(self):
+        for content_type in ('application/json', 'application/x-ndjson'):
+            response = self.client.post('/api/input_data?kind=equipment', data=b'[{"id": 1, "type": "X\xff"}]',
+                                        content_type=content_type)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('UTF-8', response.get_json()['error'])
+
+    def _ingest(self, records):
+        return self.client.post('/api/input_data', data='\n'.join(json.dumps(r) for r in records),
+                                content_type='application/x-ndjson')
+
+    def test_get_schedule_cached_with_etag(self):
+        self._ingest([{'kind': 'staff', 'id': i, 'name': f"Staff {i}", 'role': 'Nurse'} for i in range(2)]
+                     + [{'kind': 'equipment', 'id': 1, 'type': 'MRI'}]
+                     + [{'kind': 'patient', 'id': i, 'name': f"Patient {i}", 'appointment_time': f'2023-05-01 09:{i:02d}'}
+                        for i in range(3)])
+
+        response = self.client.get('/api/get_schedule?date=2023-05-01')
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual([a['patient_id'] for a in body['assignments']], [0, 1, 2])
+        self.assertEqual(body['assignments'][1]['time'], '09:30')
+        etag = response.headers['ETag']
+
+        cached = self.client.get('/api/get_schedule?date=2023-05-01', headers={'If-None-Match': etag})
+        self.assertEqual(cached.status_code, 304)
+        cache = self.app.extensions['opdps_schedule_cache']
+        self.assertEqual((cache.misses, cache.hits), (1, 1))
+        # Reads plan but never persist
+        self.assertEqual(self.db.get_schedule_dates(), [])
+
+        page = self.client.get('/api/get_schedule?date=2023-05-01&resource_type=patient&resource_id=2&page_size=1')
+        self.assertEqual(page.get_json()['total'], 1)
+        self.assertNotEqual(page.headers['ETag'], etag)
+
+        # Ingest for another date leaves this one cached; ingest for this date recomputes it
+        self._ingest([{'kind': 'patient', 'id': 9, 'name': "Patient 9", 'appointment_time': '2023-05-02 09:00'}])
+        self.assertEqual(self.client.get('/api/get_schedule?date=2023-05-01', headers={'If-None-Match': etag}).status_code, 304)
+        self._ingest([{'kind': 'patient', 'id': 8, 'name': "Patient 8", 'appointment_time': '2023-05-01 08:00'}])
+        response = self.client.get('/api/get_schedule?date=2023-05-01', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['total'], 4)
+        self.assertEqual(cache.misses, 2)
+
+        # Moving a patient to another date also invalidates the date they left
+        etag = response.headers['ETag']
+        self._ingest([{'kind': 'patient', 'id': 8, 'name': "Patient 8", 'appointment_time': '2023-05-03 08:00'}])
+        response = self.client.get('/api/get_schedule?date=2023-05-01', headers={'If-None-Match': etag})
+        self.assertEqual(response.get_json()['total'], 3)
+        self.assertEqual(cache._date_locks, {})
+
+        self.assertEqual(self.client.get('/api/get_schedule?date=May').status_code, 400)
+
+    def test_reschedule_returns_diff(self):
+        self._ingest([{'kind': 'staff', 'id': i, 'name': f"Staff {i}", 'role': 'Nurse'} for i in range(2)]
+                     + [{'kind': 'equipment', 'id': i, 'type': 'MRI'} for i in range(2)]
+                     + [{'kind': 'patient', 'id': i, 'name': f"Patient {i}", 'appointment_time': '2023-05-01 09:00'}
+                        for i in range(3)])
+        etag = self.client.get('/api/get_schedule?date=2023-05-01').headers['ETag']
+
+        response = self.client.post('/api/reschedule', json={
+            'date': '2023-05-01',
+            'cancelled': [0],
+            'added': [{'id': 7, 'name': "Walk-in", 'appointment_time': '2023-05-01 11:00', 'duration': 15}]
+        })
+        self.assertEqual(response.status_code, 200)
+        changes = {c['patient_id']: c for c in response.get_json()['changes']}
+        self.assertEqual(changes[0]['change'], 'cancelled')
+        self.assertEqual(changes[7]['after']['time'], '11:00')
+        self.assertEqual(set(changes), {0, 7})
+
+        schedule = self.client.get('/api/get_schedule?date=2023-05-01', headers={'If-None-Match': etag})
+        self.assertEqual(schedule.status_code, 200)
+        self.assertEqual(sorted(a['patient_id'] for a in schedule.get_json()['assignments']), [1, 2, 7])
+        self.assertEqual([p.id for p in self.db.get_patients('2023-05-01')], [1, 2, 7])
+
+        bad = self.client.post('/api/reschedule', json={'date': '2023-05-01', 'staff_out': [42]})
+        self.assertEqual(bad.status_code, 400)
+
+    def test_reschedule_refuses_update_of_invalidated_date(self):
+        self._ingest([{'kind': 'staff', 'id': 0, 'name': "Staff 0", 'role': 'Nurse'}, {'kind': 'equipment', 'id': 0, 'type': 'MRI'},
+                      {'kind': 'patient', 'id': 1, 'name': "Patient 1", 'appointment_time': '2023-05-01 09:00'}])
+        self.client.get('/api/get_schedule?date=2023-05-01')
+        cache = self.app.extensions['opdps_schedule_cache']
+        repair = Rescheduler.repair
+
+        def repair_during_ingest(rescheduler, *args):
+            # An ingest for the date lands between reading and writing the schedule
+            cache.invalidate(['2023-05-01'])
+            return repair(rescheduler, *args)
+
+        added = {'added': [{'id': 7, 'name': "Walk-in", 'appointment_time': '2023-05-01 11:00'}]}
+        with mock.patch.object(Rescheduler, 'repair', repair_during_ingest):
+            response = self.client.post('/api/reschedule', json=dict(added, date='2023-05-01'))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual([p.id for p in self.db.get_patients('2023-05-01')], [1])
+        self.assertEqual(self.client.post('/api/reschedule', json=dict(added, date='2023-05-01')).status_code, 200)
+
+        # A reschedule waits while another update of the date holds its lock
+        results = []
+        late = threading.Thread(target=lambda: results.append(
+            self.client.post('/api/reschedule', json={'date': '2023-05-01', 'late': {'7': 15}}).status_code))
+        with cache.locked('2023-05-01'):
+            late.start()
+            late.join(0.2)
+            self.assertEqual(results, [])
+        late.join()
+        self.assertEqual(results, [200])
+
+if __name__ == '__main__':
+    unittest.main()
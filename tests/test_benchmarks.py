@@ -0,0 +1,39 @@
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+from benchmarks.generators import generate_patients, generate_transitions
+from benchmarks.run import run_suite, main
+
+FAST = ['resource_allocator', 'scheduler_greedy', 'workload_distribute', 'rl_train_batch']
+
+class TestBenchmarks(unittest.TestCase):
+    def test_generators_are_seeded(self):
+        first = [p.appointment_time for p in generate_patients(50, np.random.default_rng(3))]
+        second = [p.appointment_time for p in generate_patients(50, np.random.default_rng(3))]
+        self.assertEqual(first, second)
+        transitions = generate_transitions(100, 64, 4, np.random.default_rng(3))
+        self.assertTrue((transitions['next_states'] < 64).all())
+
+    def test_suite_reports_timings_and_memory(self):
+        report = run_suite(scales=['small'], names=FAST, repeat=1)
+        self.assertEqual([r['benchmark'] for r in report['results']], FAST)
+        self.assertTrue(all(r['seconds'] >= 0 and r['peak_bytes'] > 0 for r in report['results']))
+        self.assertEqual(report['results'][0]['metrics']['accuracy'], 1.0)
+        self.assertEqual(report['failures'], [])
+
+    def test_baseline_regression_fails(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline = os.path.join(tmp, 'baseline.json')
+            with open(baseline, 'w') as f:
+                json.dump({'rl_train_batch/small': 1e-9}, f)
+            output = os.path.join(tmp, 'results.json')
+            status = main(['--scales', 'small', '--benchmarks', 'rl_train_batch', '--repeat', '1', '--no-memory',
+                           '--baseline', baseline, '--output', output])
+            self.assertEqual(status, 1)
+            with open(output) as f:
+                self.assertIn('baseline', json.load(f)['failures'][0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+from datetime import date
+import numpy as np
+from src.data.columnar import StaffTable, EquipmentTable, PatientTable, AssignmentTable, NO_ID, NO_TIME
+from src.data.staff import Staff
+from src.data.patient import Patient
+from src.data.equipment import Equipment
+from src.models.scheduler import Scheduler, build_resources
+
+class TestColumnar(unittest.TestCase):
+    def test_slotted_records(self):
+        staff = Staff(1, "Dr. Smith", "Doctor", True)
+        with self.assertRaises(AttributeError):
+            staff.extra = 1
+        self.assertFalse(hasattr(staff, '__dict__'))
+
+    def test_round_trip(self):
+        staff = [Staff(1, "Dr. Smith", "Doctor", True), Staff(2, "Nurse Johnson", "Nurse", False), Staff(3, "Dr. Lee", "Doctor", True)]
+        table = StaffTable.from_objects(staff)
+        self.assertEqual(table.categories['role'], ['Doctor', 'Nurse'])
+        self.assertEqual(table['role'].tolist(), [0, 1, 0])
+        self.assertEqual([(s.id, s.name, s.role, s.availability) for s in table.to_objects()],
+                         [(s.id, s.name, s.role, s.availability) for s in staff])
+
+        patients = [Patient(7, "John Doe", "2023-05-01 09:30"), Patient(8, "Jane Roe", "2023-05-02 14:05")]
+        table = PatientTable.from_objects(patients)
+        self.assertEqual(table['appointment_minute'].tolist(), [570, 845])
+        self.assertEqual([p.appointment_time for p in table.to_objects()], ["2023-05-01 09:30", "2023-05-02 14:05"])
+        self.assertEqual(len(table.take(table['appointment_date'] == np.datetime64('2023-05-02'))), 1)
+
+        # A patient without an appointment time round-trips as None
+        table = PatientTable.from_objects([Patient(9, "Walk-in", None)] + patients)
+        self.assertEqual(table['appointment_minute'].tolist(), [NO_TIME, 570, 845])
+        self.assertTrue(np.isnat(table['appointment_date'][0]))
+        self.assertEqual([p.appointment_time for p in table.to_objects()], [None, "2023-05-01 09:30", "2023-05-02 14:05"])
+
+        equipment = [Equipment(1, "X-Ray", True), Equipment(2, "MRI", True)]
+        frame = EquipmentTable.from_objects(equipment).to_pandas()
+        self.assertEqual(str(frame['type'].dtype), 'category')
+        self.assertEqual(frame['type'].tolist(), ["X-Ray", "MRI"])
+        self.assertEqual([e.type for e in EquipmentTable.from_pandas(frame).to_objects()], ["X-Ray", "MRI"])
+
+    def test_schedule_round_trip(self):
+        resources = build_resources([Staff(1, "Dr. Smith", "Doctor", True)], [Equipment(1, "X-Ray", True)])
+        patients = [Patient(i, f"Patient {i}", "2023-05-01 09:00") for i in range(3)]
+        schedule = Scheduler().generate_daily_schedule(resources, [{'patient': p} for p in patients], date=date(2023, 5, 1))
+        table = AssignmentTable.from_schedule(schedule)
+        self.assertEqual(table['start_minute'].tolist()[:2], [540, 570])
+
+        rebuilt = table.to_schedule(patients, resources)
+        self.assertEqual([(a['time'], a['patient'].id, a['staff'] is None) for a in rebuilt.assignments],
+                         [(a['time'], a['patient'].id, a['staff'] is None) for a in schedule.assignments])
+        unscheduled = table['staff_id'] == NO_ID
+        self.assertEqual(int(unscheduled.sum()), sum(a['staff'] is None for a in schedule.assignments))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import tempfile
+import threading
+import unittest
+from datetime import date
+from src.utils.database import Database
+from src.data.staff import Staff
+from src.data.patient import Patient
+from src.data.equipment import Equipment
+from src.data.schedule import Schedule
+from src.models.scheduler import Scheduler
+
+class TestDatabase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.tmp.name, 'opdps.db'))
+        self.db.create_tables()
+
+    def tearDown(self):
+        self.db.close_all()
+        self.tmp.cleanup()
+
+    def test_bulk_upsert_and_query(self):
+        staff = [Staff(i, f"Staff {i}", "Doctor" if i % 3 == 0 else "Nurse", True) for i in range(30000)]
+        statements = []
+        self.db.connect().set_trace_callback(statements.append)
+        self.assertEqual(self.db.upsert_staff(staff, clinic='north'), 30000)
+        self.db.connect().set_trace_callback(None)
+        # One transaction for the whole batch
+        self.assertEqual(statements.count('BEGIN'), 1)
+        self.assertEqual(statements.count('COMMIT'), 1)
+        self.assertEqual(self.db.connect().execute("SELECT COUNT(*) FROM staff").fetchone()[0], 30000)
+
+        self.db.upsert_staff([Staff(0, "Renamed", "Surgeon", False)], clinic='north')
+        self.assertEqual(len(self.db.get_staff(clinic='north', role='Doctor')), 9999)
+        surgeon = self.db.get_staff(role='Surgeon')[0]
+        self.assertEqual((surgeon.name, surgeon.availability), ("Renamed", False))
+
+        self.db.upsert_patients([Patient(i, f"Patient {i}", f"2023-05-0{1 + i % 2} 09:00") for i in range(10)])
+        self.assertEqual([p.id for p in self.db.get_patients(date(2023, 5, 2))], [1, 3, 5, 7, 9])
+        self.assertEqual([p.id for p in self.db.get_patients(dates=[date(2023, 5, 2), '2023-05-03'])], [1, 3, 5, 7, 9])
+        self.assertEqual(len(self.db.get_patients(clinic='', dates=['2023-05-01', '2023-05-02'])), 10)
+        self.db.upsert_equipment([Equipment(i, "MRI", True) for i in range(3)])
+        self.assertEqual(len(self.db.get_equipment(type='MRI')), 3)
+
+    def test_released_connections_are_reused_by_new_threads(self):
+        self.db.release()
+
+        def request():
+            self.db.get_staff()
+            self.db.release()
+
+        for _ in range(50):
+            thread = threading.Thread(target=request)
+            thread.start()
+            thread.join()
+        self.assertEqual(len(self.db._connections), 1)
+
+    def test_save_schedule_and_range_queries(self):
+        resources = [{'type': 'staff', 'id': 7, 'availability': {}}, {'type': 'equipment', 'id': 2, 'availability': {}}]
+        patients = [Patient(i, f"Patient {i}", "2023-05-01 09:00") for i in range(4)]
+        schedule = Scheduler().generate_daily_schedule(resources, [{'patient': p} for p in patients])
+        schedule = Schedule(date(2023, 5, 1), schedule.assignments)
+        self.db.save_schedule(schedule)
+        # Saving again replaces the stored schedule instead of duplicating it
+        self.db.save_schedule(schedule)
+
+        rows = self.db.get_assignments('2023-05-01', 'staff', 7)
+        self.assertEqual([r['start_minute'] for r in rows], [540, 570, 600, 630])
+        self.assertEqual(rows[0]['requested_minute'], 540)
+        window = self.db.get_assignments('2023-05-01', 'equipment', 2, start_minute=570, end_minute=630)
+        self.assertEqual([r['patient_id'] for r in window], [1, 2])
+        self.assertEqual(self.db.get_schedule_dates(), ['2023-05-01'])
+
+    def test_connection_reused_per_thread(self):
+        self.assertIs(self.db.connect(), self.db.connect())
+        other = []
+        thread = threading.Thread(target=lambda: other.append(self.db.connect()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], self.db.connect())
+        self.assertEqual(self.db.connect().execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+
+    def test_transaction_rolls_back(self):
+        with self.assertRaises(RuntimeError):
+            with self.db.transaction():
+                self.db.upsert_staff([Staff(1, "Staff 1", "Nurse", True)])
+                raise RuntimeError("abort")
+        self.assertEqual(self.db.get_staff(), [])
+
+if __name__ == '__main__':
+    unittest.main()
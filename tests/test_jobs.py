@@ -0,0 +1,171 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from flask import Flask
+from src.api.routes import api
+from src.data.staff import Staff
+from src.data.patient import Patient
+from src.data.equipment import Equipment
+from src.models.local_search_scheduler import LocalSearchScheduler
+from src.models.scheduler import build_resources
+from src.services import jobs as jobs_module
+from src.services.jobs import JobManager, planning_runner, JobQueueFull, RUNNING, SUCCEEDED, CANCELLED, FAILED
+from src.services.schedule_cache import ScheduleCache
+from src.utils.database import Database
+
+def wait_for(manager, job_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job['status'] in (SUCCEEDED, CANCELLED, FAILED):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+class TestJobs(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.tmp.name, 'opdps.db'))
+        self.db.create_tables()
+        self.release = threading.Event()
+
+        def blocking(job):
+            while not self.release.wait(0.01):
+                job.report({'step': 1}, lambda: {'value': 42})
+                if job.cancelled:
+                    return {'stopped': True}
+            return {'echo': job.params}
+
+        self.manager = JobManager(self.db, {'block': blocking}, max_workers=1, max_pending=2)
+
+    def tearDown(self):
+        self.release.set()
+        self.manager.shutdown()
+        self.db.close_all()
+        self.tmp.cleanup()
+
+    def test_dedup_limit_and_persisted_result(self):
+        first, created = self.manager.submit('block', {'n': 1})
+        again, created_again = self.manager.submit('block', {'n': 1})
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertIs(again, first)
+        self.manager.submit('block', {'n': 2})
+        with self.assertRaises(JobQueueFull):
+            self.manager.submit('block', {'n': 3})
+
+        self.release.set()
+        self.assertEqual(wait_for(self.manager, first.id)['result'], {'echo': {'n': 1}})
+        # Finished jobs come from the database, also for a new manager
+        restarted = JobManager(self.db, {})
+        self.assertEqual(restarted.get(first.id)['status'], SUCCEEDED)
+        restarted.shutdown()
+
+    def test_progress_partial_and_cancel(self):
+        running, _ = self.manager.submit('block', {'n': 1})
+        queued, _ = self.manager.submit('block', {'n': 2})
+        while self.manager.get(running.id)['progress'] is None:
+            time.sleep(0.01)
+        self.assertEqual(self.manager.get(running.id, partial=True)['partial'], {'value': 42})
+
+        self.assertEqual(self.manager.cancel(queued.id)['status'], CANCELLED)
+        self.manager.cancel(running.id)
+        job = wait_for(self.manager, running.id)
+        self.assertEqual((job['status'], job['result']), (CANCELLED, {'stopped': True}))
+
+    def test_interrupted_jobs_fail_on_restart(self):
+        exited = subprocess.Popen([sys.executable, '-c', ''])
+        exited.wait()
+        self.db.save_job({'id': 'stale', 'kind': 'block', 'key': 'k', 'params': {}, 'status': 'running',
+                          'created_at': time.time(), 'owner': f"{socket.gethostname()}:{exited.pid}"})
+        JobManager(self.db, {}).shutdown()
+        self.assertEqual(self.db.get_job('stale')['status'], FAILED)
+
+    def test_second_manager_leaves_running_jobs_alone(self):
+        running, _ = self.manager.submit('block', {'n': 1})
+        while self.manager.get(running.id)['progress'] is None:
+            time.sleep(0.01)
+        # Another worker on the same database sees the job and its persisted progress
+        other = JobManager(self.db, {})
+        job = other.get(running.id)
+        self.assertEqual((job['status'], job['progress']), (RUNNING, {'step': 1}))
+        other.shutdown()
+
+        self.release.set()
+        self.assertEqual(wait_for(self.manager, running.id)['status'], SUCCEEDED)
+
+    def test_local_search_progress_can_stop_search(self):
+        resources = build_resources([Staff(1, "Dr. Smith", "Doctor", True)], [Equipment(1, "X-Ray", True)])
+        appointments = [{'patient': Patient(i, f"Patient {i}", "2023-05-01 09:00")} for i in range(40)]
+        reports = []
+
+        def progress(info, best):
+            reports.append((info, best()))
+            return True
+
+        schedule = LocalSearchScheduler(time_limit=10, seed=1, progress=progress).generate_daily_schedule(
+            resources, appointments, date='2023-05-01')
+        self.assertTrue(schedule.metrics['cancelled'])
+        self.assertEqual(len(reports), 1)
+        self.assertEqual(len([a for a in reports[0][1].assignments if a['staff']]), reports[0][0]['scheduled'])
+
+    def test_plan_job_refuses_stale_schedule(self):
+        self.db.upsert_staff([Staff(1, "Staff 1", "Nurse", True)])
+        self.db.upsert_equipment([Equipment(1, "X-Ray", True)])
+        self.db.upsert_patients([Patient(i, f"Patient {i}", "2023-05-01 09:00") for i in range(3)])
+        cache = ScheduleCache(lambda date: (None, []))
+        plan_day = jobs_module.plan_day
+
+        def plan_during_ingest(*args, **kwargs):
+            # A patient is ingested for the date while the job is planning it
+            schedule = plan_day(*args, **kwargs)
+            self.db.upsert_patients([Patient(3, "Patient 3", "2023-05-01 10:00")])
+            cache.invalidate(['2023-05-01'])
+            return schedule
+
+        manager = JobManager(self.db, {'plan': planning_runner(self.db, cache=cache)})
+        with mock.patch.object(jobs_module, 'plan_day', plan_during_ingest):
+            stale, _ = manager.submit('plan', {'date': '2023-05-01'})
+            job = wait_for(manager, stale.id)
+        self.assertEqual(job['status'], FAILED)
+        self.assertTrue(job['error'].startswith('StaleSchedule'))
+        self.assertEqual((self.db.get_assignments('2023-05-01'), cache.stats()['dates']), ([], 0))
+
+        fresh, _ = manager.submit('plan', {'date': '2023-05-01'})
+        self.assertEqual(wait_for(manager, fresh.id)['status'], SUCCEEDED)
+        self.assertEqual(len(self.db.get_assignments('2023-05-01')), 4)
+        self.assertEqual(cache.stats()['dates'], 1)
+        manager.shutdown()
+
+    def test_plan_job_endpoint(self):
+        app = Flask(__name__)
+        app.config['DATABASE'] = self.db
+        app.register_blueprint(api)
+        client = app.test_client()
+        self.db.upsert_staff([Staff(i, f"Staff {i}", "Nurse", True) for i in range(2)])
+        self.db.upsert_equipment([Equipment(i, "X-Ray", True) for i in range(2)])
+        self.db.upsert_patients([Patient(i, f"Patient {i}", "2023-05-01 09:00") for i in range(6)])
+
+        response = client.post('/api/jobs', data=json.dumps({'date': '2023-05-01', 'engine': 'local_search', 'time_limit': 1}),
+                               content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.get_json()['job_id']
+        jobs = app.extensions['opdps_jobs']
+        job = wait_for(jobs, job_id)
+        self.assertEqual(job['status'], SUCCEEDED)
+        self.assertEqual(len(job['result']['assignments']), 6)
+        self.assertEqual(client.get(f'/api/jobs/{job_id}').get_json()['status'], SUCCEEDED)
+        self.assertEqual(len(self.db.get_assignments('2023-05-01')), 6)
+        self.assertEqual(client.get('/api/jobs/missing').status_code, 404)
+        self.assertEqual(client.post('/api/jobs', data='{}', content_type='application/json').status_code, 400)
+        jobs.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
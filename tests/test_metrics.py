@@ -0,0 +1,84 @@
+import os
+import tempfile
+import time
+import unittest
+from flask import Flask
+from src.api.routes import api
+from src.data.staff import Staff
+from src.data.patient import Patient
+from src.data.equipment import Equipment
+from src.models.scheduler import Scheduler, build_resources
+from src.utils.database import Database
+from src.utils.metrics import MetricsRegistry, SamplingProfiler, STAGE_SECONDS, UNASSIGNED
+
+class TestMetrics(unittest.TestCase):
+    def test_prometheus_text_format(self):
+        registry = MetricsRegistry()
+        latency = registry.histogram('latency_seconds', "Latency", ['stage'], buckets=(0.1, 1.0))
+        latency.observe(0.05, stage='a')
+        latency.observe(0.5, stage='a')
+        registry.counter('events_total', "Events", ['kind']).inc(3, kind='x"y')
+        text = registry.render()
+
+        self.assertIn('# TYPE latency_seconds histogram', text)
+        self.assertIn('latency_seconds_bucket{stage="a",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{stage="a",le="+Inf"} 2', text)
+        self.assertIn('latency_seconds_count{stage="a"} 2', text)
+        self.assertIn('events_total{kind="x\\"y"} 3', text)
+        with self.assertRaises(ValueError):
+            registry.counter('events_total', "Again")
+
+    def test_stage_timing_and_unassigned(self):
+        scheduled = STAGE_SECONDS.count(stage='schedule')
+        unassigned = UNASSIGNED.value(kind='patient')
+        resources = build_resources([Staff(1, "Dr. Smith", "Doctor", True)], [])
+        patients = [{'patient': Patient(i, f"Patient {i}", "2023-05-01 09:00")} for i in range(2)]
+        Scheduler().generate_daily_schedule(resources, patients, date='2023-05-01')
+        self.assertEqual(STAGE_SECONDS.count(stage='schedule'), scheduled + 1)
+        self.assertEqual(UNASSIGNED.value(kind='patient'), unassigned + 2)
+
+    def test_metrics_endpoint_and_slow_request_profile(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(os.path.join(tmp, 'opdps.db'))
+            db.create_tables()
+            app = Flask(__name__)
+            app.config.update(DATABASE=db, PROFILE_SLOW_REQUEST_SECONDS=0.05, PROFILE_DIR=os.path.join(tmp, 'profiles'),
+                              PROFILE_SAMPLE_INTERVAL=0.001)
+            app.register_blueprint(api)
+
+            @app.route('/slow')
+            def slow():
+                deadline = time.perf_counter() + 0.1
+                while time.perf_counter() < deadline:
+                    pass
+                return 'done'
+
+            client = app.test_client()
+            self.assertEqual(client.get('/slow').status_code, 200)
+            client.get('/api/get_schedule?date=2023-05-01')
+            client.get('/api/get_schedule?date=2023-05-01')
+
+            text = client.get('/metrics').get_data(as_text=True)
+            self.assertIn('opdps_request_seconds_count{method="GET",endpoint="/slow",status="200"} 1', text)
+            self.assertIn('opdps_schedule_cache_hit_ratio', text)
+            self.assertIn('opdps_slow_requests_total{endpoint="/slow"}', text)
+
+            profiles = os.listdir(os.path.join(tmp, 'profiles'))
+            self.assertEqual(len(profiles), 1)
+            with open(os.path.join(tmp, 'profiles', profiles[0])) as f:
+                stack, count = f.readline().rsplit(' ', 1)
+            self.assertIn('slow (test_metrics.py', stack)
+            self.assertGreater(int(count), 0)
+            db.close_all()
+
+    def test_profiler_collapses_stacks(self):
+        profiler = SamplingProfiler(tempfile.gettempdir(), threshold=0, interval=0.001)
+        profiler.start()
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+        samples = profiler.stop()
+        self.assertTrue(any('test_profiler_collapses_stacks' in stack for stack in samples))
+
+if __name__ == '__main__':
+    unittest.main()
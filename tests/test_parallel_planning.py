@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+from src.data.columnar import StaffTable, EquipmentTable, PatientTable
+from src.data.staff import Staff
+from src.data.patient import Patient
+from src.data.equipment import Equipment
+from src.services.parallel_planning import ParallelPlanner
+from src.utils.database import Database
+
+DATES = ['2023-05-01', '2023-05-02']
+
+def clinic_inputs(offset):
+    staff = StaffTable.from_objects([Staff(offset + i, f"Staff {i}", "Doctor", True) for i in range(2)])
+    equipment = EquipmentTable.from_objects([Equipment(offset + i, "X-Ray", True) for i in range(2)])
+    patients = PatientTable.from_objects([Patient(offset + i, f"Patient {i}", f"{DATES[i % 2]} 09:00") for i in range(10)])
+    return (staff, equipment), patients
+
+class TestParallelPlanner(unittest.TestCase):
+    def setUp(self):
+        self.resources = {}
+        self.patients = {}
+        for n, clinic in enumerate(['north', 'south']):
+            self.resources[clinic], self.patients[clinic] = clinic_inputs(n * 100)
+
+    def test_serial_plan_and_partial_failure(self):
+        self.resources['broken'] = (None, None)
+        report = ParallelPlanner(max_workers=0).plan(self.resources, self.patients, DATES)
+        self.assertEqual(report['totals']['shards'], 6)
+        self.assertEqual(report['totals']['succeeded'], 4)
+        self.assertEqual(report['totals']['scheduled'], 20)
+        self.assertEqual([(f['clinic'], f['date']) for f in report['failures']], [('broken', d) for d in DATES])
+        self.assertEqual(len(report['schedules'][('north', '2023-05-01')]), 5)
+
+    def test_process_pool_matches_serial(self):
+        serial = ParallelPlanner(max_workers=0).plan(self.resources, self.patients, DATES)
+        parallel = ParallelPlanner(max_workers=2).plan(self.resources, self.patients, DATES)
+        self.assertEqual(parallel['failures'], [])
+        for key, table in serial['schedules'].items():
+            self.assertEqual(parallel['schedules'][key]['start_minute'].tolist(), table['start_minute'].tolist())
+
+    def test_plan_database(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(os.path.join(tmp, 'opdps.db'))
+            db.create_tables()
+            for clinic in ('north', 'south'):
+                (staff, equipment), patients = self.resources[clinic], self.patients[clinic]
+                db.upsert_staff(staff.to_objects(), clinic)
+                db.upsert_equipment(equipment.to_objects(), clinic)
+                db.upsert_patients(patients.to_objects(), clinic)
+            report = ParallelPlanner(max_workers=0).plan_database(db, DATES)
+            self.assertEqual(report['totals']['succeeded'], 4)
+            self.assertEqual(len(db.get_assignments('2023-05-02', clinic='south')), 5)
+            db.close_all()
+
+if __name__ == '__main__':
+    unittest.main()
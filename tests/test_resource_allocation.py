@@ -1,13 +1,53 @@
 import unittest
-from src.models.resource_allocator import ResourceAllocator
+from src.models.resource_allocator import ResourceAllocator, ResourcePool
+from src.data.staff import Staff
+from src.data.patient import Patient
+from src.data.equipment import Equipment
 
 class TestResourceAllocation(unittest.TestCase):
     def setUp(self):
         self.allocator = ResourceAllocator()
+        self.staff = [Staff(i, f"Staff {i}", "Doctor" if i % 3 == 0 else "Nurse", i != 1) for i in range(6)]
+        self.patients = [Patient(i, f"Patient {i}", "2023-05-01 09:00") for i in range(8)]
+        self.equipment = [Equipment(i, "MRI" if i < 2 else "XRay", True) for i in range(4)]
 
     def test_allocate_resources(self):
-        # TODO: Implement test cases for resource allocation
-        pass
+        allocations = self.allocator.allocate_resources(self.staff, self.patients, self.equipment)
+
+        self.assertEqual(len(allocations), len(self.patients))
+        # Resources are handed out in list order, skipping unavailable staff
+        self.assertEqual([a['staff'].id for a in allocations[:4]], [0, 2, 3, 4])
+        self.assertEqual([a['equipment'].id for a in allocations[:4]], [0, 1, 2, 3])
+        self.assertTrue(all(a['staff'] is None and a['equipment'] is None for a in allocations[4:]))
+        self.assertFalse(any(e.availability for e in self.equipment))
+        self.assertTrue(self.staff[5].availability)
+
+    def test_allocate_batch_with_constraints(self):
+        roles = ["Doctor", "Doctor", "Doctor", None, "Nurse"]
+        types = ["MRI", "MRI", "MRI", "XRay", None]
+        result = self.allocator.allocate_batch(self.staff, self.patients[:5], self.equipment, roles, types)
+
+        self.assertEqual(result['staff_id'].tolist(), [0, 3, -1, 2, 4])
+        self.assertEqual(result['equipment_id'].tolist(), [0, 1, -1, 2, 3])
+        self.assertEqual(result['allocated'].tolist(), [True, True, False, True, True])
+
+    def test_pool_release(self):
+        pool = ResourcePool(self.equipment, 'type')
+        first = pool.acquire_index('MRI')
+        self.assertEqual(pool.acquire_index(), 1)
+        pool.release_index(first)
+        self.assertTrue(self.equipment[first].availability)
+        self.assertEqual(pool.available('MRI'), 1)
+        self.assertEqual(pool.acquire_index(), first)
+
+    def test_pool_release_does_not_duplicate_heap_entries(self):
+        pool = ResourcePool(self.equipment, 'type')
+        for _ in range(100):
+            pool.release_index(pool.acquire_index('MRI'))
+            pool.release_index(pool.acquire_index())
+        self.assertLessEqual(len(pool._any), len(self.equipment))
+        self.assertLessEqual(len(pool._heaps['MRI']), len(self.equipment))
+        self.assertEqual(pool.available(), sum(e.availability for e in self.equipment))
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
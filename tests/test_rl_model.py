@@ -0,0 +1,177 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from src.models.rl_model import RLModel
+from src.models.state_encoder import StateEncoder, HashingStateEncoder, SparseQTable
+from src.models.model_store import ModelStore, open_qtable
+
+class TestRLModel(unittest.TestCase):
+    def setUp(self):
+        self.model = RLModel(state_size=10, action_size=3, learning_rate=0.5, discount_factor=0.9)
+
+    def test_train_batch_merges_repeated_pairs(self):
+        # Three identical transitions in one chunk behave like three sequential updates
+        self.model.train_batch([2, 2, 2], [1, 1, 1], [1.0, 1.0, 1.0], [5, 5, 5], dones=[True] * 3)
+        self.assertAlmostEqual(self.model.q_table[2, 1], 1 - 0.5 ** 3)
+        self.assertEqual(np.count_nonzero(self.model.q_table), 1)
+
+    def test_train_batch_converges(self):
+        rng = np.random.default_rng(0)
+        states = rng.integers(0, 10, 2000)
+        actions = rng.integers(0, 3, 2000)
+        history = self.model.train_batch(states, actions, np.ones(2000), (states + 1) % 10,
+                                         epochs=200, batch_size=256, tolerance=1e-3)
+
+        self.assertLess(len(history), 200)
+        self.assertLess(history[-1]['mean_abs_td_error'], 1e-3)
+        # Constant reward 1 with discount 0.9 converges to 1 / (1 - 0.9)
+        np.testing.assert_allclose(self.model.q_table.max(axis=1), 10.0, rtol=1e-2)
+
+    def test_train_batch_rejects_bad_indices(self):
+        with self.assertRaises(ValueError):
+            self.model.train_batch([0], [3], [1.0], [1])
+        with self.assertRaises(ValueError):
+            self.model.train_batch([0, 1], [0], [1.0], [1])
+
+    def test_predict_batch_matches_predict(self):
+        encoder = StateEncoder({'staff_available': 11, 'patients_waiting': [5, 10, 20]})
+        model = RLModel(None, 4, encoder=encoder)
+        model.q_table[:] = np.random.default_rng(1).integers(0, 3, model.q_table.shape)
+        frame = pd.DataFrame({'staff_available': np.arange(11), 'patients_waiting': np.arange(0, 33, 3)})
+        records = frame.to_dict('records')
+
+        result = model.predict_batch(frame, top_k=2, epsilon=0.0)
+        self.assertEqual(result['actions'].tolist(), [model.predict(state) for state in records])
+        self.assertEqual(result['top_actions'][:, 0].tolist(), result['actions'].tolist())
+        self.assertTrue(np.all(result['top_q_values'][:, 0] >= result['top_q_values'][:, 1]))
+        self.assertEqual(result['sampled_actions'].tolist(), result['actions'].tolist())
+
+        # The hashing fallback gives the same answers through the batch path
+        hashed = RLModel(50, 4)
+        hashed.q_table[:] = np.random.default_rng(2).random(hashed.q_table.shape)
+        self.assertEqual(hashed.predict_batch(records)['actions'].tolist(), [hashed.predict(state) for state in records])
+        self.assertEqual(hashed.predict_batch({name: frame[name].to_numpy() for name in frame})['actions'].tolist(),
+                         [hashed.predict(state) for state in records])
+        explored = hashed.predict_batch(frame, epsilon=1.0, rng=np.random.default_rng(0))['sampled_actions']
+        self.assertTrue(np.all((explored >= 0) & (explored < 4)))
+
+class TestStateEncoder(unittest.TestCase):
+    def setUp(self):
+        self.encoder = StateEncoder({'staff_available': 11, 'patients_waiting': [5, 10, 20]})
+
+    def test_encode_is_collision_free(self):
+        self.assertEqual(self.encoder.size, 44)
+        indices = {self.encoder.encode({'staff_available': s, 'patients_waiting': w})
+                   for s in range(11) for w in (0, 7, 15, 30)}
+        self.assertEqual(indices, set(range(44)))
+        self.assertEqual(self.encoder.decode(self.encoder.encode({'staff_available': 3, 'patients_waiting': 12})),
+                         {'staff_available': 3, 'patients_waiting': 2})
+
+    def test_batch_matches_scalar(self):
+        frame = pd.DataFrame({'staff_available': [0, 4, 25, -1], 'patients_waiting': [0, 10, 19, 100]})
+        expected = [self.encoder.encode(row) for row in frame.to_dict('records')]
+        self.assertEqual(self.encoder.encode_batch(frame).tolist(), expected)
+        self.assertEqual(self.encoder.encode_batch(frame.to_numpy()).tolist(), expected)
+        restored = StateEncoder.from_dict(self.encoder.to_dict())
+        self.assertEqual(restored.encode_batch(frame).tolist(), expected)
+
+    def test_hashing_encoder_is_stable(self):
+        # A fixed value: the index must not depend on PYTHONHASHSEED or key order
+        encoder = HashingStateEncoder(1000)
+        self.assertEqual(encoder.encode({'staff_available': 5, 'patients_waiting': 10}), 960)
+        self.assertEqual(encoder.encode({'patients_waiting': 10, 'staff_available': 5}), 960)
+
+    def test_sparse_model_matches_dense(self):
+        encoder = StateEncoder({'a': 1000, 'b': 1000})
+        sparse = RLModel(None, 4, encoder=encoder, sparse=True)
+        dense = RLModel(None, 4, encoder=encoder)
+        self.assertIsInstance(sparse.q_table, SparseQTable)
+        for model in (sparse, dense):
+            model.train_batch([5, 5, 999999], [1, 1, 3], [1.0, 2.0, 3.0], [7, 999999, 5])
+        np.testing.assert_allclose(sparse.q_table.to_dense(), dense.q_table)
+        self.assertEqual(len(sparse.q_table), 2)
+
+    def test_save_and_load_keep_the_file_name(self):
+        encoder = StateEncoder({'a': 1000, 'b': 1000})
+        with tempfile.TemporaryDirectory() as tmp:
+            for sparse in (True, False):
+                model = RLModel(None, 4, encoder=encoder, sparse=sparse)
+                model.train_batch([5, 999999], [1, 3], [1.0, 3.0], [7, 5])
+                filename = os.path.join(tmp, 'model.bin')
+                model.save_model(filename)
+                self.assertEqual(os.listdir(tmp), ['model.bin'])
+
+                loaded = RLModel(None, 4, encoder=encoder, sparse=sparse)
+                loaded.load_model(filename)
+                self.assertEqual(type(loaded.q_table), type(model.q_table))
+                if sparse:
+                    self.assertEqual(loaded.q_table.shape, model.q_table.shape)
+                    np.testing.assert_array_equal(loaded.q_table.to_dense(), model.q_table.to_dense())
+                else:
+                    np.testing.assert_array_equal(loaded.q_table, model.q_table)
+
+class TestModelStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ModelStore(os.path.join(self.tmp.name, 'models'))
+        self.encoder = StateEncoder({'staff_available': 11, 'patients_waiting': [5, 10, 20]})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_publish_and_hot_swap(self):
+        trainer = RLModel(None, 3, encoder=self.encoder)
+        trainer.train_batch([1, 2], [0, 2], [1.0, 5.0], [2, 3])
+        self.assertEqual(self.store.publish(trainer), 1)
+
+        worker = RLModel(1000, 10)
+        self.assertTrue(self.store.refresh(worker))
+        self.assertFalse(self.store.refresh(worker))
+        self.assertEqual(worker.model_version, 1)
+        self.assertIsInstance(worker.q_table, np.memmap)
+        self.assertFalse(worker.q_table.flags.writeable)
+        self.assertEqual(worker.encoder.to_dict(), self.encoder.to_dict())
+        np.testing.assert_array_equal(worker.q_table, trainer.q_table)
+
+        trainer.train_batch([4], [1], [3.0], [5])
+        self.assertEqual(self.store.publish(trainer), 2)
+        self.assertTrue(self.store.refresh(worker))
+        self.assertEqual(worker.model_version, 2)
+        self.assertEqual(worker.q_table[4, 1], trainer.q_table[4, 1])
+
+        # Training a mapped model works on a private copy and leaves the file untouched
+        worker.train_batch([0], [0], [1.0], [0])
+        on_disk, header = open_qtable(self.store.path_for(2))
+        self.assertEqual(on_disk[0, 0], 0.0)
+        self.assertEqual(header['version'], 2)
+
+        self.store.prune(keep=1)
+        self.assertEqual(self.store.versions(), [2])
+
+    def test_prediction_in_flight_keeps_its_version(self):
+        # Version 1 has 44 rows, version 2 hashes into 1000. The encoder swaps in
+        # version 1 mid-prediction; pairing its index with the new table would fail.
+        self.store.publish(RLModel(None, 3, encoder=self.encoder))
+        self.store.publish(RLModel(1000, 3))
+        worker = RLModel(1000, 3)
+        self.store.load(worker, 2)
+        hashing = worker.encoder
+        store = self.store
+
+        class SwappingEncoder:
+            size = hashing.size
+
+            def encode(self, state):
+                store.load(worker, 1)
+                return hashing.encode(state)
+
+        worker.encoder = SwappingEncoder()
+        state = {'staff_available': 0, 'patients_waiting': 0}
+        self.assertGreaterEqual(hashing.encode(state), 44)
+        self.assertEqual(worker.predict(state), 0)
+        self.assertEqual(worker.model_version, 1)
+
+if __name__ == '__main__':
+    unittest.main()
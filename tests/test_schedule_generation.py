@@ -1,13 +1,116 @@
+import copy
 import unittest
-from src.models.scheduler import Scheduler
+from datetime import timedelta
+from src.models.scheduler import Scheduler, create_scheduler
+from src.models.local_search_scheduler import LocalSearchScheduler
+from src.models.rescheduler import Rescheduler
+from src.models.availability import AvailabilityCalendar
+from src.data.patient import Patient
 
 class TestScheduleGeneration(unittest.TestCase):
     def setUp(self):
         self.scheduler = Scheduler()
+        self.resources = [
+            {'type': 'staff', 'id': 0, 'name': 'Staff 0', 'availability': {}},
+            {'type': 'staff', 'id': 1, 'name': 'Staff 1', 'availability': {'09:00': False}},
+            {'type': 'equipment', 'id': 0, 'type_name': 'MRI', 'availability': {}},
+        ]
+        self.appointments = [{'patient': Patient(i, f"Patient {i}", "2023-05-01 09:00")} for i in range(3)]
 
     def test_generate_daily_schedule(self):
-        # TODO: Implement test cases for schedule generation
-        pass
+        schedule = self.scheduler.generate_daily_schedule(self.resources, self.appointments)
+
+        times = [a['time'].strftime('%H:%M') for a in schedule.assignments]
+        self.assertEqual(times, ['09:00', '09:30', '10:00'])
+        self.assertTrue(all(a['staff'] is self.resources[0] for a in schedule.assignments))
+        self.assertTrue(all(a['equipment'] is self.resources[2] for a in schedule.assignments))
+        # Bookings are written back to the availability dicts
+        self.assertFalse(self.resources[0]['availability']['09:15'])
+        self.assertFalse(self.resources[2]['availability']['10:15'])
+
+        # A second run sees the earlier bookings: at 09:00 both staff members and the
+        # equipment are taken, so the patient is left unscheduled
+        rerun = self.scheduler.generate_daily_schedule(self.resources, self.appointments[:1])
+        self.assertIsNone(rerun.assignments[0]['staff'])
+
+    def test_calendar_find_first(self):
+        calendar = AvailabilityCalendar(slot_minutes=15, day_start=9 * 60, day_end=17 * 60)
+        for _ in range(3):
+            calendar.add_resource('room')
+        calendar.reserve('room', 0, 9 * 60, 60)
+        calendar.reserve('room', 1, 9 * 60, 30)
+        calendar.reserve('room', 2, 9 * 60, 120)
+
+        self.assertEqual(calendar.find_first('room', 9 * 60, 30), (1, 9 * 60 + 30))
+        self.assertEqual(calendar.find_first('room', 9 * 60 + 5, 60), (1, 9 * 60 + 30))
+        self.assertTrue(calendar.is_free('room', 0, 10 * 60, 45))
+        self.assertIsNone(calendar.find_first('room', 16 * 60 + 45, 30))
+        calendar.release('room', 2, 9 * 60, 120)
+        self.assertEqual(calendar.first_free('room', 9 * 60, 15), 2)
+
+    def test_local_search_packs_parallel_resources(self):
+        resources = [{'type': t, 'id': i, 'availability': {}} for t in ('staff', 'equipment') for i in range(3)]
+        appointments = [{'patient': Patient(i, f"Patient {i}", "2023-05-01 09:00"), 'duration': 30 if i % 2 else 45}
+                        for i in range(36)]
+        # Bounded by iterations, not wall-clock time, so the result is deterministic
+        scheduler = create_scheduler('local_search', time_limit=60, max_iterations=5000, max_stall_iterations=200, seed=7)
+        self.assertIsInstance(scheduler, LocalSearchScheduler)
+
+        schedule = scheduler.generate_daily_schedule(resources, appointments)
+        metrics = schedule.metrics
+        self.assertEqual(metrics['unscheduled'], 0)
+        self.assertEqual(metrics['overtime_minutes'], 0)
+        self.assertFalse(metrics['timed_out'])
+        self.assertLessEqual(metrics['iterations'], 5000)
+
+        # No staff member or piece of equipment is double-booked
+        for kind in ('staff', 'equipment'):
+            intervals = {}
+            for a in schedule.assignments:
+                start = a['time'].hour * 60 + a['time'].minute
+                intervals.setdefault(a[kind]['id'], []).append((start, start + a['duration']))
+            for booked in intervals.values():
+                booked.sort()
+                self.assertTrue(all(prev[1] <= nxt[0] for prev, nxt in zip(booked, booked[1:])))
+
+    def test_repair_touches_only_affected_patients(self):
+        resources = [{'type': t, 'id': i, 'availability': {}} for t in ('staff', 'equipment') for i in range(2)]
+        appointments = [{'patient': Patient(i, f"Patient {i}", "2023-05-01 09:00")} for i in range(8)]
+        original = LocalSearchScheduler(time_limit=1, max_iterations=0).generate_daily_schedule(
+            resources, appointments, date='2023-05-01')
+        self.assertEqual(original.metrics['unscheduled'], 0)
+        by_patient = {a['patient'].id: a for a in original.assignments}
+        starts = {pid: a['time'].strftime('%H:%M') for pid, a in by_patient.items()}
+        on_staff_0 = sorted(pid for pid, a in by_patient.items() if a['staff']['id'] == 0 and starts[pid] >= '10:00')
+
+        delta = {
+            'now': 9 * 60 + 30,
+            'cancelled': [0],
+            'late': {3: 20},
+            'staff_out': [{'id': 0, 'from': 10 * 60}],
+            'added': [{'patient': Patient(99, "Walk-in", "2023-05-01 09:45")}]
+        }
+        before = copy.deepcopy(resources)
+        repaired, diff = Rescheduler().repair(original, resources, delta)
+        # The resource dicts are shared with cached readers and must not change
+        self.assertEqual(resources, before)
+        changes = {d['patient_id']: d['change'] for d in diff}
+
+        self.assertEqual(changes[0], 'cancelled')
+        self.assertEqual(changes[3], 'moved')
+        self.assertEqual(changes[99], 'added')
+        for pid in on_staff_0:
+            self.assertIn(changes[pid], ('moved', 'reassigned', 'unscheduled'))
+        # Everyone not named in the diff keeps the very same assignment
+        kept = [a for a in repaired.assignments if a['patient'].id not in changes]
+        self.assertTrue(kept)
+        self.assertTrue(all(a is by_patient[a['patient'].id] for a in kept))
+        # Nothing lands on staff 0 after the outage starts or before a late arrival
+        new = {a['patient'].id: a for a in repaired.assignments if a['staff'] is not None}
+        self.assertTrue(all(a['staff']['id'] != 0 or a['time'].hour * 60 + a['time'].minute + a['duration'] <= 600
+                            for a in new.values()))
+        self.assertGreaterEqual(new[3]['time'], by_patient[3]['time'] + timedelta(minutes=20))
+        self.assertEqual(repaired.date, original.date)
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
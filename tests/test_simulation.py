@@ -0,0 +1,48 @@
+import unittest
+from src.models.rl_model import RLModel
+from src.simulation.simulator import (OutpatientSimulator, SimulationConfig, FixedStaffingPolicy, RLStaffingPolicy,
+                                      simulate_days)
+
+class TestSimulation(unittest.TestCase):
+    def test_day_is_reproducible_and_consistent(self):
+        simulator = OutpatientSimulator(SimulationConfig(booked_patients=60, equipment_failure_rate=1.0))
+        first, second = simulator.run_day(seed=7), simulator.run_day(seed=7)
+        self.assertEqual(first['metrics'], second['metrics'])
+
+        metrics = first['metrics']
+        self.assertEqual(metrics['booked'] + metrics['not_booked'], 60)
+        self.assertEqual(metrics['arrivals'], metrics['booked'] - metrics['no_shows'] + metrics['walk_ins'])
+        self.assertEqual(metrics['served'] + metrics['unserved'], metrics['arrivals'])
+        self.assertTrue(0 < metrics['staff_utilization'] <= 1)
+
+    def test_on_call_staff_reduce_waiting(self):
+        config = SimulationConfig(staff=4, equipment=8, booked_patients=120)
+        lean = simulate_days(OutpatientSimulator(config, staffing_policy=FixedStaffingPolicy(0)), days=20, seed=1)
+        staffed = simulate_days(OutpatientSimulator(config, staffing_policy=FixedStaffingPolicy(3)), days=20, seed=1)
+        self.assertLess(staffed['summary']['mean_wait']['mean'], lean['summary']['mean_wait']['mean'])
+
+    def test_unserved_patients_count_towards_wait(self):
+        config = SimulationConfig(staff=1, equipment=1, booked_patients=120)
+        metrics = OutpatientSimulator(config).run_day(seed=3)['metrics']
+        self.assertGreater(metrics['unserved'], 0)
+        # Still queued at closing, so each waited at least the overtime window
+        self.assertGreaterEqual(metrics['mean_unserved_wait'], config.overtime_limit)
+        self.assertGreaterEqual(metrics['max_wait'], metrics['mean_unserved_wait'])
+
+    def test_episodes_train_rl_model(self):
+        model = RLModel(state_size=500, action_size=4)
+        simulator = OutpatientSimulator(staffing_policy=RLStaffingPolicy(model, epsilon=0.5))
+        serial = simulate_days(simulator, days=6, seed=3, chunk_size=2)
+        parallel = simulate_days(simulator, days=6, seed=3, processes=2, chunk_size=2)
+        self.assertEqual(serial['days'], parallel['days'])
+
+        episode = serial['episodes'][0]
+        self.assertEqual(set(episode['initial_state']), {'staff_available', 'patients_waiting'})
+        self.assertEqual(len(episode['steps']), 8)
+        model.train(serial['episodes'])
+        arrays = model.episodes_to_arrays(serial['episodes'])
+        self.assertEqual(len(arrays['states']), 48)
+        self.assertTrue((arrays['actions'] < 4).all())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import numpy as np
+from flask import Flask
+from src.data.staff import Staff
+from src.data.patient import Patient
+from src.data.equipment import Equipment
+from src.models.rl_model import RLModel
+from src.services.planning import SimulationService
+from src.ui.dashboard import generate_dataset, run_pipeline, lookup, clock
+from src.ui.views import ui
+
+class TestUi(unittest.TestCase):
+    def setUp(self):
+        staff = [Staff(i, f"Staff {i}", "Doctor" if i % 3 == 0 else "Nurse", True) for i in range(4)]
+        patients = [Patient(i, f"Patient {i}", f"2023-05-{i+1:02d} 09:00") for i in range(6)]
+        equipment = [Equipment(i, f"Equipment {i}", True) for i in range(2)]
+        self.simulation = SimulationService(staff, patients, equipment, RLModel(state_size=100, action_size=4))
+        self.staff = staff
+        app = Flask(__name__)
+        app.extensions['opdps_simulation'] = self.simulation
+        app.register_blueprint(ui)
+        self.client = app.test_client()
+
+    def test_simulation_is_cached_and_repeatable(self):
+        first = self.simulation.run()
+        self.assertIs(self.simulation.run(), first)
+        self.assertEqual(sum(a['staff'] is not None for a in first['allocations']), 2)
+        self.assertEqual(first['schedule'][0]['equipment'], "Equipment 0")
+        # The inputs are not consumed by a run
+        self.assertTrue(all(s.availability for s in self.staff))
+        self.simulation.invalidate()
+        self.assertEqual(self.simulation.run(), first)
+
+    def test_schedule_page_renders_in_process(self):
+        response = self.client.get('/schedule')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Patient 5', response.get_data(as_text=True))
+
+    def test_dashboard_frames_are_built_from_columns(self):
+        staff, patients, equipment = generate_dataset(4, 6, 2, seed=1)
+        results = run_pipeline(staff, patients, equipment, RLModel(state_size=100, action_size=4), engine='local_search')
+        self.assertEqual(list(results['allocations']['Staff']), ['Staff 0', 'Staff 1', 'N/A', 'N/A', 'N/A', 'N/A'])
+        self.assertEqual(len(results['schedule']), 6)
+        self.assertEqual(results['scheduled'], 6)
+
+        # Patients the greedy engine cannot fit before closing are listed as unscheduled
+        staff, patients, equipment = generate_dataset(1, 40, 1, seed=1)
+        results = run_pipeline(staff, patients, equipment, RLModel(state_size=100, action_size=4), engine='greedy')
+        self.assertEqual(results['patients'], 40)
+        self.assertLess(results['scheduled'], 40)
+        self.assertEqual(len(results['schedule']), 40)
+        unscheduled = results['schedule'][results['schedule']['Time'] == 'Unscheduled']
+        self.assertEqual(len(unscheduled), 40 - results['scheduled'])
+        self.assertEqual(set(unscheduled['Staff']), {'N/A'})
+        self.assertTrue(all(s.availability for s in staff.to_objects()))
+        self.assertEqual(list(clock(np.array([540, 1019]))), ['09:00', '16:59'])
+        ids = np.array([2, -1, 0])
+        self.assertEqual(list(lookup(ids, np.array([0, 2]), np.array(['a', 'b'], dtype=object))), ['b', 'N/A', 'a'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import random
+import unittest
+from src.models.workload_distributor import WorkloadDistributor
+from src.data.staff import Staff
+
+class TestWorkloadDistribution(unittest.TestCase):
+    def setUp(self):
+        self.distributor = WorkloadDistributor()
+        self.staff = [Staff(i, f"Staff {i}", "Doctor" if i % 3 == 0 else "Nurse", True) for i in range(6)]
+
+    def _linear_reference(self, staff, tasks):
+        # The original O(tasks x staff) least-loaded rule
+        workload = {s.id: 0 for s in staff}
+        available = {s.id: s.availability for s in staff}
+        assigned = []
+        for task in tasks:
+            candidates = [s for s in staff if available[s.id]]
+            if not candidates:
+                assigned.append(None)
+                continue
+            chosen = min(candidates, key=lambda s: workload[s.id])
+            assigned.append(chosen.id)
+            workload[chosen.id] += task.get('duration', 1)
+            if workload[chosen.id] >= 8:
+                available[chosen.id] = False
+        return assigned, workload
+
+    def test_distribute_workload_matches_linear_scan(self):
+        rng = random.Random(3)
+        tasks = [{'id': i, 'duration': rng.randint(1, 4)} for i in range(40)]
+        expected, expected_workload = self._linear_reference(self.staff, tasks)
+
+        distributed = self.distributor.distribute_workload(self.staff, tasks)
+        self.assertEqual([d['assigned_to'].id if d['assigned_to'] else None for d in distributed], expected)
+        self.assertEqual(self.distributor.get_staff_workload(self.staff, distributed), expected_workload)
+        self.assertTrue(all(not s.availability for s in self.staff))
+
+    def test_roles_weights_and_capacity(self):
+        tasks = [
+            {'id': 0, 'duration': 2, 'role': 'Doctor'},
+            {'id': 1, 'duration': 1, 'role': 'Doctor', 'weight': 3},
+            {'id': 2, 'duration': 1, 'roles': ['Doctor', 'Surgeon']},
+            {'id': 3, 'duration': 1, 'role': 'Surgeon'},
+            {'id': 4, 'duration': 1},
+        ]
+        distributed = self.distributor.distribute_workload(self.staff, tasks, capacity={0: 2})
+
+        self.assertEqual([d['assigned_to'].id if d['assigned_to'] else None for d in distributed], [0, 3, 3, None, 1])
+        self.assertFalse(self.staff[0].availability)
+        self.assertEqual(self.distributor.workload[3], 4)
+        # A copy of the task list is summed from scratch and agrees with the running totals
+        self.assertEqual(self.distributor.get_staff_workload(self.staff, list(distributed)), self.distributor.workload)
+
+    def test_balance_workload_beats_arrival_order(self):
+        # Small tasks first and large ones late is the worst case for the greedy rule
+        tasks = [{'id': i, 'duration': 1} for i in range(12)] + [{'id': 12 + i, 'duration': 4} for i in range(3)]
+        tasks.append({'id': 15, 'duration': 2, 'role': 'Doctor'})
+        distributor = WorkloadDistributor(default_capacity=100)
+        distributor.distribute_workload(self.staff, tasks)
+        greedy_max = max(distributor.workload.values())
+
+        staff = [Staff(i, f"Staff {i}", "Doctor" if i % 3 == 0 else "Nurse", True) for i in range(6)]
+        result = distributor.balance_workload(staff, tasks)
+        self.assertLess(result['max_load'], greedy_max)
+        self.assertEqual(result['max_load'], 5)
+        self.assertAlmostEqual(result['mean_load'], 26 / 6)
+        self.assertEqual(result['unassigned'], 0)
+        self.assertEqual(result['assignments'][15]['assigned_to'].role, 'Doctor')
+        self.assertEqual(distributor.get_staff_workload(staff, result['assignments']), result['workload'])
+
+    def test_balance_workload_respects_caps(self):
+        staff = [Staff(1, "Staff 1", "Nurse", True), Staff(2, "Staff 2", "Nurse", True)]
+        tasks = [{'id': 0, 'duration': 4}, {'id': 1, 'duration': 1}, {'id': 2, 'duration': 1}]
+        result = WorkloadDistributor().balance_workload(staff, tasks, capacity={1: 10, 2: 1})
+        self.assertEqual(result['workload'], {1: 5.0, 2: 1.0})
+
+if __name__ == '__main__':
+    unittest.main()